@@ -0,0 +1,86 @@
+"""
+Benchmark: widget page load with many installed widgets.
+
+Compares a cold, uncached discovery per request (the old discover_widgets()
+behaviour) with the cached WidgetRegistry, for one layout fetch plus one
+frame lookup per widget.
+
+    python benchmarks/bench_widget_registry.py --widgets 500
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.widget_registry import WidgetRegistry
+
+
+def make_widgets(root, count):
+    """Create `count` minimal widgets under root."""
+    for i in range(count):
+        path = os.path.join(root, f"widget_{i:04d}")
+        os.makedirs(path)
+        with open(os.path.join(path, "widget.html"), "w") as f:
+            f.write(f"<!-- aspect-ratio: 2:1 -->\n<div>widget {i}</div>\n")
+        with open(os.path.join(path, "widget.css"), "w") as f:
+            f.write("div { color: white; }\n")
+        with open(os.path.join(path, "widget.js"), "w") as f:
+            f.write("(function() {})();\n")
+
+
+def page_load_uncached(root, ids):
+    """One full scan for the layout, then one full scan per frame request."""
+    WidgetRegistry(root).widgets()
+    for widget_id in ids:
+        WidgetRegistry(root).get(widget_id)
+
+
+def page_load_cached(registry, ids):
+    registry.widgets()
+    for widget_id in ids:
+        registry.get(widget_id)
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--widgets", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="mlw_bench_widgets_")
+    try:
+        make_widgets(root, args.widgets)
+        ids = sorted(os.listdir(root))
+
+        registry = WidgetRegistry(root)
+        cold_scan = timed(lambda: WidgetRegistry(root).refresh(), repeat=args.repeat)
+        registry.refresh()
+        results = {
+            "widgets": args.widgets,
+            "cold_scan_s": cold_scan,
+            "refresh_unchanged_s": timed(registry.refresh, repeat=args.repeat),
+            "page_load_uncached_s": timed(page_load_uncached, root, ids, repeat=args.repeat),
+            "page_load_cached_s": timed(page_load_cached, registry, ids, repeat=args.repeat),
+        }
+        print(json.dumps(results, indent=2))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Benchmark suite: widget discovery, frame serving, library listing, video
+streaming and thumbnails against a synthetic library.
+
+Everything runs in a temporary data directory (see headless.py for the MLW_*
+variables), so the real library is never touched. Results are written as
+JSON; pass an earlier results file with --compare to see what regressed.
+
+With playwright installed (pip install playwright && playwright install
+chromium), the wallpaper page's memory is also measured with
+--memory-widgets widgets as iframes and as lightweight Shadow DOM widgets.
+
+    python benchmarks/suite.py --widgets 300 --wallpapers 2000 --output bench.json
+    python benchmarks/suite.py --compare bench.json
+"""
+
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_widget_registry import make_widgets
+
+# Streaming test file size
+STREAM_FILE_MB = 64
+
+# Widget used for the page memory comparison: a small clock
+MEMORY_WIDGET_HTML = """<!-- aspect-ratio: 2:1 -->
+{marker}
+<div class="bench-clock"><span class="time">--:--:--</span><span class="date"></span></div>
+"""
+MEMORY_WIDGET_CSS = ".bench-clock { color: white; font: 600 24px system-ui; display: flex; gap: 8px; }\n"
+MEMORY_WIDGET_JS = """(function() {
+  const timeEl = document.querySelector('.time');
+  const dateEl = document.querySelector('.date');
+  function update(now = new Date()) {
+    timeEl.textContent = now.toLocaleTimeString();
+    dateEl.textContent = now.toLocaleDateString();
+  }
+  update();
+  Widget.onTick(1000, update);
+})();
+"""
+
+
+def summarize(samples, unit="s"):
+    samples = sorted(samples)
+    return {
+        "unit": unit,
+        "n": len(samples),
+        "min": samples[0],
+        "median": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "mean": statistics.fmean(samples),
+    }
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def make_clip(ffmpeg, path, seconds=1, size="320x180", pattern="testsrc"):
+    subprocess.run(
+        [ffmpeg, "-v", "error", "-y", "-f", "lavfi", "-i", f"{pattern}=size={size}:rate=24",
+         "-t", str(seconds), "-pix_fmt", "yuv420p", path],
+        check=True,
+    )
+
+
+def make_wallpapers(ffmpeg, root, count, distinct):
+    """`count` small clips; only `distinct` of them are encoded, the rest are copies."""
+    os.makedirs(root, exist_ok=True)
+    patterns = ["testsrc", "testsrc2", "smptebars", "rgbtestsrc", "mandelbrot"]
+    sources = []
+    for i in range(distinct):
+        path = os.path.join(root, f"clip_{i:05d}.mp4")
+        make_clip(ffmpeg, path, seconds=1 + i % 3, pattern=patterns[i % len(patterns)])
+        sources.append(path)
+    for i in range(distinct, count):
+        shutil.copyfile(sources[i % distinct], os.path.join(root, f"clip_{i:05d}.mp4"))
+
+
+def make_stream_file(root, size_mb):
+    """Incompressible file served as a wallpaper (the endpoint doesn't decode it)."""
+    path = os.path.join(root, "stream.mp4")
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(1024 * 1024))
+    return "stream.mp4"
+
+
+def make_memory_widgets(root, count, lightweight):
+    prefix = "mem_shadow" if lightweight else "mem_iframe"
+    ids = []
+    for i in range(count):
+        widget_id = f"{prefix}_{i:03d}"
+        path = os.path.join(root, widget_id)
+        os.makedirs(path)
+        marker = "<!-- lightweight: true -->" if lightweight else ""
+        for name, content in (("widget.html", MEMORY_WIDGET_HTML.format(marker=marker)),
+                              ("widget.css", MEMORY_WIDGET_CSS), ("widget.js", MEMORY_WIDGET_JS)):
+            with open(os.path.join(path, name), "w") as f:
+                f.write(content)
+        ids.append(widget_id)
+    return ids
+
+
+def page_memory(url, repeat, settle=2.0):
+    """
+    JS heap, DOM nodes and documents of the wallpaper page in headless
+    Chromium (via the DevTools protocol), one fresh page per sample.
+    """
+    from playwright.sync_api import sync_playwright
+
+    samples = {"heap": [], "nodes": [], "documents": []}
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        try:
+            for _ in range(repeat):
+                page = browser.new_page()
+                page.goto(url, wait_until="load")
+                time.sleep(settle)
+                cdp = page.context.new_cdp_session(page)
+                cdp.send("Performance.enable")
+                cdp.send("HeapProfiler.collectGarbage")
+                metrics = {m["name"]: m["value"] for m in cdp.send("Performance.getMetrics")["metrics"]}
+                samples["heap"].append(metrics["JSHeapUsedSize"] / (1024 * 1024))
+                samples["nodes"].append(metrics["Nodes"])
+                samples["documents"].append(metrics["Documents"])
+                page.close()
+        finally:
+            browser.close()
+    return samples
+
+
+def widget_memory(base_url, count, repeat):
+    """Page memory with `count` widgets as iframes vs. lightweight Shadow DOM widgets."""
+    if importlib.util.find_spec("playwright") is None:
+        print("playwright not installed, skipping the widget memory comparison")
+        return {}
+    from lib.constants import WIDGETS_DIR
+    from lib import widget_manager
+
+    layouts = {}
+    for mode, lightweight in (("iframe", False), ("shadow", True)):
+        ids = make_memory_widgets(WIDGETS_DIR, count, lightweight)
+        layouts[mode] = [{"id": widget_id, "enabled": True, "x": 40 + (i % 5) * 260, "y": 40 + (i // 5) * 140,
+                          "height": 100} for i, widget_id in enumerate(ids)]
+        if lightweight:
+            widget_manager.trusted_widgets = set(ids)
+    widget_manager.registry.refresh()
+
+    results = {}
+    for mode, layout in layouts.items():
+        widget_manager.save_widget_config(layout)
+        try:
+            samples = page_memory(base_url + "/", repeat)
+        except Exception as e:
+            print(f"Widget memory comparison failed ({mode}): {e}")
+            return {}
+        results[f"page_js_heap_{mode}_widgets"] = summarize(samples["heap"], unit="MiB")
+        results[f"page_dom_nodes_{mode}_widgets"] = summarize(samples["nodes"], unit="nodes")
+        results[f"page_documents_{mode}_widgets"] = summarize(samples["documents"], unit="documents")
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args, data_dir):
+    # lib.constants reads these at import time
+    os.environ["MLW_DATA_DIR"] = data_dir
+    os.environ["MLW_CACHE_DIR"] = os.path.join(data_dir, "cache")
+
+    from lib.constants import initialize_data_dirs, WALLPAPER_DIR, WIDGETS_DIR
+    initialize_data_dirs()
+    from lib.ingest import ffmpeg_binary
+    from lib.widget_registry import WidgetRegistry
+    from lib.widget_frames import frame_cache
+    from lib.thumbnails import get_thumbnail, thumbnail_service
+    from lib.server import WSGIServer
+    from lib import widget_manager
+    import web_server
+
+    results = {}
+    print(f"Generating {args.widgets} widgets and {args.wallpapers} wallpapers in {data_dir}")
+    shutil.rmtree(WIDGETS_DIR)
+    os.makedirs(WIDGETS_DIR)
+    make_widgets(WIDGETS_DIR, args.widgets)
+    make_wallpapers(ffmpeg_binary(), WALLPAPER_DIR, args.wallpapers, min(args.thumbnails + 1, args.wallpapers))
+    stream_name = make_stream_file(WALLPAPER_DIR, args.stream_mb)
+
+    # --- Widgets ---
+    results["discover_widgets_cold"] = measure(lambda: WidgetRegistry(WIDGETS_DIR).refresh(), args.repeat)
+    widget_manager.registry.refresh()
+    results["discover_widgets_warm"] = measure(widget_manager.discover_widgets, args.repeat * 10)
+    results["get_widget_config"] = measure(widget_manager.get_widget_config, args.repeat * 10)
+
+    client = web_server.app.test_client()
+    ids = sorted(widget_manager.discover_widgets())
+
+    def frames_cold():
+        frame_cache._frames.clear()
+        shutil.rmtree(frame_cache.cache_dir, ignore_errors=True)
+        for widget_id in ids:
+            client.get(f"/widgets/{widget_id}/frame")
+
+    def frames_warm():
+        for widget_id in ids:
+            client.get(f"/widgets/{widget_id}/frame", headers={"Accept-Encoding": "gzip"})
+
+    results["frame_all_widgets_cold"] = measure(frames_cold, args.repeat)
+    results["frame_all_widgets_warm"] = measure(frames_warm, args.repeat)
+    etag = client.get(f"/widgets/{ids[0]}/frame").headers["ETag"]
+    results["frame_not_modified"] = measure(
+        lambda: client.get(f"/widgets/{ids[0]}/frame", headers={"If-None-Match": etag}), args.repeat * 10)
+
+    # --- Library ---
+    results["library_index_cold"] = measure(lambda: web_server.library.refresh(force=True), 1)
+    results["api_wallpapers_first_page"] = measure(lambda: client.get("/api/wallpapers?limit=60"), args.repeat * 10)
+    results["api_wallpapers_last_page"] = measure(
+        lambda: client.get(f"/api/wallpapers?limit=60&offset={max(0, args.wallpapers - 60)}"), args.repeat * 10)
+    results["api_wallpapers_search"] = measure(lambda: client.get("/api/wallpapers?q=clip_01&limit=60"), args.repeat * 10)
+    results["api_wallpapers_all"] = measure(lambda: client.get("/api/wallpapers"), args.repeat)
+
+    # --- Real socket: streaming and API latency under keep-alive ---
+    web_server.state.select_wallpaper(stream_name)
+    server = WSGIServer(web_server.app, "127.0.0.1", 0, classify=web_server.classify_request)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", server.port)
+
+        def download():
+            conn.request("GET", "/api/wallpaper")
+            response = conn.getresponse()
+            while response.read(1024 * 1024):
+                pass
+
+        stream = measure(download, args.repeat)
+        size_mb = os.path.getsize(os.path.join(WALLPAPER_DIR, stream_name)) / (1024 * 1024)
+        results["stream_throughput"] = summarize([size_mb / stream["median"]], unit="MiB/s")
+
+        def range_request():
+            conn.request("GET", "/api/wallpaper", headers={"Range": "bytes=1048576-2097151"})
+            conn.getresponse().read()
+
+        results["stream_range_1mib"] = measure(range_request, args.repeat * 10)
+
+        def api_call():
+            conn.request("GET", "/api/jobs")
+            conn.getresponse().read()
+
+        results["socket_api_keepalive"] = measure(api_call, args.repeat * 20)
+        conn.close()
+
+        if args.memory_widgets:
+            results.update(widget_memory(f"http://127.0.0.1:{server.port}", args.memory_widgets, args.repeat))
+    finally:
+        server.shutdown()
+
+    # --- Thumbnails ---
+    names = sorted(n for n in os.listdir(WALLPAPER_DIR) if n.startswith("clip_"))[:args.thumbnails]
+    # The first request also starts the worker pool
+    start = time.perf_counter()
+    if get_thumbnail(names[0]) is None:
+        raise RuntimeError("thumbnail generation failed; is ffmpeg available?")
+    results["thumbnail_cold_first"] = summarize([time.perf_counter() - start])
+    cold = []
+    for name in names[1:]:
+        start = time.perf_counter()
+        get_thumbnail(name)
+        cold.append(time.perf_counter() - start)
+    if cold:
+        results["thumbnail_cold"] = summarize(cold)
+    results["thumbnail_warm"] = measure(lambda: get_thumbnail(names[0]), args.repeat * 10)
+    thumbnail_service.shutdown()
+
+    return results
+
+
+def compare(results, baseline):
+    """Print the median change of every metric present in both runs."""
+    print(f"\n{'metric':34} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        change = (current["median"] - old["median"]) / old["median"] * 100 if old["median"] else 0.0
+        # Higher is better for throughput, lower for latencies
+        worse = change < 0 if current["unit"] == "MiB/s" else change > 0
+        flag = " !" if worse and abs(change) > 10 else ""
+        print(f"{name:34} {old['median']:12.6g} {current['median']:12.6g} {change:+7.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--widgets", type=int, default=300)
+    parser.add_argument("--wallpapers", type=int, default=2000)
+    parser.add_argument("--thumbnails", type=int, default=5, help="distinct clips for cold thumbnail timing")
+    parser.add_argument("--stream-mb", type=int, default=STREAM_FILE_MB)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--memory-widgets", type=int, default=20,
+                        help="widgets on the page for the memory comparison (0 to skip; needs playwright)")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the generated data directory")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    data_dir = tempfile.mkdtemp(prefix="mlw_bench_")
+    try:
+        results = run(args, data_dir)
+    finally:
+        if args.keep:
+            print(f"Data kept in {data_dir}")
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "keep")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if baseline:
+        if baseline["meta"]["params"] != report["meta"]["params"]:
+            print("\nWarning: the baseline was run with different parameters")
+        compare(results, baseline["results"])
+
+
+if __name__ == "__main__":
+    main()
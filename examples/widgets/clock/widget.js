@@ -6,19 +6,15 @@
 
   if (!hhmmEl || !dateEl) return;
   
-  function update() {
-    const now = new Date();
+  function updateTime(now = new Date()) {
     const hours = String(now.getHours()).padStart(2, '0');
     const mins = String(now.getMinutes()).padStart(2, '0');
     const secs = String(now.getSeconds()).padStart(2, '0');
-    const hhmm = `${hours}:${mins}`;
-    const s = `:${secs}`;
-
-    const hhmmEl = document.getElementById('clock-hhmm');
-    const secsEl = document.getElementById('clock-secs');
-    if (hhmmEl) hhmmEl.textContent = hhmm;
-    if (secsEl) secsEl.textContent = s;
+    hhmmEl.textContent = `${hours}:${mins}`;
+    if (secsEl) secsEl.textContent = `:${secs}`;
+  }
 
+  function updateDate(now = new Date()) {
     const dateStr = now.toLocaleDateString(undefined, {
       weekday: 'short',
       month: 'short',
@@ -27,6 +23,9 @@
     dateEl.textContent = dateStr;
   }
   
-  update();
-  setInterval(update, 1000);
+  updateTime();
+  updateDate();
+  // Shared, wall-clock aligned ticks from the widget runtime (paused while hidden)
+  Widget.onTick(1000, updateTime);
+  Widget.onMinute(updateDate);
 })();
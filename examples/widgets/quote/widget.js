@@ -23,5 +23,5 @@
   }
   
   update();
-  setInterval(update, 8000);
+  Widget.onTick(8000, update);
 })();
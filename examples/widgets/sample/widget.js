@@ -1,4 +1,9 @@
 // Sample widget isolated JavaScript
 (function() {
   console.log('[sample-widget] Initialized');
+
+  // Called by the widget runtime when the wallpaper is covered or shown again
+  Widget.onVisible(function(visible) {
+    console.log('[sample-widget] ' + (visible ? 'Visible' : 'Hidden'));
+  });
 })();
@@ -1,25 +1,32 @@
-// Status widget - shows system uptime, temp, battery (demo values)
+// Status widget - shows system uptime, CPU, memory and battery
+// (sampled by the server once for all widgets, see Widget.onSystemMetrics)
 (function() {
   const uptimeEl = document.getElementById('status-uptime');
-  const tempEl = document.getElementById('status-temp');
+  const cpuEl = document.getElementById('status-cpu');
+  const memoryEl = document.getElementById('status-memory');
   const batteryEl = document.getElementById('status-battery');
   
-  if (!uptimeEl || !tempEl || !batteryEl) return;
+  if (!uptimeEl || !cpuEl || !memoryEl || !batteryEl) return;
   
-  function update() {
-    // Demo uptime (hours since page loaded)
-    const uptime = Math.floor(Math.random() * 240) + 'h';
-    uptimeEl.textContent = uptime;
-    
-    // Demo temp
-    const temp = Math.floor(Math.random() * 20 + 35);
-    tempEl.textContent = temp + '°C';
-    
-    // Demo battery
-    const battery = Math.floor(Math.random() * 30 + 70);
-    batteryEl.textContent = battery + '%';
+  function formatUptime(seconds) {
+    const days = Math.floor(seconds / 86400);
+    const hours = Math.floor(seconds % 86400 / 3600);
+    const minutes = Math.floor(seconds % 3600 / 60);
+    if (days) return days + 'd ' + hours + 'h';
+    if (hours) return hours + 'h ' + minutes + 'm';
+    return minutes + 'm';
   }
   
-  update();
-  setInterval(update, 5000);
+  function percent(value) {
+    return value == null ? '--' : Math.round(value) + '%';
+  }
+  
+  Widget.onSystemMetrics((snapshot) => {
+    uptimeEl.textContent = snapshot.uptime_seconds == null ? '--' : formatUptime(snapshot.uptime_seconds);
+    cpuEl.textContent = percent(snapshot.cpu_percent);
+    memoryEl.textContent = percent(snapshot.memory_percent);
+    batteryEl.textContent = snapshot.battery_percent == null
+      ? '--'
+      : percent(snapshot.battery_percent) + (snapshot.on_ac ? ' ⚡' : '');
+  });
 })();
@@ -0,0 +1,70 @@
+"""
+Headless entry point: runs the HTTP server and its background services
+without Cocoa, rumps or WebKit, e.g. on a Linux box for profiling,
+benchmarks and soak tests.
+
+    python -m headless --data-dir /tmp/mlw --port 8000
+"""
+
+import argparse
+import os
+
+# Origin of the startup timing report (no side effects, safe before the MLW_* variables)
+from lib import startup
+
+# CLI option -> environment variable read by lib/constants.py
+DIR_OPTIONS = {
+    "data_dir": "MLW_DATA_DIR",
+    "wallpaper_dir": "MLW_WALLPAPER_DIR",
+    "widgets_dir": "MLW_WIDGETS_DIR",
+    "cache_dir": "MLW_CACHE_DIR",
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m headless", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on (default: 8000)")
+    parser.add_argument("--data-dir", help="settings, widget layout and default wallpaper/widget folders")
+    parser.add_argument("--wallpaper-dir", help="wallpaper videos (default: DATA_DIR/wallpapers)")
+    parser.add_argument("--widgets-dir", help="installed widgets (default: DATA_DIR/widgets)")
+    parser.add_argument("--cache-dir", help="thumbnails, variants, frames and the library index")
+    parser.add_argument("--no-background", action="store_true",
+                        help="don't start watchers, imports and the playback policy")
+    parser.add_argument("--profile", action="store_true",
+                        help="trace requests and allow ?_profile=1 (see /api/debug/slow)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Must happen before lib.constants is imported
+    for option, variable in DIR_OPTIONS.items():
+        value = getattr(args, option)
+        if value:
+            os.environ[variable] = os.path.abspath(os.path.expanduser(value))
+
+    from lib.constants import initialize_data_dirs, APP_SUPPORT_DIR, WALLPAPER_DIR, WIDGETS_DIR, CACHE_DIR
+    initialize_data_dirs()
+
+    from lib.settings_manager import SettingsManager
+    import web_server
+    startup.mark("imports")
+
+    print(f"Data: {APP_SUPPORT_DIR}")
+    print(f"Wallpapers: {WALLPAPER_DIR}")
+    print(f"Widgets: {WIDGETS_DIR}")
+    print(f"Cache: {CACHE_DIR}")
+
+    web_server.state.settings_manager = SettingsManager()
+    if args.profile:
+        web_server.profiler.configure(enabled=True)
+    web_server.initialize_wallpaper()
+    if not args.no_background:
+        web_server.start_in_background()
+    web_server.serve(host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Mutable server state shared by request threads, background jobs and the
+Cocoa main thread. Every field is read and written under one lock.
+"""
+
+import threading
+
+
+def _field(name, doc, writable=True):
+    def get(self):
+        with self.lock:
+            return self._values[name]
+
+    def set(self, value):
+        with self.lock:
+            self._values[name] = value
+
+    return property(get, set if writable else None, doc=doc)
+
+
+class AppState:
+    """Lock-protected replacement for the web server's module globals."""
+
+    current_wallpaper = _field("current_wallpaper", "Name of the selected wallpaper (see select_wallpaper)",
+                               writable=False)
+    settings_manager = _field("settings_manager", "SettingsManager, set by the app at startup")
+    space_observer = _field("space_observer", "SpaceObserver applying the desktop picture (macOS only)")
+    wallpaper_daemon = _field("wallpaper_daemon", "WallpaperDaemon owning the desktop window (macOS only)")
+    http_server = _field("http_server", "Running lib.server.WSGIServer, if any")
+
+    def __init__(self):
+        # Reentrant so compound updates can hold it across several field accesses
+        self.lock = threading.RLock()
+        self._values = {
+            "current_wallpaper": None,
+            "settings_manager": None,
+            "space_observer": None,
+            "wallpaper_daemon": None,
+            "http_server": None,
+        }
+
+    def select_wallpaper(self, name, replace=True, persist=False):
+        """
+        Make name the current wallpaper (and, with persist, the saved one) in a
+        single step. With replace=False it only fills an empty selection, so a
+        startup default can't override a choice the user made meanwhile.
+        Returns the current wallpaper afterwards.
+        """
+        with self.lock:
+            current = self._values["current_wallpaper"]
+            if name is None or (current is not None and not replace):
+                return current
+            self._values["current_wallpaper"] = name
+            settings_manager = self._values["settings_manager"]
+            if persist and settings_manager:
+                settings_manager.set_selected_background(name)
+            return name
+
+    def clear_wallpaper(self, name):
+        """Unselect name if it is still the current wallpaper (e.g. its file was deleted)."""
+        with self.lock:
+            if self._values["current_wallpaper"] != name:
+                return False
+            self._values["current_wallpaper"] = None
+            return True
@@ -0,0 +1,38 @@
+"""
+Atomic file writes: data goes to a temp file in the target's folder and is
+renamed over the target only once it is complete, so readers and crashes
+never see a truncated file.
+"""
+
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode="wb", fsync=False):
+    """
+    Open a temp file next to path for writing; it replaces path when the block
+    exits cleanly and is removed if the block raises.
+    fsync=True also flushes it to disk before the rename.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def atomic_write_json(path, data, indent=None, fsync=False):
+    """Write data as JSON to path atomically."""
+    with atomic_write(path, "w", fsync=fsync) as f:
+        json.dump(data, f, indent=indent)
@@ -0,0 +1,122 @@
+"""
+JSON config store shared by settings and the widget layout.
+The in-memory copy is authoritative: reads never touch the disk (beyond a
+stat to notice external edits), writes are coalesced for a short delay and
+persisted atomically via a temp file + rename, so a crash mid-write can't
+leave a truncated file behind.
+"""
+
+import copy
+import json
+import os
+import threading
+from lib.atomic import atomic_write_json
+from lib.profiling import traced
+
+# Seconds to wait for more changes before writing
+DEFAULT_WRITE_DELAY = 0.5
+# Upper bound of the retry delay after failed writes (doubles per failure)
+MAX_RETRY_DELAY = 60.0
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class ConfigStore:
+    """One JSON document kept in memory and persisted in the background."""
+
+    def __init__(self, path, default=None, write_delay=DEFAULT_WRITE_DELAY):
+        self.path = path
+        self.default = default
+        self.write_delay = write_delay
+        # Number of writes that reached the disk (for benchmarks/metrics)
+        self.writes = 0
+        self._lock = threading.RLock()
+        self._data = None
+        self._signature = None
+        self._dirty = False
+        self._timer = None
+        # Consecutive failed writes, for the retry backoff
+        self._failures = 0
+
+    @traced("config.read")
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                self._data = json.load(f)
+        except FileNotFoundError:
+            self._data = copy.deepcopy(self.default)
+        except (OSError, ValueError) as e:
+            print(f"Error loading {self.path}, using defaults: {e}")
+            self._data = copy.deepcopy(self.default)
+        self._signature = _signature(self.path)
+
+    def _current(self):
+        """Live data, reloaded first if the file was changed by someone else."""
+        if self._data is None:
+            self._load()
+        elif not self._dirty and _signature(self.path) != self._signature:
+            print(f"{os.path.basename(self.path)} changed on disk, reloading")
+            self._load()
+        return self._data
+
+    def load(self):
+        """A copy of the current document."""
+        with self._lock:
+            return copy.deepcopy(self._current())
+
+    def read(self, fn):
+        """Run fn on the live document under the lock and return its result (fn must not mutate it)."""
+        with self._lock:
+            return fn(self._current())
+
+    def save(self, data):
+        """Replace the document; it is written to disk shortly after."""
+        with self._lock:
+            self._data = copy.deepcopy(data)
+            self._schedule()
+
+    def update(self, fn):
+        """Mutate the live document in place with fn(data) and schedule a write."""
+        with self._lock:
+            result = fn(self._current())
+            self._schedule()
+            return result
+
+    def _schedule(self, delay=None):
+        self._dirty = True
+        # The timer isn't restarted by further changes, so a write happens at
+        # most write_delay after the first unsaved change
+        if self._timer is None:
+            self._timer = threading.Timer(self.write_delay if delay is None else delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    @traced("config.write")
+    def flush(self):
+        """Write pending changes now."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            try:
+                atomic_write_json(self.path, self._data, indent=2, fsync=True)
+            except OSError as e:
+                # Keep the changes and try again later (disk full, folder
+                # briefly unavailable, ...) instead of waiting for another save
+                self._failures += 1
+                delay = min(MAX_RETRY_DELAY, self.write_delay * 2 ** self._failures)
+                print(f"Error saving {self.path}, retrying in {delay:g}s: {e}")
+                self._schedule(delay)
+                return
+            self._failures = 0
+            self._dirty = False
+            self._signature = _signature(self.path)
+            self.writes += 1
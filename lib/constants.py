@@ -1,9 +1,21 @@
 import os, shutil
 
-APP_SUPPORT_DIR = os.path.expanduser("~/Library/Application Support/MyLiveWallpaper")
-WALLPAPER_DIR = os.path.join(APP_SUPPORT_DIR, "wallpapers")
-CACHE_DIR = "/tmp/mylivewallpaper_cache"
-WIDGETS_DIR = os.path.join(APP_SUPPORT_DIR, "widgets")
+# Every directory can be relocated through the environment (see headless.py)
+APP_SUPPORT_DIR = os.environ.get("MLW_DATA_DIR") or os.path.expanduser("~/Library/Application Support/MyLiveWallpaper")
+WALLPAPER_DIR = os.environ.get("MLW_WALLPAPER_DIR") or os.path.join(APP_SUPPORT_DIR, "wallpapers")
+# Persistent cache (survives reboots, unlike /tmp)
+CACHE_DIR = os.environ.get("MLW_CACHE_DIR") or os.path.expanduser("~/Library/Caches/MyLiveWallpaper")
+THUMBNAIL_CACHE_DIR = os.path.join(CACHE_DIR, "thumbnails")
+# Per-screen desktop stills (see lib/screen_stills.py)
+SCREEN_STILLS_CACHE_DIR = os.path.join(CACHE_DIR, "stills")
+# Display-matched video variants (see lib/variants.py)
+VARIANTS_CACHE_DIR = os.path.join(CACHE_DIR, "variants")
+# Wallpaper library index (rebuildable from the wallpaper folder)
+LIBRARY_DB_FILE = os.path.join(CACHE_DIR, "library.sqlite3")
+# Default disk budget for the cached thumbnail ladder, full-size stills not
+# counted (overridable via the "thumbnail_cache_budget_mb" setting)
+THUMBNAIL_CACHE_BUDGET = 256 * 1024 * 1024
+WIDGETS_DIR = os.environ.get("MLW_WIDGETS_DIR") or os.path.join(APP_SUPPORT_DIR, "widgets")
 
 WIDGETS_CONFIG_FILE = os.path.join(APP_SUPPORT_DIR, "widget_config.json")
 
@@ -19,28 +31,51 @@ DEFAULT_WIDGET_CONFIG = [
     {"id": "quote", "enabled": False, "x": 100, "y": 250, "height": 120},
 ]
 
+# Widgets allowed to run in the page itself (Shadow DOM) when they declare
+# <!-- lightweight: true -->; others always get an iframe. Overridable via
+# the "trusted_widgets" setting.
+DEFAULT_TRUSTED_WIDGETS = ["clock", "sample", "status", "quote"]
 
 
-# Ensure all directories exist
-os.makedirs(APP_SUPPORT_DIR, exist_ok=True)
-os.makedirs(CACHE_DIR, exist_ok=True)
-os.makedirs(WIDGETS_DIR, exist_ok=True)
 
-# Ensure widgets directory exists in App Support. If empty, populate from example widgets
 # Project examples directory (contains starter widgets/backgrounds)
 EXAMPLES_DIR = os.path.join(os.path.dirname(CURRENT_DIR), "examples")
 EXAMPLES_WIDGETS = os.path.join(EXAMPLES_DIR, "widgets")
 EXAMPLES_WALLPAPERS = os.path.join(EXAMPLES_DIR, "wallpapers")
 
-# Ensure wallpaper directory exists. If missing, copy example wallpapers there
-if not os.path.isdir(WALLPAPER_DIR):
-    shutil.copytree(EXAMPLES_WALLPAPERS, WALLPAPER_DIR)
 
+def initialize_data_dirs(seed_wallpapers=True):
+    """
+    Create the data directories and seed them with the examples on first run.
+    Copying the example videos is the slow part; pass seed_wallpapers=False
+    and call seed_example_wallpapers() later to keep it off the startup path.
+    """
+    os.makedirs(APP_SUPPORT_DIR, exist_ok=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    os.makedirs(WIDGETS_DIR, exist_ok=True)
 
-# If widgets directory inside App Support is empty, copy example widgets there
-if os.path.isdir(EXAMPLES_WIDGETS) and not os.listdir(WIDGETS_DIR):
-    for name in os.listdir(EXAMPLES_WIDGETS):
-        src = os.path.join(EXAMPLES_WIDGETS, name)
-        dst = os.path.join(WIDGETS_DIR, name)
-        if os.path.isdir(src) and not os.path.exists(dst):
-            shutil.copytree(src, dst)
+    if seed_wallpapers:
+        seed_example_wallpapers()
+
+    # If widgets directory is empty, copy example widgets there
+    if os.path.isdir(EXAMPLES_WIDGETS) and not os.listdir(WIDGETS_DIR):
+        for name in os.listdir(EXAMPLES_WIDGETS):
+            src = os.path.join(EXAMPLES_WIDGETS, name)
+            dst = os.path.join(WIDGETS_DIR, name)
+            if os.path.isdir(src) and not os.path.exists(dst):
+                shutil.copytree(src, dst)
+
+
+def seed_example_wallpapers():
+    """Create the wallpaper directory, with the example wallpapers, if it is missing."""
+    if os.path.isdir(WALLPAPER_DIR):
+        return False
+    if not os.path.isdir(EXAMPLES_WALLPAPERS):
+        os.makedirs(WALLPAPER_DIR)
+        return False
+    # Copy aside and rename, so an interrupted copy is retried on the next launch
+    partial = WALLPAPER_DIR + ".partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    shutil.copytree(EXAMPLES_WALLPAPERS, partial)
+    os.replace(partial, WALLPAPER_DIR)
+    return True
@@ -0,0 +1,90 @@
+"""
+Server-push event bus.
+Pages subscribe to /api/events (Server-Sent Events) and receive granular
+updates (widget moved, wallpaper changed, ...) instead of being reloaded.
+"""
+
+import itertools
+import json
+import queue
+import threading
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15
+# Events buffered per subscriber before it is asked to resync
+MAX_PENDING_EVENTS = 256
+
+
+class EventBus:
+    """Fans published events out to every connected subscriber queue."""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self) -> queue.Queue:
+        """Register a new subscriber and return its event queue."""
+        q = queue.Queue(maxsize=MAX_PENDING_EVENTS)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        """Remove a subscriber queue."""
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event_type: str, data=None):
+        """Send an event to all subscribers."""
+        event = (next(self._ids), event_type, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Subscriber fell behind: drop its backlog and ask it to resync
+                _drain(q)
+                try:
+                    q.put_nowait((event[0], "resync", None))
+                except queue.Full:
+                    pass
+
+    def stream(self):
+        """Generator of SSE frames for one subscriber, used as a response body."""
+        q = self.subscribe()
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                try:
+                    event_id, event_type, data = q.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(event_id, event_type, data)
+        finally:
+            self.unsubscribe(q)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+def format_event(event_id, event_type, data) -> str:
+    """Encode one event in text/event-stream format."""
+    payload = json.dumps(data if data is not None else {})
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+def _drain(q: queue.Queue):
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            return
+
+
+# Shared bus used by the web server and background services
+bus = EventBus()
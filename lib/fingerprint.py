@@ -0,0 +1,41 @@
+"""
+Content fingerprints for wallpaper files: size + mtime + a hash of the first
+and last blocks, so replacing a video under the same name yields a new key
+without reading the whole file.
+"""
+
+import hashlib
+import os
+import threading
+
+# Bytes hashed from each end of the file
+PARTIAL_HASH_BYTES = 64 * 1024
+# Memoised (path, size, mtime) entries kept before the memo is reset
+MAX_MEMO_ENTRIES = 10000
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def fingerprint(path: str) -> str:
+    """Return a short, stable fingerprint for the file at path."""
+    st = os.stat(path)
+    memo_key = (path, st.st_size, st.st_mtime_ns)
+    with _memo_lock:
+        cached = _memo.get(memo_key)
+    if cached:
+        return cached
+
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        h.update(f.read(PARTIAL_HASH_BYTES))
+        if st.st_size > PARTIAL_HASH_BYTES:
+            f.seek(max(PARTIAL_HASH_BYTES, st.st_size - PARTIAL_HASH_BYTES))
+            h.update(f.read(PARTIAL_HASH_BYTES))
+    value = f"{st.st_size:x}-{st.st_mtime_ns:x}-{h.hexdigest()[:16]}"
+
+    with _memo_lock:
+        if len(_memo) >= MAX_MEMO_ENTRIES:
+            _memo.clear()
+        _memo[memo_key] = value
+    return value
@@ -0,0 +1,183 @@
+"""
+Wallpaper import pipeline.
+New or replaced files in the wallpaper folder are picked up by a watcher and
+queued as jobs: wait for the copy to finish, validate/probe, remux MP4/MOV
+to faststart (moov atom first) so streamed playback starts immediately,
+generate thumbnails and register the metadata in the library.
+"""
+
+import os
+import struct
+import subprocess
+import threading
+import time
+from lib.library import probe_video
+from lib.fingerprint import fingerprint
+
+# Seconds between watcher scans of the wallpaper folder
+DEFAULT_POLL_INTERVAL = 2.0
+# Every Nth scan re-stats every file to catch in-place overwrites
+FULL_SCAN_EVERY = 15
+# A file is considered fully copied once its size is stable for this long
+STABLE_SECONDS = 1.0
+# Give up waiting for a copy to finish after this long
+STABLE_TIMEOUT = 600
+
+FASTSTART_EXTENSIONS = (".mp4", ".mov", ".m4v")
+
+
+def ffmpeg_binary():
+    """Path of the ffmpeg executable moviepy uses."""
+    from moviepy.config import FFMPEG_BINARY
+    return FFMPEG_BINARY
+
+
+def needs_faststart(path):
+    """
+    True if an MP4/MOV file stores its moov atom after the media data.
+    Truncated or malformed files (short reads, boxes running past the end,
+    no moov at all) are not faststart-able and return False.
+    """
+    if not path.lower().endswith(FASTSTART_EXTENSIONS):
+        return False
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        offset = 0
+        seen_mdat = False
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            header = f.read(8)
+            if len(header) < 8:
+                return False
+            size, kind = struct.unpack(">I4s", header)
+            if size == 1:
+                # 64-bit size follows the header
+                if offset + 16 > file_size:
+                    return False
+                large = f.read(8)
+                if len(large) < 8:
+                    return False
+                size = struct.unpack(">Q", large)[0]
+            elif size == 0:
+                size = file_size - offset
+            if size < 8 or offset + size > file_size:
+                return False
+            if kind == b"moov":
+                return seen_mdat
+            if kind == b"mdat":
+                seen_mdat = True
+            offset += size
+    return False
+
+
+def remux_faststart(path):
+    """Rewrite a file in place with its moov atom at the front (no re-encode)."""
+    directory, name = os.path.split(path)
+    # Hidden name: the library ignores dot-files, so the temp file is never listed
+    tmp_path = os.path.join(directory, f".{name}.faststart{os.path.splitext(name)[1]}")
+    try:
+        subprocess.run(
+            [ffmpeg_binary(), "-v", "error", "-y", "-i", path,
+             "-map", "0", "-c", "copy", "-movflags", "+faststart", tmp_path],
+            check=True, capture_output=True,
+        )
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def wait_until_stable(path, timeout=STABLE_TIMEOUT):
+    """Block until the file stops growing (e.g. a Finder copy has finished)."""
+    deadline = time.time() + timeout
+    last = None
+    while True:
+        st = os.stat(path)
+        current = (st.st_size, st.st_mtime_ns)
+        if current == last:
+            return
+        if time.time() > deadline:
+            raise TimeoutError("file is still being written")
+        last = current
+        time.sleep(STABLE_SECONDS)
+
+
+class Ingestor:
+    """Detects new wallpapers and runs them through the import pipeline."""
+
+    def __init__(self, library, thumbnail_service, jobs):
+        self.library = library
+        self.thumbnail_service = thumbnail_service
+        self.jobs = jobs
+        # Called with the wallpaper name once an import has finished
+        self.on_imported = None
+        self._importing = set()
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def enqueue(self, names):
+        """Queue an import job for each name not already being imported."""
+        for name in names:
+            with self._lock:
+                if name in self._importing:
+                    continue
+                self._importing.add(name)
+            self.jobs.submit("import", name, lambda job, name=name: self._import(job, name))
+
+    def _import(self, job, name):
+        try:
+            path = os.path.join(self.library.wallpaper_dir, name)
+
+            job.update(step="waiting for copy", progress=0.05)
+            wait_until_stable(path)
+
+            job.update(step="probing", progress=0.2)
+            try:
+                metadata = probe_video(path)
+            except Exception:
+                self.library.set_metadata(name, fingerprint(path), None)
+                raise
+
+            if needs_faststart(path):
+                job.update(step="remuxing", progress=0.4)
+                remux_faststart(path)
+                # Pick up the rewritten file while this name is still marked as importing
+                self.library.refresh(force=True)
+
+            job.update(step="thumbnails", progress=0.7)
+            self.thumbnail_service.request(name).result()
+
+            job.update(step="registering", progress=0.95)
+            self.library.set_metadata(name, fingerprint(path), metadata)
+        finally:
+            with self._lock:
+                self._importing.discard(name)
+        if self.on_imported:
+            self.on_imported(name)
+
+    def start_watcher(self, interval=DEFAULT_POLL_INTERVAL):
+        """Poll the wallpaper folder so dropped-in files are imported without a request."""
+        if self._watcher is not None:
+            return
+
+        def run():
+            scans = 0
+            while not self._stop.wait(interval):
+                scans += 1
+                try:
+                    # Changes reach enqueue() through the library's on_change hook
+                    self.library.refresh(force=scans % FULL_SCAN_EVERY == 0)
+                except Exception as e:
+                    print(f"Wallpaper watcher error: {e}")
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=run, name="wallpaper-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        if self._watcher is None:
+            return
+        self._stop.set()
+        self._watcher.join()
+        self._watcher = None
@@ -0,0 +1,150 @@
+"""
+Background job queue: a fixed number of worker threads run long tasks
+(imports, transcodes) off the request path and record their progress so
+it can be polled at /api/jobs or followed on the event stream.
+"""
+
+import collections
+import itertools
+import queue
+import threading
+import time
+
+# Finished jobs kept for /api/jobs
+DEFAULT_HISTORY = 200
+
+
+class Job:
+    """A unit of background work and its progress."""
+
+    def __init__(self, job_id, kind, target, fn, on_update):
+        self.id = job_id
+        self.kind = kind
+        self.target = target
+        self.fn = fn
+        self.state = "queued"
+        self.step = None
+        self.progress = 0.0
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._on_update = on_update
+
+    def update(self, step=None, progress=None):
+        """Report progress from inside the job function."""
+        if step is not None:
+            self.step = step
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, progress))
+        self._on_update(self)
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "target": self.target,
+            "state": self.state,
+            "step": self.step,
+            "progress": self.progress,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class JobQueue:
+    """
+    Bounded pool of worker threads draining a FIFO of jobs. Kinds listed in
+    lanes ({kind: workers}) get their own FIFO and workers, so short,
+    user-visible jobs never wait behind a batch of imports or transcodes.
+    """
+
+    def __init__(self, workers=2, history=DEFAULT_HISTORY, lanes=None):
+        self.workers = workers
+        self.lanes = dict(lanes or {})
+        # Called with a Job whenever its state or progress changes
+        self.on_update = None
+        self._queue = queue.Queue()
+        self._lane_queues = {kind: queue.Queue() for kind in self.lanes}
+        self._jobs = collections.OrderedDict()
+        self._history = history
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, args=(self._queue,), name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            for kind, workers in self.lanes.items():
+                for i in range(workers):
+                    t = threading.Thread(target=self._run, args=(self._lane_queues[kind],),
+                                         name=f"job-worker-{kind}-{i}", daemon=True)
+                    t.start()
+                    self._threads.append(t)
+
+    def submit(self, kind, target, fn):
+        """
+        Queue fn(job) to run in the background. If an identical (kind, target)
+        job is still queued or running, that job is returned instead.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.kind == kind and job.target == target and job.active:
+                    return job
+            job = Job(next(self._ids), kind, target, fn, self._notify)
+            self._jobs[job.id] = job
+            self._trim()
+        self._lane_queues.get(kind, self._queue).put(job)
+        self._notify(job)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self, active_only=False):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job for job in jobs if job.active or not active_only]
+
+    @property
+    def depth(self):
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize() + sum(q.qsize() for q in self._lane_queues.values())
+
+    def _run(self, jobs):
+        while True:
+            job = jobs.get()
+            job.state = "running"
+            job.started = time.time()
+            self._notify(job)
+            try:
+                job.fn(job)
+                job.state = "done"
+                job.progress = 1.0
+            except Exception as e:
+                print(f"Job {job.kind} {job.target} failed: {e}")
+                job.state = "failed"
+                job.error = str(e)
+            job.finished = time.time()
+            self._notify(job)
+
+    def _notify(self, job):
+        if self.on_update:
+            self.on_update(job)
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self._history)]:
+            del self._jobs[job_id]
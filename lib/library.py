@@ -0,0 +1,208 @@
+"""
+Wallpaper library: persistent SQLite index of the wallpaper folder.
+Rows are updated incrementally (only files whose size/mtime changed are
+re-fingerprinted) and carry probed metadata, so listing, search, pagination
+and name lookups never rescan the folder.
+"""
+
+import os
+import sqlite3
+import threading
+from lib.fingerprint import fingerprint
+from lib.profiling import traced
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".webm")
+
+# Accepted ?sort= values -> ORDER BY expression
+SORT_COLUMNS = {
+    "name": "name COLLATE NOCASE",
+    "size": "size",
+    "modified": "mtime_ns",
+    "duration": "duration",
+}
+
+METADATA_FIELDS = ("duration", "width", "height", "fps", "codec")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wallpapers (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    duration REAL,
+    width INTEGER,
+    height INTEGER,
+    fps REAL,
+    codec TEXT,
+    probed INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def is_wallpaper_file(name):
+    """Video files we can play; hidden and partially written files are skipped."""
+    return not name.startswith(".") and name.lower().endswith(VIDEO_EXTENSIONS)
+
+
+@traced("video.probe")
+def probe_video(path):
+    """Read duration, resolution, fps and codec of a video via ffmpeg."""
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+    infos = ffmpeg_parse_infos(path)
+    if not infos.get("video_found"):
+        raise ValueError("no video stream")
+    width, height = infos.get("video_size") or (None, None)
+    return {
+        "duration": infos.get("duration"),
+        "width": width,
+        "height": height,
+        "fps": infos.get("video_fps"),
+        "codec": infos.get("video_codec_name"),
+    }
+
+
+class WallpaperLibrary:
+    """Indexed view of the wallpaper folder."""
+
+    def __init__(self, wallpaper_dir, db_path):
+        self.wallpaper_dir = wallpaper_dir
+        self.db_path = db_path
+        # Called with (added, removed, changed) name sets after a refresh that found changes
+        self.on_change = None
+        self._lock = threading.RLock()
+        self._conn = None
+        self._dir_mtime = None
+        self._names = []
+        self._name_set = frozenset()
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute(SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+    @traced("library.refresh")
+    def refresh(self, force=False):
+        """
+        Bring the index up to date with the folder. Cheap when nothing changed:
+        a single stat of the folder unless force=True.
+        Returns (added, removed, changed) sets of names.
+        """
+        try:
+            dir_mtime = os.stat(self.wallpaper_dir).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        if not force and self._dir_mtime is not None and dir_mtime == self._dir_mtime:
+            return set(), set(), set()
+
+        with self._lock:
+            db = self._db()
+            known = {row["name"]: (row["size"], row["mtime_ns"])
+                     for row in db.execute("SELECT name, size, mtime_ns FROM wallpapers")}
+            try:
+                names = [f for f in os.listdir(self.wallpaper_dir) if is_wallpaper_file(f)]
+            except OSError:
+                names = []
+
+            added, changed = set(), set()
+            for name in names:
+                path = os.path.join(self.wallpaper_dir, name)
+                try:
+                    st = os.stat(path)
+                    if known.get(name) == (st.st_size, st.st_mtime_ns):
+                        continue
+                    fp = fingerprint(path)
+                except OSError:
+                    continue
+                (changed if name in known else added).add(name)
+                # New or replaced file: metadata must be probed again
+                db.execute(
+                    "INSERT OR REPLACE INTO wallpapers (name, size, mtime_ns, fingerprint, probed) "
+                    "VALUES (?, ?, ?, ?, 0)",
+                    (name, st.st_size, st.st_mtime_ns, fp),
+                )
+
+            removed = set(known) - set(names)
+            db.executemany("DELETE FROM wallpapers WHERE name = ?", [(n,) for n in removed])
+            db.commit()
+
+            self._names = [row["name"] for row in
+                           db.execute("SELECT name FROM wallpapers ORDER BY name")]
+            self._name_set = frozenset(self._names)
+            self._dir_mtime = dir_mtime
+
+        if self.on_change and (added or removed or changed):
+            self.on_change(added, removed, changed)
+        return added, removed, changed
+
+    def names(self):
+        """All wallpaper names, sorted."""
+        self.refresh()
+        return list(self._names)
+
+    def contains(self, name):
+        """O(1) membership check."""
+        self.refresh()
+        return name in self._name_set
+
+    def get(self, name):
+        """Indexed row for a wallpaper as a dict, or None."""
+        self.refresh()
+        with self._lock:
+            row = self._db().execute("SELECT * FROM wallpapers WHERE name = ?", (name,)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def query(self, offset=0, limit=None, query=None, sort="name", descending=False):
+        """
+        Page through the library. Returns (total, items) where total counts
+        every match of `query` (case-insensitive substring of the name).
+        """
+        self.refresh()
+        where, params = "", []
+        if query:
+            where = "WHERE name LIKE ? ESCAPE '\\'"
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        order = SORT_COLUMNS.get(sort, SORT_COLUMNS["name"]) + (" DESC" if descending else "")
+
+        with self._lock:
+            db = self._db()
+            total = db.execute(f"SELECT COUNT(*) FROM wallpapers {where}", params).fetchone()[0]
+            rows = db.execute(
+                f"SELECT * FROM wallpapers {where} ORDER BY {order}, name LIMIT ? OFFSET ?",
+                params + [limit if limit is not None else -1, max(0, offset)],
+            ).fetchall()
+        return total, [_row_to_dict(row) for row in rows]
+
+    def unprobed(self):
+        """(name, fingerprint) of wallpapers whose metadata hasn't been probed yet."""
+        with self._lock:
+            rows = self._db().execute("SELECT name, fingerprint FROM wallpapers WHERE probed = 0").fetchall()
+        return [(row["name"], row["fingerprint"]) for row in rows]
+
+    def set_metadata(self, name, fp, metadata):
+        """
+        Store probed metadata for one version of a wallpaper (ignored if the file
+        has since been replaced). metadata=None records a failed probe.
+        """
+        with self._lock:
+            db = self._db()
+            if metadata is None:
+                db.execute("UPDATE wallpapers SET probed = -1 WHERE name = ? AND fingerprint = ?", (name, fp))
+            else:
+                db.execute(
+                    "UPDATE wallpapers SET duration = ?, width = ?, height = ?, fps = ?, codec = ?, "
+                    "probed = 1 WHERE name = ? AND fingerprint = ?",
+                    tuple(metadata.get(k) for k in METADATA_FIELDS) + (name, fp),
+                )
+            db.commit()
+
+
+def _row_to_dict(row):
+    item = dict(row)
+    item["probed"] = item["probed"] == 1
+    return item
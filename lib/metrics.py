@@ -0,0 +1,208 @@
+"""
+In-process metrics in the Prometheus text format (served at /api/metrics).
+Counters and histograms are plain dicts behind a lock, and gauges are read
+from callbacks at scrape time, so instrumentation is cheap enough to leave on.
+"""
+
+import bisect
+import threading
+import time
+
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Thumbnail render time buckets in seconds
+RENDER_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, by=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + by
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, (list(e[0]), e[1], e[2])) for labels, e in self._values.items()]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {count}"
+
+
+class Gauge:
+    """Value read at scrape time: fn() returns a number or {label values tuple: number}."""
+    kind = "gauge"
+
+    def __init__(self, name, help, fn, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.fn = fn
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"Metric {self.name} failed: {e}")
+            return
+        if value is None:
+            return
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, fn, labels=()):
+        return self.register(Gauge(name, help, fn, labels))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    "mlw_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+HTTP_LATENCY = registry.histogram(
+    "mlw_http_request_duration_seconds", "Time until the response was fully sent, by route.", ("route",))
+HTTP_BYTES = registry.counter(
+    "mlw_http_response_bytes_total", "Response body bytes served, by route.", ("route",))
+THUMBNAIL_CACHE = registry.counter(
+    "mlw_thumbnail_cache_total", "Thumbnail cache lookups and evictions (result=hit|miss|eviction).", ("result",))
+THUMBNAIL_RENDER = registry.histogram(
+    "mlw_thumbnail_render_seconds", "Time to generate a thumbnail set, including queueing.", buckets=RENDER_BUCKETS)
+FRAME_CACHE = registry.counter(
+    "mlw_frame_cache_total", "Widget frame lookups and stale frames replaced (result=memory|disk|compiled|eviction).", ("result",))
+DAEMON_RELOADS = registry.counter(
+    "mlw_daemon_reloads_total", "Full reloads of the desktop wallpaper page.")
+
+
+class _ObservedResponse:
+    """Wraps a WSGI response iterable to count bytes and time the whole transfer."""
+
+    def __init__(self, result, environ, status, start):
+        self._result = result
+        self._environ = environ
+        self._status = status
+        self._start = start
+        self._bytes = 0
+
+    def __iter__(self):
+        for data in self._result:
+            self._bytes += len(data)
+            yield data
+
+    def close(self):
+        try:
+            if hasattr(self._result, "close"):
+                self._result.close()
+        finally:
+            route = self._environ.get("mlw.route", "unmatched")
+            HTTP_REQUESTS.inc(route, self._environ["REQUEST_METHOD"], self._status[0])
+            HTTP_LATENCY.observe(time.perf_counter() - self._start, route)
+            if self._bytes:
+                HTTP_BYTES.inc(route, by=self._bytes)
+
+
+def instrument_wsgi(app):
+    """
+    WSGI middleware recording request metrics. The route label is read from
+    environ["mlw.route"], which the application sets once it has matched a URL rule.
+    """
+    def wrapped(environ, start_response):
+        start = time.perf_counter()
+        status = ["000"]
+
+        def observed_start_response(status_line, headers, exc_info=None):
+            status[0] = status_line[:3]
+            return start_response(status_line, headers, exc_info)
+
+        return _ObservedResponse(app(environ, observed_start_response), environ, status, start)
+
+    return wrapped
@@ -0,0 +1,251 @@
+"""
+Playback policy engine.
+Collects signals (power source, battery level, thermal state, occlusion,
+idle time, user schedule) from pluggable sources and decides whether the
+daemon page should play the full video, a reduced-fps variant, or hold a
+still frame. Every source has a stub so the policy runs anywhere.
+"""
+
+import datetime
+import re
+import subprocess
+import sys
+import threading
+
+MODES = ("full", "reduced", "still")
+
+# Frame-rate cap of the "reduced" rendition
+REDUCED_FPS = 15
+
+DEFAULT_POLICY = {
+    "enabled": True,
+    # Hold a still frame after this many seconds without user input
+    "idle_still_after": 600,
+    # On battery: reduced playback, and a still frame at or below this level
+    "low_battery_percent": 20,
+    # [{"start": "23:00", "end": "07:00", "mode": "still"}, ...] in local time
+    "schedule": [],
+}
+
+# Seconds between signal samples
+DEFAULT_INTERVAL = 10.0
+
+
+# --- Signal sources ---
+
+class SignalSource:
+    """Base class: read() returns a dict with any subset of the known signals."""
+    name = "source"
+
+    def read(self):
+        return {}
+
+
+class StaticSource(SignalSource):
+    """
+    Stub source returning fixed values (Linux, headless runs, tests).
+    Shared with the system metrics provider, whose sources have the same shape.
+    """
+    name = "static"
+
+    def __init__(self, **values):
+        self.values = values
+
+    def read(self):
+        return dict(self.values)
+
+
+class ManualSource(SignalSource):
+    """Source whose values are pushed in by the app (e.g. window occlusion)."""
+
+    def __init__(self, name="manual", **signals):
+        self.name = name
+        self._signals = dict(signals)
+        self._lock = threading.Lock()
+
+    def set(self, **signals):
+        with self._lock:
+            self._signals.update(signals)
+
+    def read(self):
+        with self._lock:
+            return dict(self._signals)
+
+
+class PmsetPowerSource(SignalSource):
+    """macOS power source and battery level via `pmset -g batt`."""
+    name = "pmset"
+
+    def read(self):
+        out = subprocess.run(["pmset", "-g", "batt"], capture_output=True, text=True, timeout=5).stdout
+        signals = {"on_ac": "AC Power" in out}
+        match = re.search(r"(\d+)%", out)
+        if match:
+            signals["battery_percent"] = int(match.group(1))
+        return signals
+
+
+class PmsetThermalSource(SignalSource):
+    """macOS thermal throttling via `pmset -g therm` (CPU speed limit below 100%)."""
+    name = "thermal"
+
+    def read(self):
+        out = subprocess.run(["pmset", "-g", "therm"], capture_output=True, text=True, timeout=5).stdout
+        match = re.search(r"CPU_Speed_Limit\s*=\s*(\d+)", out)
+        limit = int(match.group(1)) if match else 100
+        if limit >= 100:
+            pressure = "nominal"
+        elif limit >= 70:
+            pressure = "serious"
+        else:
+            pressure = "critical"
+        return {"thermal_pressure": pressure}
+
+
+class IORegIdleSource(SignalSource):
+    """macOS seconds since the last keyboard/mouse input via IOHIDSystem."""
+    name = "idle"
+
+    def read(self):
+        out = subprocess.run(["ioreg", "-c", "IOHIDSystem", "-d", "4"],
+                             capture_output=True, text=True, timeout=5).stdout
+        match = re.search(r'"HIDIdleTime"\s*=\s*(\d+)', out)
+        return {"idle_seconds": int(match.group(1)) / 1e9} if match else {}
+
+
+class ScheduleSource(SignalSource):
+    """User schedule: reports the mode of the time window we're in, if any."""
+    name = "schedule"
+
+    def __init__(self, schedule, clock=None):
+        self.schedule = schedule or []
+        self.clock = clock or datetime.datetime.now
+
+    def read(self):
+        now = self.clock().time()
+        for window in self.schedule:
+            start = datetime.time.fromisoformat(window["start"])
+            end = datetime.time.fromisoformat(window["end"])
+            inside = start <= now < end if start <= end else (now >= start or now < end)
+            if inside and window.get("mode") in MODES:
+                return {"scheduled_mode": window["mode"]}
+        return {"scheduled_mode": None}
+
+
+def default_sources():
+    """Platform sources on macOS, stubs elsewhere."""
+    if sys.platform == "darwin":
+        return [PmsetPowerSource(), PmsetThermalSource(), IORegIdleSource()]
+    return [StaticSource(on_ac=True, thermal_pressure="nominal", idle_seconds=0)]
+
+
+# --- Policy ---
+
+def decide(signals, policy=DEFAULT_POLICY):
+    """Pure policy: map merged signals to (mode, reason)."""
+    if signals.get("scheduled_mode"):
+        return signals["scheduled_mode"], "schedule"
+    if signals.get("occluded"):
+        return "still", "occluded"
+    idle = signals.get("idle_seconds")
+    if idle is not None and policy["idle_still_after"] and idle >= policy["idle_still_after"]:
+        return "still", "idle"
+    thermal = signals.get("thermal_pressure")
+    if thermal == "critical":
+        return "still", "thermal"
+    if thermal == "serious":
+        return "reduced", "thermal"
+    if signals.get("on_ac") is False:
+        battery = signals.get("battery_percent")
+        if battery is not None and battery <= policy["low_battery_percent"]:
+            return "still", "low battery"
+        return "reduced", "on battery"
+    return "full", "default"
+
+
+class PlaybackPolicy:
+    """Samples sources periodically and reports playback mode changes."""
+
+    def __init__(self, sources=None, policy=None, interval=DEFAULT_INTERVAL):
+        self.sources = list(sources) if sources is not None else default_sources()
+        self.policy = dict(DEFAULT_POLICY)
+        self._schedule = ScheduleSource([])
+        self.sources.append(self._schedule)
+        self.configure(policy or {})
+        self.interval = interval
+        # Called with (mode, reason, signals) whenever the mode changes
+        self.on_change = None
+        self.mode = "full"
+        self.reason = "default"
+        self.signals = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = False
+
+    def add_source(self, source):
+        self.sources.append(source)
+
+    def configure(self, policy):
+        """Apply user policy settings (see DEFAULT_POLICY)."""
+        self.policy.update(policy)
+        self._schedule.schedule = self.policy["schedule"] or []
+
+    def sample(self):
+        """Merge readings of every source; later sources win on conflicts."""
+        signals = {}
+        for source in self.sources:
+            try:
+                signals.update(source.read())
+            except Exception as e:
+                print(f"Playback signal source {source.name} failed: {e}")
+        return signals
+
+    def evaluate(self):
+        """Sample, decide and notify on change. Returns the current mode."""
+        signals = self.sample()
+        if self.policy["enabled"]:
+            mode, reason = decide(signals, self.policy)
+        else:
+            mode, reason = "full", "policy disabled"
+        with self._lock:
+            changed = mode != self.mode
+            self.mode, self.reason, self.signals = mode, reason, signals
+        if changed:
+            print(f"Playback mode: {mode} ({reason})")
+            if self.on_change:
+                self.on_change(mode, reason, signals)
+        return mode
+
+    def poke(self):
+        """Re-evaluate now (e.g. right after an occlusion change)."""
+        self._wake.set()
+
+    def state(self):
+        with self._lock:
+            return {"mode": self.mode, "reason": self.reason, "signals": dict(self.signals)}
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        def run():
+            while not self._stop:
+                try:
+                    self.evaluate()
+                except Exception as e:
+                    print(f"Playback policy error: {e}")
+                self._wake.wait(self.interval)
+                self._wake.clear()
+
+        self._stop = False
+        self._thread = threading.Thread(target=run, name="playback-policy", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop = True
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
@@ -0,0 +1,241 @@
+"""
+Opt-in request profiling and tracing.
+
+Off by default. When enabled (the "profiling" setting, or MLW_PROFILING=1):
+- every request is traced: span("name") blocks inside it record their timings,
+- requests slower than slow_ms go to a ring buffer served at /api/debug/slow,
+- a request sent with ?_profile=1 or an "X-Profile: 1" header is run under
+  cProfile; the X-Profile-Id response header names the report at
+  /api/debug/profiles/<id>.
+
+While disabled, span() returns a shared no-op and the middleware passes
+requests straight through.
+"""
+
+import collections
+import cProfile
+import functools
+import io
+import itertools
+import os
+import pstats
+import threading
+import time
+
+# Defaults for the "profiling" setting
+DEFAULT_SLOW_MS = 250
+DEFAULT_KEEP = 50
+# Rows of the cumulative-time table in a profile report
+PROFILE_ROWS = 60
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("trace", "name", "meta", "start", "depth")
+
+    def __init__(self, trace, name, meta):
+        self.trace = trace
+        self.name = name
+        self.meta = meta
+
+    def __enter__(self):
+        self.depth = self.trace.depth
+        self.trace.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.trace.depth -= 1
+        entry = {
+            "name": self.name,
+            "start_ms": round((self.start - self.trace.start) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "depth": self.depth,
+        }
+        if self.meta:
+            entry["meta"] = self.meta
+        self.trace.spans.append(entry)
+        return False
+
+
+class Trace:
+    """Spans recorded on one thread while it handles a request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.slow_ms = DEFAULT_SLOW_MS
+        self._local = threading.local()
+        self._slow = collections.deque(maxlen=DEFAULT_KEEP)
+        self._profiles = collections.OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # cProfile can't run on two threads at once
+        self._cprofile_lock = threading.Lock()
+
+    def configure(self, enabled=None, slow_ms=None, keep=None):
+        if slow_ms is not None:
+            self.slow_ms = float(slow_ms)
+        if keep is not None:
+            with self._lock:
+                self._slow = collections.deque(self._slow, maxlen=int(keep))
+        if enabled is not None:
+            self.enabled = bool(enabled)
+
+    def span(self, name, **meta):
+        """Context manager timing a block within the current request's trace."""
+        if not self.enabled:
+            return _NO_SPAN
+        trace = getattr(self._local, "trace", None)
+        if trace is None:
+            return _NO_SPAN
+        return _Span(trace, name, meta)
+
+    def slow_requests(self):
+        """Recorded slow or profiled requests, newest first."""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def profile_report(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def _record(self, entry, report=None):
+        with self._lock:
+            if report is not None:
+                self._profiles[entry["id"]] = report
+                # Only keep reports still referenced from the ring buffer
+                while len(self._profiles) > self._slow.maxlen:
+                    self._profiles.popitem(last=False)
+            self._slow.append(entry)
+
+    def wsgi(self, app):
+        """WSGI middleware tracing (and, on request, profiling) each request."""
+        def wrapped(environ, start_response):
+            if not self.enabled:
+                return app(environ, start_response)
+            return _TracedResponse(self, app, environ, start_response)
+        return wrapped
+
+
+class _TracedResponse:
+    """Runs the app and drains its body on the request thread, with a Trace attached."""
+
+    def __init__(self, profiler, app, environ, start_response):
+        self.profiler = profiler
+        self.environ = environ
+        self.id = next(profiler._ids)
+        self.status = "000"
+        self.trace = Trace()
+        query = environ.get("QUERY_STRING", "")
+        wants_profile = environ.get("HTTP_X_PROFILE") == "1" or "_profile=1" in query.split("&")
+        self.cprofile = None
+        if wants_profile and profiler._cprofile_lock.acquire(blocking=False):
+            self.cprofile = cProfile.Profile()
+
+        def traced_start_response(status, headers, exc_info=None):
+            self.status = status[:3]
+            if wants_profile:
+                headers = list(headers) + [("X-Profile-Id", str(self.id) if self.cprofile else "busy")]
+            return start_response(status, headers, exc_info)
+
+        self._attach()
+        try:
+            self.result = app(environ, traced_start_response)
+        except BaseException:
+            if self.cprofile:
+                profiler._cprofile_lock.release()
+            raise
+        finally:
+            self._detach()
+
+    def _attach(self):
+        self.profiler._local.trace = self.trace
+        if self.cprofile:
+            self.cprofile.enable()
+
+    def _detach(self):
+        if self.cprofile:
+            self.cprofile.disable()
+        self.profiler._local.trace = None
+
+    def __iter__(self):
+        iterator = iter(self.result)
+        while True:
+            self._attach()
+            try:
+                data = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._detach()
+            yield data
+
+    def close(self):
+        try:
+            if hasattr(self.result, "close"):
+                self.result.close()
+        finally:
+            if self.cprofile:
+                self.profiler._cprofile_lock.release()
+            self._finish()
+
+    def _finish(self):
+        duration_ms = (time.perf_counter() - self.trace.start) * 1000
+        if duration_ms < self.profiler.slow_ms and not self.cprofile:
+            return
+        entry = {
+            "id": self.id,
+            "time": time.time(),
+            "method": self.environ.get("REQUEST_METHOD"),
+            "path": self.environ.get("PATH_INFO"),
+            "query": self.environ.get("QUERY_STRING", ""),
+            "route": self.environ.get("mlw.route", "unmatched"),
+            "status": self.status,
+            "duration_ms": round(duration_ms, 3),
+            "spans": sorted(self.trace.spans, key=lambda s: s["start_ms"]),
+            "profiled": self.cprofile is not None,
+        }
+        report = None
+        if self.cprofile:
+            out = io.StringIO()
+            pstats.Stats(self.cprofile, stream=out).sort_stats("cumulative").print_stats(PROFILE_ROWS)
+            report = out.getvalue()
+        self.profiler._record(entry, report)
+
+
+profiler = Profiler()
+if os.environ.get("MLW_PROFILING") == "1":
+    profiler.configure(enabled=True)
+
+span = profiler.span
+
+
+def traced(name):
+    """Decorator running the function inside span(name); a flag check while disabled."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return fn(*args, **kwargs)
+            with profiler.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
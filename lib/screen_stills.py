@@ -0,0 +1,72 @@
+"""
+Per-screen still wallpapers for the macOS desktop.
+Instead of handing every display the full-resolution first-frame PNG, each
+screen gets a JPEG cropped and scaled to its own pixel size, cached by
+(video fingerprint, geometry) so space changes just reapply existing files.
+"""
+
+import os
+import threading
+from lib.atomic import atomic_write
+from lib.screens import pixel_size
+from lib.profiling import traced
+
+JPEG_OPTIONS = {"quality": 85, "optimize": True, "progressive": True}
+
+
+@traced("still.decode")
+def render_screen_still(still_path, out_path, width, height):
+    """Crop the still to the screen's aspect ratio (like object-fit: cover) and scale it."""
+    from PIL import Image, ImageOps
+
+    with Image.open(still_path) as img:
+        # Never upscale: if the source can't cover the screen, crop it to the
+        # screen's aspect ratio at the largest size it does cover
+        scale = min(1.0, img.width / width, img.height / height)
+        if scale < 1.0:
+            width, height = max(1, int(width * scale)), max(1, int(height * scale))
+        fitted = ImageOps.fit(img.convert("RGB"), (width, height), Image.LANCZOS)
+
+    with atomic_write(out_path) as f:
+        fitted.save(f, "JPEG", **JPEG_OPTIONS)
+
+
+class ScreenStills:
+    """Disk cache of per-screen stills."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+
+    def path_for(self, key, width, height):
+        return os.path.join(self.cache_dir, f"{key}-{width}x{height}.jpg")
+
+    def render(self, key, still_path, screens):
+        """
+        Return {screen id: image path} for the given video version (key is its
+        fingerprint), rendering only geometries that aren't cached yet.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        images = {}
+        for screen in screens:
+            width, height = pixel_size(screen)
+            path = self.path_for(key, width, height)
+            with self._lock:
+                if not os.path.exists(path):
+                    render_screen_still(still_path, path, width, height)
+            images[screen["id"]] = path
+        return images
+
+    def prune(self, keys):
+        """Delete stills of video versions that are no longer in the library."""
+        keep = set(keys)
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".jpg") and name.rsplit("-", 1)[0] not in keep:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
@@ -0,0 +1,88 @@
+"""
+Screen enumeration behind a small provider interface.
+The Cocoa provider reads NSScreen; the fake one returns fixed geometries so
+per-screen code (stills, variants, /api/screen) runs headless.
+"""
+
+# Fallback geometry when Cocoa isn't available
+DEFAULT_SCREEN = {
+    "id": "main",
+    "main": True,
+    "frame": {"width": 1920, "height": 1080, "x": 0, "y": 0},
+    "visible": {"width": 1920, "height": 1080, "x": 0, "y": 0},
+    "scale": 1.0,
+}
+
+
+def pixel_size(screen):
+    """(width, height) of a screen in device pixels."""
+    return (
+        int(round(screen["frame"]["width"] * screen["scale"])),
+        int(round(screen["frame"]["height"] * screen["scale"])),
+    )
+
+
+def _rect(rect):
+    return {
+        "width": int(rect.size.width),
+        "height": int(rect.size.height),
+        "x": int(rect.origin.x),
+        "y": int(rect.origin.y),
+    }
+
+
+class ScreenProvider:
+    """Base class: screens() returns one geometry dict per display."""
+
+    def screens(self):
+        raise NotImplementedError
+
+    def main(self):
+        """Geometry of the main screen (the one with the menu bar)."""
+        screens = self.screens()
+        for screen in screens:
+            if screen.get("main"):
+                return screen
+        return screens[0] if screens else DEFAULT_SCREEN
+
+
+class CocoaScreenProvider(ScreenProvider):
+    """Live displays from NSScreen."""
+
+    def __init__(self):
+        from Cocoa import NSScreen
+        self._ns_screen = NSScreen
+
+    def screens(self):
+        main = self._ns_screen.mainScreen()
+        result = []
+        for screen in self._ns_screen.screens():
+            result.append({
+                "id": str(screen.deviceDescription()["NSScreenNumber"]),
+                "main": screen == main,
+                "frame": _rect(screen.frame()),
+                "visible": _rect(screen.visibleFrame()),
+                "scale": float(screen.backingScaleFactor()),
+            })
+        return result
+
+
+class FakeScreenProvider(ScreenProvider):
+    """Fixed list of screen geometries (headless runs, tests)."""
+
+    def __init__(self, screens=None):
+        self._screens = [dict(s) for s in (screens or [DEFAULT_SCREEN])]
+
+    def set_screens(self, screens):
+        self._screens = [dict(s) for s in screens]
+
+    def screens(self):
+        return [dict(s) for s in self._screens]
+
+
+def default_screen_provider():
+    """NSScreen-backed provider on macOS, a single fake 1080p screen elsewhere."""
+    try:
+        return CocoaScreenProvider()
+    except Exception:
+        return FakeScreenProvider()
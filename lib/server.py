@@ -0,0 +1,428 @@
+"""
+Embeddable multi-threaded WSGI server (HTTP/1.1 with keep-alive).
+Idle connections wait in a selector instead of holding a thread, and each
+request is handed to a bounded worker pool chosen from its request line, so
+video transfers, thumbnail decodes and event streams can't starve the small
+API calls the daemon page depends on.
+"""
+
+import collections
+import selectors
+import socket
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import unquote_to_bytes, urlsplit
+
+# Worker threads per request class (see WSGIServer.classify). An event stream
+# holds its worker for as long as the page stays connected, so "events" caps
+# the number of pages (daemon, selector, widget center...) open at once
+DEFAULT_POOLS = {"api": 8, "stream": 4, "events": 16}
+# Seconds an idle keep-alive connection stays open
+DEFAULT_KEEP_ALIVE = 15.0
+# Socket timeout while reading a request or writing a response
+DEFAULT_REQUEST_TIMEOUT = 30.0
+# Unread request bodies up to this size are drained to keep the connection alive
+MAX_DRAIN_BYTES = 64 * 1024
+# Bytes peeked from a connection to classify its request line
+PEEK_BYTES = 2048
+
+
+class _Input:
+    """wsgi.input limited to the request's Content-Length."""
+
+    def __init__(self, rfile, length):
+        self._rfile = rfile
+        self.remaining = length
+
+    def _limit(self, size):
+        if size is None or size < 0 or size > self.remaining:
+            return self.remaining
+        return size
+
+    def read(self, size=-1):
+        size = self._limit(size)
+        data = self._rfile.read(size) if size else b""
+        self.remaining -= len(data)
+        return data
+
+    def readline(self, size=-1):
+        size = self._limit(size)
+        data = self._rfile.readline(size) if size else b""
+        self.remaining -= len(data)
+        return data
+
+    def readlines(self, hint=-1):
+        return list(self)
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def drain(self, limit):
+        """Discard the unread body; False if it's too large or the client went away."""
+        if self.remaining > limit:
+            return False
+        while self.remaining:
+            if not self.read(65536):
+                return False
+        return True
+
+
+class _SocketWriter:
+    def __init__(self, sock):
+        self._sock = sock
+
+    def write(self, data):
+        self._sock.sendall(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class Connection:
+    """A client socket plus the read buffer that persists across its requests."""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.rfile = sock.makefile("rb")
+        self.wfile = _SocketWriter(sock)
+        self.idle_since = time.monotonic()
+
+    def has_buffered_request(self):
+        """True if (part of) a next request already arrived, e.g. a pipelined one."""
+        timeout = self.sock.gettimeout()
+        self.sock.settimeout(0)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.sock.settimeout(timeout)
+
+    def close(self):
+        try:
+            self.rfile.close()
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Runs one request of a connection through the WSGI app."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "MyLiveWallpaper"
+
+    def __init__(self, conn, server):
+        # No socketserver setup: the buffers belong to the persistent connection
+        self.connection = self.request = conn.sock
+        self.client_address = conn.address
+        self.server = server
+        self.rfile = conn.rfile
+        self.wfile = conn.wfile
+        self.close_connection = True
+
+    def __getattr__(self, name):
+        # Every HTTP method goes to the WSGI app
+        if name.startswith("do_"):
+            return self.run_wsgi
+        raise AttributeError(name)
+
+    def log_request(self, code="-", size="-"):
+        pass
+
+    def log_message(self, format, *args):
+        print(f"HTTP {self.client_address[0]}: {format % args}")
+
+    def make_environ(self, body):
+        target = self.path
+        if target.startswith(("http://", "https://")):
+            parts = urlsplit(target)
+            target = parts.path + ("?" + parts.query if parts.query else "")
+        path, _, query = target.partition("?")
+        environ = {
+            "REQUEST_METHOD": self.command,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": unquote_to_bytes(path).decode("latin-1"),
+            "QUERY_STRING": query,
+            "SERVER_NAME": self.server.host,
+            "SERVER_PORT": str(self.server.port),
+            "SERVER_PROTOCOL": self.request_version,
+            "REMOTE_ADDR": self.client_address[0],
+            "REMOTE_PORT": str(self.client_address[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": body,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in self.headers.items():
+            # X-Foo_Bar and X-Foo-Bar would both become HTTP_X_FOO_BAR; drop the
+            # underscore form so it can't spoof or smuggle the dashed header
+            if "_" in name:
+                continue
+            key = name.upper().replace("-", "_")
+            if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                key = "HTTP_" + key
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def run_wsgi(self):
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            self.send_error(411, "Chunked request bodies are not supported")
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self.send_error(400, "Bad Content-Length")
+            return
+
+        body = _Input(self.rfile, length)
+        environ = self.make_environ(body)
+        response = {"status": None, "headers": None, "sent": False, "chunked": False}
+
+        def write(data):
+            if not response["sent"]:
+                response["sent"] = True
+                code, _, reason = response["status"].partition(" ")
+                code = int(code)
+                self.send_response(code, reason)
+                names = set()
+                for name, value in response["headers"]:
+                    self.send_header(name, value)
+                    names.add(name.lower())
+                if ("content-length" not in names and self.command != "HEAD"
+                        and not (100 <= code < 200 or code in (204, 304))):
+                    if self.request_version >= "HTTP/1.1":
+                        response["chunked"] = True
+                        self.send_header("Transfer-Encoding", "chunked")
+                    else:
+                        self.close_connection = True
+                if self.close_connection:
+                    self.send_header("Connection", "close")
+                self.end_headers()
+            if data:
+                if response["chunked"]:
+                    data = b"%x\r\n%s\r\n" % (len(data), data)
+                self.wfile.write(data)
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info:
+                try:
+                    if response["sent"]:
+                        raise exc_info[1].with_traceback(exc_info[2])
+                finally:
+                    exc_info = None
+            elif response["status"] is not None:
+                raise AssertionError("Headers already set")
+            response["status"], response["headers"] = status, headers
+            return write
+
+        try:
+            result = self.server.app(environ, start_response)
+            try:
+                for data in result:
+                    if data:
+                        write(data)
+                if not response["sent"]:
+                    write(b"")
+                if response["chunked"]:
+                    self.wfile.write(b"0\r\n\r\n")
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+        except (ConnectionError, TimeoutError):
+            self.close_connection = True
+            return
+        except Exception:
+            print(f"Error on request {self.command} {self.path}:")
+            traceback.print_exc()
+            if response["sent"]:
+                self.close_connection = True
+            else:
+                self.send_error(500)
+            return
+
+        # The next request starts right after this one's body
+        if not body.drain(MAX_DRAIN_BYTES):
+            self.close_connection = True
+
+
+def request_path(head):
+    """(method, path) from the start of a raw request, query string stripped."""
+    line = head.split(b"\r\n", 1)[0].split()
+    if len(line) < 2:
+        return "", "/"
+    method, target = line[0].decode("latin-1"), line[1].decode("latin-1")
+    if target.startswith(("http://", "https://")):
+        target = urlsplit(target).path
+    return method, target.split("?", 1)[0]
+
+
+class WSGIServer:
+    """
+    HTTP/1.1 server with one bounded thread pool per request class.
+    classify(method, path) returns the pool name for a request ("api" if unknown).
+    """
+
+    def __init__(self, app, host="127.0.0.1", port=8000, pools=None, classify=None,
+                 keep_alive=DEFAULT_KEEP_ALIVE, request_timeout=DEFAULT_REQUEST_TIMEOUT):
+        self.app = app
+        self.host = host
+        self.pool_sizes = dict(DEFAULT_POOLS, **(pools or {}))
+        self.classify = classify or (lambda method, path: "api")
+        self.keep_alive = keep_alive
+        self.request_timeout = request_timeout
+
+        self._socket = socket.create_server((host, port), backlog=128)
+        self.port = self._socket.getsockname()[1]
+        self._pools = {
+            name: ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"http-{name}")
+            for name, size in self.pool_sizes.items()
+        }
+        self._stats = {name: {"busy": 0, "waiting": 0, "requests": 0} for name in self._pools}
+        self._stats_lock = threading.Lock()
+
+        self._selector = selectors.DefaultSelector()
+        self._parked = collections.deque()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_w.setblocking(False)
+        self._running = False
+
+    # --- Event loop (serve_forever's thread) ---
+
+    def serve_forever(self):
+        """Accept and dispatch connections until shutdown() is called."""
+        self._socket.setblocking(False)
+        self._selector.register(self._socket, selectors.EVENT_READ)
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        self._running = True
+        sizes = ", ".join(f"{name}={size}" for name, size in self.pool_sizes.items())
+        print(f"Serving on http://{self.host}:{self.port} (workers: {sizes}, keep-alive {self.keep_alive:g}s)")
+        try:
+            while self._running:
+                for key, _ in self._selector.select(timeout=1.0):
+                    if key.fileobj is self._socket:
+                        self._accept()
+                    elif key.fileobj is self._wake_r:
+                        self._wake_r.recv(4096)
+                    else:
+                        self._selector.unregister(key.fileobj)
+                        self._dispatch(key.data)
+                while self._parked:
+                    conn = self._parked.popleft()
+                    self._selector.register(conn.sock, selectors.EVENT_READ, conn)
+                self._expire_idle()
+        finally:
+            self._close_all()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self._socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                print(f"HTTP accept failed: {e}")
+                return
+            sock.settimeout(self.request_timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = Connection(sock, address)
+            # Even the first request is awaited here, not on a worker
+            self._selector.register(sock, selectors.EVENT_READ, conn)
+
+    def _dispatch(self, conn):
+        try:
+            head = conn.sock.recv(PEEK_BYTES, socket.MSG_PEEK)
+        except OSError:
+            head = b""
+        if not head:
+            conn.close()
+            return
+        pool = self.classify(*request_path(head))
+        if pool not in self._pools:
+            pool = "api"
+        with self._stats_lock:
+            self._stats[pool]["waiting"] += 1
+        self._pools[pool].submit(self._serve, conn, pool)
+
+    def _expire_idle(self):
+        deadline = time.monotonic() - self.keep_alive
+        for key in list(self._selector.get_map().values()):
+            conn = key.data
+            if conn is not None and conn.idle_since < deadline:
+                self._selector.unregister(conn.sock)
+                conn.close()
+
+    # --- Worker threads ---
+
+    def _serve(self, conn, pool):
+        stats = self._stats[pool]
+        with self._stats_lock:
+            stats["waiting"] -= 1
+            stats["busy"] += 1
+        keep = False
+        try:
+            while True:
+                handler = RequestHandler(conn, self)
+                handler.handle_one_request()
+                with self._stats_lock:
+                    stats["requests"] += 1
+                if handler.close_connection or not self._running:
+                    break
+                if not conn.has_buffered_request():
+                    keep = True
+                    break
+        except (ConnectionError, TimeoutError):
+            pass
+        except Exception:
+            traceback.print_exc()
+        finally:
+            with self._stats_lock:
+                stats["busy"] -= 1
+        if keep:
+            self._park(conn)
+        else:
+            conn.close()
+
+    def _park(self, conn):
+        """Hand an idle keep-alive connection back to the event loop."""
+        conn.idle_since = time.monotonic()
+        self._parked.append(conn)
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    # --- Control ---
+
+    def stats(self):
+        """{pool: {"workers", "busy", "waiting", "requests"}} snapshot."""
+        with self._stats_lock:
+            return {name: dict(s, workers=self.pool_sizes[name]) for name, s in self._stats.items()}
+
+    def shutdown(self):
+        self._running = False
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _close_all(self):
+        for key in list(self._selector.get_map().values()):
+            if key.data is not None:
+                key.data.close()
+        self._selector.close()
+        self._socket.close()
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._wake_r.close()
+        self._wake_w.close()
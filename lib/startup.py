@@ -0,0 +1,55 @@
+"""
+Startup timing: the app marks phases as it comes up (imports, server ready,
+daemon window, first paint, ...) and the report is served at /api/startup
+and printed once the wallpaper page has painted its first frame.
+"""
+
+import threading
+import time
+
+# Time origin of the report: main.py imports this module before anything else
+LAUNCHED = time.perf_counter()
+
+
+class StartupTimer:
+    """Ordered phase -> seconds since launch. The first mark of a phase wins."""
+
+    def __init__(self, start=LAUNCHED):
+        self.start = start
+        self._phases = {}
+        self._lock = threading.Lock()
+
+    def mark(self, phase):
+        """Record phase now; returns False if it was already recorded."""
+        at = time.perf_counter() - self.start
+        with self._lock:
+            if phase in self._phases:
+                return False
+            self._phases[phase] = at
+            return True
+
+    def get(self, phase):
+        with self._lock:
+            return self._phases.get(phase)
+
+    def report(self) -> dict:
+        with self._lock:
+            phases = sorted(self._phases.items(), key=lambda item: item[1])
+        rows, previous = [], 0.0
+        for name, at in phases:
+            rows.append({"phase": name, "at": round(at, 4), "delta": round(at - previous, 4)})
+            previous = at
+        return {"phases": rows, "time_to_interactive": self.get("first_paint")}
+
+    def format(self) -> str:
+        lines = ["Startup timing (seconds since launch):"]
+        for row in self.report()["phases"]:
+            lines.append(f"  {row['phase']:<22} {row['at']:8.3f}  (+{row['delta']:.3f})")
+        return "\n".join(lines)
+
+
+timer = StartupTimer()
+
+
+def mark(phase):
+    return timer.mark(phase)
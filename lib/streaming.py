@@ -0,0 +1,47 @@
+"""
+Video streaming helpers: byte-range (206) responses with ETag/Last-Modified
+validation, read from disk in fixed-size chunks.
+"""
+
+import mimetypes
+import os
+from flask import Response, request
+from werkzeug.wsgi import wrap_file
+
+# Read videos in 256 KiB chunks rather than werkzeug's 8 KiB default
+CHUNK_SIZE = 256 * 1024
+
+
+def file_etag(stat_result) -> str:
+    """Build a validator from a file's mtime and size."""
+    return f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+
+
+def send_video(path: str, max_age: int = 0, immutable: bool = False) -> Response:
+    """
+    Stream a video file to the client.
+    Honours Range, If-Range, If-None-Match and If-Modified-Since so the
+    <video> element can start playing after the first few megabytes.
+    """
+    stat_result = os.stat(path)
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    f = open(path, "rb")
+    data = wrap_file(request.environ, f, buffer_size=CHUNK_SIZE)
+    response = Response(data, mimetype=mimetype, direct_passthrough=True)
+    response.content_length = stat_result.st_size
+    response.last_modified = int(stat_result.st_mtime)
+    response.set_etag(file_etag(stat_result))
+
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+
+    return response.make_conditional(
+        request.environ,
+        accept_ranges=True,
+        complete_length=stat_result.st_size,
+    )
@@ -0,0 +1,222 @@
+"""
+System metrics provider.
+Samples uptime, CPU, memory, load average and battery from pluggable
+sources once per interval on one background thread and keeps the latest
+snapshot in memory (served at /api/system/metrics; the daemon page fans it
+out to widgets). Sampling only runs on demand: each read renews a lease,
+so nothing is sampled while no widget asks, and it can be paused (e.g.
+while playback holds a still frame). Every source has a stub so the
+provider runs anywhere.
+"""
+
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from lib.playback_policy import PmsetPowerSource, StaticSource
+
+# Seconds between samples
+DEFAULT_INTERVAL = 5.0
+# Sampling stops this many intervals after the last read
+LEASE_INTERVALS = 3
+# Served until the first sample exists
+EMPTY_SNAPSHOT = {"battery_percent": None, "on_ac": None, "time": None}
+
+
+# --- Metric sources ---
+
+class MetricSource:
+    """Base class: read() returns a dict with any subset of the snapshot fields."""
+    name = "source"
+
+    def read(self):
+        return {}
+
+
+class LoadAverageSource(MetricSource):
+    """1, 5 and 15 minute load averages (any Unix)."""
+    name = "load"
+
+    def read(self):
+        return {"load_average": [round(v, 2) for v in os.getloadavg()]}
+
+
+class ProcSource(MetricSource):
+    """Linux uptime, CPU and memory from /proc."""
+    name = "proc"
+
+    def __init__(self):
+        # (idle, total) jiffies of the previous sample; CPU % needs two
+        self._last_cpu = None
+
+    def read(self):
+        metrics = {}
+        with open("/proc/uptime") as f:
+            metrics["uptime_seconds"] = int(float(f.read().split()[0]))
+
+        with open("/proc/stat") as f:
+            fields = [int(v) for v in f.readline().split()[1:]]
+        # idle + iowait vs. total jiffies since the previous sample
+        idle, total = fields[3] + fields[4], sum(fields)
+        if self._last_cpu is not None:
+            d_idle, d_total = idle - self._last_cpu[0], total - self._last_cpu[1]
+            if d_total > 0:
+                metrics["cpu_percent"] = round(100.0 * (1 - d_idle / d_total), 1)
+        self._last_cpu = (idle, total)
+
+        meminfo = {}
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                meminfo[key] = int(value.split()[0]) * 1024
+        total_mem = meminfo["MemTotal"]
+        available = meminfo.get("MemAvailable", meminfo.get("MemFree", 0))
+        metrics.update(_memory(total_mem, total_mem - available))
+        return metrics
+
+
+class DarwinSource(MetricSource):
+    """macOS uptime and memory via sysctl/vm_stat, CPU via ps."""
+    name = "darwin"
+
+    def read(self):
+        metrics = {}
+        boottime = _run(["sysctl", "-n", "kern.boottime"])
+        match = re.search(r"sec\s*=\s*(\d+)", boottime)
+        if match:
+            metrics["uptime_seconds"] = int(time.time()) - int(match.group(1))
+
+        # Sum of per-process CPU over all cores
+        usage = sum(float(v) for v in _run(["ps", "-A", "-o", "%cpu="]).split())
+        metrics["cpu_percent"] = round(min(100.0, usage / (os.cpu_count() or 1)), 1)
+
+        total_mem = int(_run(["sysctl", "-n", "hw.memsize"]).strip())
+        vm_stat = _run(["vm_stat"])
+        page_size = int(re.search(r"page size of (\d+) bytes", vm_stat).group(1))
+        pages = {key: int(value) for key, value in re.findall(r'"?Pages ([\w ]+)"?:\s+(\d+)', vm_stat)}
+        # What Activity Monitor calls "memory used": app + wired + compressed
+        used_pages = (pages.get("active", 0) - pages.get("purgeable", 0) + pages.get("wired down", 0)
+                      + pages.get("occupied by compressor", 0))
+        metrics.update(_memory(total_mem, used_pages * page_size))
+        return metrics
+
+
+def _run(args):
+    return subprocess.run(args, capture_output=True, text=True, timeout=5).stdout
+
+
+def _memory(total, used):
+    return {
+        "memory_total_bytes": total,
+        "memory_used_bytes": used,
+        "memory_percent": round(100.0 * used / total, 1) if total else None,
+    }
+
+
+def default_sources():
+    """Platform sources on macOS and Linux, a stub elsewhere."""
+    if sys.platform == "darwin":
+        return [DarwinSource(), LoadAverageSource(), PmsetPowerSource()]
+    if sys.platform.startswith("linux") and os.path.exists("/proc/stat"):
+        return [ProcSource(), LoadAverageSource()]
+    return [StaticSource(uptime_seconds=None, cpu_percent=None, memory_percent=None)]
+
+
+# --- Provider ---
+
+class SystemMetrics:
+    """
+    Samples sources periodically on its own thread and keeps the latest
+    snapshot. Readers never sample: they get the latest snapshot (possibly
+    stale after an idle period) and wake the thread, so the next poll sees
+    fresh values.
+    """
+
+    def __init__(self, sources=None, interval=DEFAULT_INTERVAL):
+        self.sources = list(sources) if sources is not None else default_sources()
+        self.interval = interval
+        self._snapshot = {}
+        # Sampling runs while time.monotonic() is before this and not paused
+        self._demand_until = 0.0
+        self._paused = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = False
+
+    @property
+    def active(self):
+        """True while someone recently read a snapshot and sampling isn't paused."""
+        return not self._paused and time.monotonic() < self._demand_until
+
+    def touch(self):
+        """Record demand: keep sampling for LEASE_INTERVALS more intervals."""
+        idle = not self.active
+        self._demand_until = time.monotonic() + LEASE_INTERVALS * self.interval
+        if idle:
+            self._wake.set()
+
+    def set_paused(self, paused):
+        """Pause sampling regardless of demand (resumes where demand remains)."""
+        self._paused = paused
+        if not paused:
+            self._wake.set()
+
+    def sample(self):
+        """Merge readings of every source into a new snapshot and keep it."""
+        snapshot = {"battery_percent": None, "on_ac": None}
+        for source in self.sources:
+            try:
+                snapshot.update(source.read())
+            except Exception as e:
+                print(f"System metric source {source.name} failed: {e}")
+        snapshot["time"] = time.time()
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self):
+        """Latest sample (EMPTY_SNAPSHOT before the first one); never samples."""
+        with self._lock:
+            return dict(self._snapshot or EMPTY_SNAPSHOT)
+
+    def read(self):
+        """
+        Snapshot for a client that wants live values; renews the sampling
+        lease, which wakes the sampler if it was idle. A snapshot left over
+        from before is returned as is; the client's next poll gets fresh values.
+        """
+        self.touch()
+        return self.snapshot()
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        def run():
+            while not self._stop:
+                if self.active:
+                    try:
+                        self.sample()
+                    except Exception as e:
+                        print(f"System metrics error: {e}")
+                    self._wake.wait(self.interval)
+                else:
+                    # Idle until touch(), set_paused(False) or stop()
+                    self._wake.wait()
+                self._wake.clear()
+
+        self._stop = False
+        self._thread = threading.Thread(target=run, name="system-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop = True
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
@@ -1,16 +1,26 @@
 from Cocoa import NSScreen, NSWorkspace
-from Foundation import NSObject, NSURL
+from Foundation import NSObject, NSNotificationCenter, NSURL
 from objc import super as objc_super
 
 
-def set_macos_wallpaper(image_path: str):
+def set_macos_wallpaper(images):
+    """
+    Set the desktop picture. images is either one path for every screen or a
+    {screen id: path} mapping (see lib/screens.py); screens missing from the
+    mapping are left alone.
+    """
     ws = NSWorkspace.sharedWorkspace()
-    url = NSURL.fileURLWithPath_(image_path)
 
     for screen in NSScreen.screens():
+        if isinstance(images, dict):
+            image_path = images.get(str(screen.deviceDescription()["NSScreenNumber"]))
+            if image_path is None:
+                continue
+        else:
+            image_path = images
         try:
             ws.setDesktopImageURL_forScreen_options_error_(
-                url,
+                NSURL.fileURLWithPath_(image_path),
                 screen,
                 {},
                 None
@@ -28,8 +38,11 @@ class SpaceObserver(NSObject):
         if self is None:
             return None
         
+        # A single image path or a {screen id: path} mapping
         self.current_wallpaper_path = None
         self.callback = callback
+        # Called when displays are added, removed or change resolution
+        self.on_screens_changed = None
         return self
 
     def spaceChanged_(self, notification):
@@ -37,6 +50,10 @@ class SpaceObserver(NSObject):
 
     def wake_(self, notification):
         self.callback()
+
+    def screensChanged_(self, notification):
+        if self.on_screens_changed:
+            self.on_screens_changed()
     
 
     def reapply_wallpaper(self):
@@ -68,6 +85,9 @@ class SpaceObserver(NSObject):
             None
         )
 
-
-
-
+        NSNotificationCenter.defaultCenter().addObserver_selector_name_object_(
+            self,
+            "screensChanged:",
+            "NSApplicationDidChangeScreenParametersNotification",
+            None
+        )
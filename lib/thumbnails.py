@@ -1,27 +1,318 @@
 # lib/thumbnail.py
+import atexit
+import json
+import multiprocessing
 import os
-from moviepy import VideoFileClip
-from PIL import Image
-from lib.constants import CACHE_DIR, WALLPAPER_DIR
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from lib.atomic import atomic_write, atomic_write_json
+from lib.constants import THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_BUDGET, WALLPAPER_DIR
+from lib.fingerprint import fingerprint
+from lib.metrics import THUMBNAIL_CACHE, THUMBNAIL_RENDER
+from lib.profiling import traced
 
-def get_thumbnail(video_name: str) -> str:
+# Seconds between manifest writes caused only by access-time updates
+MANIFEST_SAVE_INTERVAL = 30
+
+# Widths of the thumbnail ladder served to the selector (srcset)
+THUMBNAIL_WIDTHS = (320, 640, 1280)
+# format name -> (file extension, Pillow format, encoder options)
+THUMBNAIL_FORMATS = {
+    "webp": ("webp", "WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("jpg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+DEFAULT_THUMBNAIL_WIDTH = 640
+
+
+class ThumbnailCache:
     """
-    Returns the path to a thumbnail for the given video.
-    Generates it if missing.
+    Persistent thumbnail store keyed by video content fingerprint.
+    A JSON manifest tracks size and last access of each entry so the cache
+    can be held to a disk budget with LRU eviction. The budget covers the
+    selector's ladder only: the full-size still is kept with its entry (and
+    evicted with it) but not counted, so a few 4K/8K stills can't push the
+    small renditions out.
     """
-    # remove extension for thumbnail file name
-    file_name = os.path.splitext(video_name)[0] + ".png"
-    thumb_path = os.path.join(CACHE_DIR, file_name)
-    video_path = os.path.join(WALLPAPER_DIR, video_name)
 
+    def __init__(self, cache_dir, budget_bytes):
+        self.cache_dir = cache_dir
+        self.budget_bytes = budget_bytes
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self._lock = threading.RLock()
+        self._entries = None
+        self._last_save = 0.0
 
-    if not os.path.exists(thumb_path):
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
         try:
-            with VideoFileClip(video_path) as clip:
-                frame = clip.get_frame(0.0)
-                img = Image.fromarray(frame)
-                img.save(thumb_path, "PNG")
-        except Exception as e:
-            print(f"Failed to make thumbnail for {video_name}: {e}")
+            with open(self.manifest_path, "r") as f:
+                self._entries = json.load(f).get("entries", {})
+        except (OSError, ValueError):
+            pass
+        # Entries from before the thumbnail ladder only hold a PNG; regenerate them
+        for key in [k for k, e in self._entries.items() if "files" not in e]:
+            entry = self._entries.pop(key)
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except (OSError, KeyError):
+                pass
+        # Older manifests counted the still in "size"; recount the ladder only
+        for entry in self._entries.values():
+            if "ladder_size" not in entry:
+                entry["ladder_size"] = _ladder_size(
+                    {name: os.path.join(self.cache_dir, f) for name, f in entry["files"].items()})
+                entry.pop("size", None)
+
+    def _save(self):
+        atomic_write_json(self.manifest_path, {"entries": self._entries})
+        self._last_save = time.time()
+
+    @traced("thumbnail.lookup")
+    def lookup(self, key):
+        """Return {rendition: path} for key, or None on a miss."""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None:
+                THUMBNAIL_CACHE.inc("miss")
+                return None
+            renditions = {name: os.path.join(self.cache_dir, f) for name, f in entry["files"].items()}
+            if not os.path.exists(renditions["still"]):
+                self._remove(key)
+                self._save()
+                THUMBNAIL_CACHE.inc("miss")
+                return None
+            THUMBNAIL_CACHE.inc("hit")
+            entry["last_access"] = time.time()
+            if time.time() - self._last_save > MANIFEST_SAVE_INTERVAL:
+                self._save()
+            return renditions
+
+    def store(self, key, video_name, renditions):
+        """Register freshly written renditions and enforce the disk budget."""
+        with self._lock:
+            self._load()
+            # A new version of this video supersedes older thumbnails
+            for old_key in [k for k, e in self._entries.items() if e["video"] == video_name and k != key]:
+                self._remove(old_key)
+            self._entries[key] = {
+                "video": video_name,
+                "files": {name: os.path.basename(path) for name, path in renditions.items()},
+                "ladder_size": _ladder_size(renditions),
+                "last_access": time.time(),
+            }
+            self._evict(keep=key)
+            self._save()
+
+    def prune(self, video_names):
+        """Drop thumbnails of wallpapers that no longer exist."""
+        with self._lock:
+            self._load()
+            existing = set(video_names)
+            orphans = [k for k, e in self._entries.items() if e["video"] not in existing]
+            for key in orphans:
+                self._remove(key)
+            if orphans:
+                self._save()
+            return len(orphans)
+
+    def flush(self):
+        """Persist pending access-time updates."""
+        with self._lock:
+            if self._entries is not None:
+                self._save()
+
+    def _evict(self, keep=None):
+        total = sum(e["ladder_size"] for e in self._entries.values())
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_access"]):
+            if total <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._entries[key]["ladder_size"]
+            self._remove(key)
+            THUMBNAIL_CACHE.inc("eviction")
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for filename in entry["files"].values():
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except OSError:
+                pass
+
+
+def _ladder_size(renditions):
+    """Bytes of the ladder renditions (everything but the still)."""
+    total = 0
+    for name, path in renditions.items():
+        if name == "still":
+            continue
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+def _save_image(img, path, pil_format, **options):
+    with atomic_write(path) as f:
+        img.save(f, pil_format, **options)
+
+
+def render_thumbnails(video_path: str, cache_dir: str, key: str) -> dict:
+    """
+    Decode the first frame of a video once and write the full-size still plus
+    the WebP/JPEG ladder. Runs in a worker process; returns {rendition: path}.
+    """
+    from moviepy import VideoFileClip
+    from PIL import Image
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with VideoFileClip(video_path) as clip:
+        frame = clip.get_frame(0.0)
+    img = Image.fromarray(frame)
+
+    renditions = {"still": os.path.join(cache_dir, f"{key}.png")}
+    _save_image(img, renditions["still"], "PNG")
+
+    for width in THUMBNAIL_WIDTHS:
+        # Never upscale small sources
+        scaled = img
+        if img.width > width:
+            scaled = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        for fmt, (ext, pil_format, options) in THUMBNAIL_FORMATS.items():
+            path = os.path.join(cache_dir, f"{key}-{width}.{ext}")
+            _save_image(scaled, path, pil_format, **options)
+            renditions[f"{width}.{fmt}"] = path
+    return renditions
+
+
+def pick_rendition(renditions: dict, width=None, fmt="jpeg") -> str:
+    """Smallest ladder rung at least `width` wide in the given format."""
+    width = width or DEFAULT_THUMBNAIL_WIDTH
+    candidates = [w for w in THUMBNAIL_WIDTHS if w >= width]
+    rung = min(candidates) if candidates else max(THUMBNAIL_WIDTHS)
+    return renditions.get(f"{rung}.{fmt}") or renditions["still"]
+
+
+class ThumbnailService:
+    """
+    Generates thumbnails in a process pool, off the request threads.
+    Concurrent requests for the same video version share a single job.
+    """
+
+    def __init__(self, cache, max_workers=None):
+        self.cache = cache
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        self._executor = None
+        self._inflight = {}
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: forking a process that has Cocoa loaded is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def get_cached(self, video_name):
+        """Renditions of an existing thumbnail, or None without generating anything."""
+        try:
+            key = fingerprint(os.path.join(WALLPAPER_DIR, video_name))
+        except OSError:
             return None
-    return thumb_path
+        return self.cache.lookup(key)
+
+    def request(self, video_name) -> Future:
+        """Return a Future resolving to {rendition: path} (None on failure)."""
+        video_path = os.path.join(WALLPAPER_DIR, video_name)
+        result = Future()
+        try:
+            key = fingerprint(video_path)
+        except OSError as e:
+            print(f"Failed to make thumbnail for {video_name}: {e}")
+            result.set_result(None)
+            return result
+
+        with self._lock:
+            # Checked under the lock: a finishing job stores its renditions
+            # (or marks the key failed) before it leaves _inflight, so one of
+            # these checks always sees it and the video is never rendered twice
+            if key in self._inflight:
+                return self._inflight[key]
+            cached = self.cache.lookup(key)
+            if cached or key in self._failed:
+                result.set_result(cached)
+                return result
+            self._inflight[key] = result
+            started = time.perf_counter()
+            try:
+                job = self._pool().submit(render_thumbnails, video_path, self.cache.cache_dir, key)
+            except BrokenProcessPool:
+                self._executor = None
+                job = self._pool().submit(render_thumbnails, video_path, self.cache.cache_dir, key)
+
+        def done(job):
+            renditions, failed = None, False
+            try:
+                renditions = job.result()
+                THUMBNAIL_RENDER.observe(time.perf_counter() - started)
+                self.cache.store(key, video_name, renditions)
+            except BrokenProcessPool as e:
+                # A worker died; start a fresh pool on the next request but allow retries
+                print(f"Failed to make thumbnail for {video_name}: {e}")
+                renditions = None
+                with self._lock:
+                    self._executor = None
+            except Exception as e:
+                print(f"Failed to make thumbnail for {video_name}: {e}")
+                renditions = None
+                failed = True
+            with self._lock:
+                if failed:
+                    self._failed.add(key)
+                self._inflight.pop(key, None)
+            result.set_result(renditions)
+
+        job.add_done_callback(done)
+        return result
+
+    def warm(self, video_names):
+        """Queue thumbnails for every video that doesn't have one yet."""
+        for name in video_names:
+            self.request(name)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+thumbnail_cache = ThumbnailCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_BUDGET)
+atexit.register(thumbnail_cache.flush)
+
+thumbnail_service = ThumbnailService(thumbnail_cache)
+atexit.register(thumbnail_service.shutdown)
+
+
+@traced("thumbnail.wait")
+def get_thumbnail(video_name: str) -> str:
+    """
+    Returns the path to the full-size still for the given video.
+    Generates it if missing (blocking until the worker finishes).
+    """
+    renditions = thumbnail_service.request(video_name).result()
+    return renditions["still"] if renditions else None
@@ -0,0 +1,246 @@
+"""
+Display-matched video variants.
+Optionally transcodes each wallpaper down to the display's pixel size and a
+frame-rate cap, so an 8K/60 source doesn't keep decoding 8K/60 on a 1440p
+screen. Variants are built as background jobs; until one is ready the
+original file is served. Encode time, bitrate and decode CPU of every
+variant (and of its source) are recorded so the savings are measurable.
+Failed transcodes are recorded too and not retried until a backoff expires.
+"""
+
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from lib.atomic import atomic_write_json
+from lib.ingest import ffmpeg_binary
+
+DEFAULT_MAX_FPS = 30
+# x264 settings for variants: visually transparent at wallpaper viewing distance
+ENCODER_ARGS = ["-c:v", "libx264", "-preset", "medium", "-crf", "20", "-pix_fmt", "yuv420p"]
+# Seconds before a failed transcode may be retried; doubles with each failure
+FAILURE_RETRY_DELAY = 300
+MAX_FAILURE_RETRY_DELAY = 24 * 3600
+
+
+def target_spec(metadata, screen_width, screen_height, max_fps=DEFAULT_MAX_FPS):
+    """
+    Size/fps a variant of this source should have for the given display
+    (in pixels), or None if the original is already within the caps.
+    Scales to cover the screen (the page uses object-fit: cover) and never upscales.
+    """
+    width, height, fps = metadata.get("width"), metadata.get("height"), metadata.get("fps")
+    if not width or not height:
+        return None
+
+    scale = min(1.0, max(screen_width / width, screen_height / height))
+    target_w = max(2, int(width * scale) // 2 * 2)
+    target_h = max(2, int(height * scale) // 2 * 2)
+    target_fps = min(fps, max_fps) if fps else max_fps
+
+    if scale >= 1.0 and (not fps or fps <= max_fps):
+        return None
+    return {"width": target_w, "height": target_h, "fps": round(target_fps, 3)}
+
+
+def variant_key(fingerprint, spec):
+    return f"{fingerprint}-{spec['width']}x{spec['height']}-{spec['fps']:g}fps"
+
+
+def run_measured(args):
+    """Run a subprocess and return the CPU seconds (user + sys) it consumed."""
+    # stderr goes to a file: a pipe nobody reads while we wait would fill up
+    # and block ffmpeg on long encodes
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=err)
+        # wait4 gives this child's own rusage, unaffected by other concurrent jobs
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        err.seek(0)
+        stderr = err.read().decode(errors="replace")
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {stderr.strip()[-500:]}")
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure_decode_cpu(path):
+    """CPU seconds needed to decode the whole file once."""
+    return run_measured([ffmpeg_binary(), "-v", "error", "-i", path, "-map", "0:v:0", "-f", "null", "-"])
+
+
+class VariantManager:
+    """Builds, tracks and resolves display-matched variants."""
+
+    def __init__(self, cache_dir, jobs):
+        self.cache_dir = cache_dir
+        self.jobs = jobs
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        # Called with (video_name, key) when a variant becomes ready
+        self.on_ready = None
+        self._lock = threading.Lock()
+        self._entries = None
+        # key -> {"video", "attempts", "error", "retry_at"} of failed transcodes
+        self._failures = None
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries, self._failures = {}, {}
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+            self._entries = manifest.get("entries", {})
+            self._failures = manifest.get("failures", {})
+        except (OSError, ValueError):
+            pass
+
+    def _save(self):
+        atomic_write_json(self.manifest_path, {"entries": self._entries, "failures": self._failures}, indent=2)
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def lookup(self, key):
+        """Path of a ready variant, or None."""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        path = os.path.join(self.cache_dir, entry["file"])
+        return path if os.path.exists(path) else None
+
+    def variants_for(self, video_name):
+        """Recorded variants (with stats) of a wallpaper."""
+        with self._lock:
+            self._load()
+            return [dict(entry, key=key) for key, entry in self._entries.items()
+                    if entry["video"] == video_name]
+
+    def backing_off(self, key):
+        """True while a failed transcode of key must not be retried."""
+        with self._lock:
+            self._load()
+            failure = self._failures.get(key)
+        return failure is not None and time.time() < failure["retry_at"]
+
+    def resolve(self, video_name, source_path, row, spec, build=True):
+        """
+        Return the key of a ready variant for this source and spec, or None.
+        Queues a transcode job when the variant doesn't exist yet (unless build
+        is False or an earlier attempt failed and its backoff hasn't expired).
+        """
+        if spec is None:
+            return None
+        key = variant_key(row["fingerprint"], spec)
+        if self.lookup(key):
+            return key
+        if not build or self.backing_off(key):
+            return None
+        self.jobs.submit(
+            "transcode", key,
+            lambda job: self._build(job, video_name, source_path, row, spec, key),
+        )
+        return None
+
+    def _build(self, job, video_name, source_path, row, spec, key):
+        try:
+            self._transcode(job, video_name, source_path, row, spec, key)
+        except Exception as e:
+            self._record_failure(key, video_name, e)
+            raise
+
+    def _record_failure(self, key, video_name, error):
+        with self._lock:
+            self._load()
+            attempts = self._failures.get(key, {}).get("attempts", 0) + 1
+            delay = min(MAX_FAILURE_RETRY_DELAY, FAILURE_RETRY_DELAY * 2 ** (attempts - 1))
+            self._failures[key] = {
+                "video": video_name,
+                "attempts": attempts,
+                "error": str(error)[-500:],
+                "retry_at": time.time() + delay,
+            }
+            self._save()
+        print(f"Variant failed for {video_name} (attempt {attempts}), retrying in {delay:g}s: {error}")
+
+    def _transcode(self, job, video_name, source_path, row, spec, key):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        out_path = self.path_for(key)
+        tmp_path = out_path + ".part.mp4"
+        vf = f"scale={spec['width']}:{spec['height']}:flags=lanczos,fps={spec['fps']:g}"
+
+        job.update(step="encoding", progress=0.1)
+        start = time.time()
+        try:
+            encode_cpu = run_measured(
+                [ffmpeg_binary(), "-v", "error", "-y", "-i", source_path, "-map", "0:v:0",
+                 "-vf", vf, *ENCODER_ARGS, "-movflags", "+faststart", "-an", tmp_path]
+            )
+            os.replace(tmp_path, out_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        encode_seconds = time.time() - start
+
+        job.update(step="measuring", progress=0.8)
+        duration = row.get("duration") or 0
+        size = os.path.getsize(out_path)
+        source_size = os.path.getsize(source_path)
+        source_cpu = measure_decode_cpu(source_path)
+        variant_cpu = measure_decode_cpu(out_path)
+
+        def per_second(value):
+            return round(value / duration, 4) if duration else None
+
+        entry = {
+            "video": video_name,
+            "source_fingerprint": row["fingerprint"],
+            "file": os.path.basename(out_path),
+            "spec": spec,
+            "size": size,
+            "encode_seconds": round(encode_seconds, 3),
+            "encode_cpu_seconds": round(encode_cpu, 3),
+            "bitrate_kbps": per_second(size * 8 / 1000),
+            "source_bitrate_kbps": per_second(source_size * 8 / 1000),
+            # CPU seconds spent decoding one second of playback
+            "decode_cpu_per_second": per_second(variant_cpu),
+            "source_decode_cpu_per_second": per_second(source_cpu),
+            "created": time.time(),
+        }
+        with self._lock:
+            self._load()
+            # Variants of older versions of this video are no longer reachable
+            for old_key in [k for k, e in self._entries.items()
+                            if e["video"] == video_name and e["source_fingerprint"] != row["fingerprint"]]:
+                self._remove(old_key)
+            self._entries[key] = entry
+            self._failures.pop(key, None)
+            self._save()
+        print(f"Variant ready for {video_name}: {spec['width']}x{spec['height']}@{spec['fps']:g}fps")
+
+        if self.on_ready:
+            self.on_ready(video_name, key)
+
+    def prune(self, video_names):
+        """Delete variants of wallpapers that no longer exist."""
+        existing = set(video_names)
+        with self._lock:
+            self._load()
+            orphans = [k for k, e in self._entries.items() if e["video"] not in existing]
+            for key in orphans:
+                self._remove(key)
+            failures = [k for k, f in self._failures.items() if f["video"] not in existing]
+            for key in failures:
+                del self._failures[key]
+            if orphans or failures:
+                self._save()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        try:
+            os.remove(os.path.join(self.cache_dir, entry["file"]))
+        except OSError:
+            pass
@@ -0,0 +1,255 @@
+"""
+Widget frames: assembles each widget's isolated HTML document (widget.html
+with inline CSS/JS, preceded by the shared widget runtime) once, and caches
+it in memory and on disk together with gzip/brotli variants and a
+content-hash ETag.
+Frames are rebuilt only when the widget's source files or the runtime change.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from lib.atomic import atomic_write
+from lib.constants import CACHE_DIR
+from lib.metrics import FRAME_CACHE
+from lib.profiling import traced
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FRAMES_CACHE_DIR = os.path.join(CACHE_DIR, "frames")
+
+# Bump when FRAME_TEMPLATE changes so on-disk frames are rebuilt
+TEMPLATE_VERSION = "2"
+
+# Shared scheduler API (Widget.onTick, onMinute, onVisible) inlined into every frame
+RUNTIME_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "web", "widget_runtime.js")
+
+
+def _load_runtime():
+    try:
+        with open(RUNTIME_PATH, "r") as f:
+            return f.read()
+    except OSError as e:
+        print(f"Widget runtime unavailable: {e}")
+        return ""
+
+
+WIDGET_RUNTIME = _load_runtime()
+# Part of the frame cache key, so editing the runtime rebuilds cached frames
+RUNTIME_HASH = hashlib.sha1(WIDGET_RUNTIME.encode("utf-8")).hexdigest()[:12]
+
+FRAME_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+    <style>
+        * {{
+            box-sizing: border-box;
+        }}
+        html, body {{
+            margin: 0;
+            padding: 0;
+            overflow: hidden;
+            width: 100%;
+            height: 100%;
+            display: flex;
+            flex-direction: column;
+        }}
+        #widget-root {{
+            width: 100%;
+            height: 100%;
+            flex: 1;
+            display: flex;
+            flex-direction: column;
+            container-type: size;
+        }}
+    </style>
+    <style>
+{css_content}
+    </style>
+</head>
+<body>
+    <div id="widget-root">
+{html_content}
+    </div>
+    <script>
+{runtime_js}
+    </script>
+    <script>
+{js_content}
+    </script>
+</body>
+</html>"""
+
+# Suffixes of the on-disk files for each content encoding
+ENCODING_SUFFIXES = {"identity": ".html", "gzip": ".html.gz", "br": ".html.br"}
+
+
+def _read_optional(path):
+    if not path:
+        return ""
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except Exception:
+        return ""
+
+
+@traced("frame.build")
+def build_frame(widget) -> str:
+    """Assemble the isolated HTML document for a widget. Raises if widget.html is unreadable."""
+    with open(widget["html"], "r") as f:
+        html_content = f.read()
+    return FRAME_TEMPLATE.format(
+        css_content=_read_optional(widget["css"]),
+        html_content=html_content,
+        runtime_js=WIDGET_RUNTIME,
+        js_content=_read_optional(widget["js"]),
+    )
+
+
+@traced("frame.parts")
+def build_parts(widget) -> dict:
+    """
+    Sources of a lightweight widget, mounted into a Shadow DOM root by the page:
+    {"html", "css", "js", "etag"}. Raises if widget.html is unreadable.
+    """
+    with open(widget["html"], "r") as f:
+        html_content = f.read()
+    parts = {
+        "html": html_content,
+        "css": _read_optional(widget["css"]),
+        "js": _read_optional(widget["js"]),
+    }
+    raw = "\0".join((parts["html"], parts["css"], parts["js"])).encode("utf-8")
+    parts["etag"] = hashlib.sha256(raw).hexdigest()[:32]
+    return parts
+
+
+@traced("frame.compress")
+def compress(body: bytes) -> dict:
+    """Return {encoding: bytes} for every encoding we can produce."""
+    variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return variants
+
+
+def negotiate_encoding(accept_encodings, available) -> str:
+    """Pick the best available encoding for an Accept-Encoding header."""
+    for encoding in ("br", "gzip"):
+        if encoding in available and accept_encodings[encoding]:
+            return encoding
+    return "identity"
+
+
+class FrameCache:
+    """Compiled widget frames, keyed by widget id and source file signature."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._frames = {}
+        # Lightweight widget sources (in memory only: cheap to re-read)
+        self._parts = {}
+        self._lock = threading.Lock()
+
+    def get(self, widget) -> dict:
+        """
+        Return the compiled frame for a registry widget entry:
+        {"etag": str, "signature": tuple, "variants": {encoding: bytes}}
+        """
+        frame = self._frames.get(widget["id"])
+        if frame is not None and frame["signature"] == widget["signature"]:
+            FRAME_CACHE.inc("memory")
+            return frame
+
+        with self._lock:
+            frame = self._frames.get(widget["id"])
+            if frame is not None and frame["signature"] == widget["signature"]:
+                FRAME_CACHE.inc("memory")
+                return frame
+            if frame is not None:
+                # The widget's sources changed; the old frame is replaced below
+                FRAME_CACHE.inc("eviction")
+            frame = self._load_from_disk(widget)
+            if frame is not None:
+                FRAME_CACHE.inc("disk")
+            else:
+                frame = self._compile(widget)
+                FRAME_CACHE.inc("compiled")
+            self._frames[widget["id"]] = frame
+            return frame
+
+    def parts(self, widget) -> dict:
+        """build_parts() for a registry widget entry, cached until its files change."""
+        cached = self._parts.get(widget["id"])
+        if cached is not None and cached[0] == widget["signature"]:
+            return cached[1]
+        parts = build_parts(widget)
+        self._parts[widget["id"]] = (widget["signature"], parts)
+        return parts
+
+    def _key(self, widget) -> str:
+        raw = f"{TEMPLATE_VERSION}:{RUNTIME_HASH}:{widget['signature']!r}".encode()
+        return hashlib.sha1(raw).hexdigest()[:16]
+
+    def _widget_dir(self, widget) -> str:
+        return os.path.join(self.cache_dir, widget["id"])
+
+    @traced("frame.read")
+    def _load_from_disk(self, widget):
+        base = os.path.join(self._widget_dir(widget), self._key(widget))
+        variants = {}
+        try:
+            for encoding, suffix in ENCODING_SUFFIXES.items():
+                path = base + suffix
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        variants[encoding] = f.read()
+        except OSError:
+            return None
+        if "identity" not in variants or "gzip" not in variants:
+            return None
+        if brotli is not None and "br" not in variants:
+            return None
+        return self._frame(widget, variants)
+
+    def _compile(self, widget):
+        body = build_frame(widget).encode("utf-8")
+        frame = self._frame(widget, compress(body))
+        try:
+            self._write_to_disk(widget, frame["variants"])
+        except OSError as e:
+            print(f"Failed to cache frame for {widget['id']}: {e}")
+        return frame
+
+    def _frame(self, widget, variants):
+        return {
+            "etag": hashlib.sha256(variants["identity"]).hexdigest()[:32],
+            "signature": widget["signature"],
+            "variants": variants,
+        }
+
+    @traced("frame.write")
+    def _write_to_disk(self, widget, variants):
+        widget_dir = self._widget_dir(widget)
+        os.makedirs(widget_dir, exist_ok=True)
+        key = self._key(widget)
+
+        # Drop frames compiled from older versions of this widget
+        for name in os.listdir(widget_dir):
+            if not name.startswith(key):
+                os.remove(os.path.join(widget_dir, name))
+
+        for encoding, body in variants.items():
+            with atomic_write(os.path.join(widget_dir, key + ENCODING_SUFFIXES[encoding])) as f:
+                f.write(body)
+
+
+# Shared cache used by the web server
+frame_cache = FrameCache(FRAMES_CACHE_DIR)
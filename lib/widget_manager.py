@@ -3,94 +3,67 @@ Widget manager: handles widget discovery, configuration, and isolation.
 Each widget is a folder inside web/widgets/ with widget.html, widget.css, widget.js
 """
 
+import atexit
+import hashlib
 import json
-import os
-from lib.constants import APP_SUPPORT_DIR, WIDGETS_DIR, WIDGETS_CONFIG_FILE, DEFAULT_WIDGET_CONFIG
+import math
+import threading
+from lib.constants import WIDGETS_DIR, WIDGETS_CONFIG_FILE, DEFAULT_WIDGET_CONFIG, DEFAULT_TRUSTED_WIDGETS
+from lib.config_store import ConfigStore
+from lib.widget_registry import WidgetRegistry
+from lib.widget_frames import frame_cache
+from lib.profiling import traced
+
+# In-memory widget index, kept fresh by a watcher started from the web server
+registry = WidgetRegistry(WIDGETS_DIR)
+
+# Widget layout, held in memory and written to disk in the background
+config_store = ConfigStore(WIDGETS_CONFIG_FILE, default=DEFAULT_WIDGET_CONFIG)
+atexit.register(config_store.flush)
+
+# Widget ids allowed to run in the page (see widget_mode); set from settings by the web server
+trusted_widgets = set(DEFAULT_TRUSTED_WIDGETS)
 
 
 def load_widget_config():
-    """Load widget configuration from disk."""
-    if not os.path.exists(WIDGETS_CONFIG_FILE):
-        save_widget_config(DEFAULT_WIDGET_CONFIG)
-        return DEFAULT_WIDGET_CONFIG
-    try:
-        with open(WIDGETS_CONFIG_FILE, "r") as f:
-            return json.load(f)
-    except Exception:
-        save_widget_config(DEFAULT_WIDGET_CONFIG)
-        return DEFAULT_WIDGET_CONFIG
+    """Current widget configuration (a copy; served from memory)."""
+    return config_store.load()
 
 
 def save_widget_config(config):
-    """Save widget configuration to disk."""
-    os.makedirs(APP_SUPPORT_DIR, exist_ok=True)
-    with open(WIDGETS_CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=2)
+    """Replace the widget configuration; persisted shortly after."""
+    config_store.save(config)
     return config
 
 
 def discover_widgets():
     """
     Discover available widgets by looking for widget folders.
-    Returns a dict mapping widget_id -> widget_metadata
+    Returns a dict mapping widget_id -> widget_metadata (served from the registry cache)
     """
-    widgets = {}
-    # widgets are stored in WIDGETS_DIR (App Support). If missing, return empty dict
-    if not os.path.isdir(WIDGETS_DIR):
-        return widgets
-    
-    for folder in os.listdir(WIDGETS_DIR):
-        widget_path = os.path.join(WIDGETS_DIR, folder)
-        if not os.path.isdir(widget_path):
-            continue
-        
-        # Check for required files
-        html_file = os.path.join(widget_path, "widget.html")
-        css_file = os.path.join(widget_path, "widget.css")
-        js_file = os.path.join(widget_path, "widget.js")
-        
-        if os.path.exists(html_file):
-            # Load aspect ratio and other metadata from widget.html comment
-            metadata = {
-                "id": folder,
-                "path": widget_path,
-                "html": html_file,
-                "css": css_file if os.path.exists(css_file) else None,
-                "js": js_file if os.path.exists(js_file) else None,
-                "aspect_ratio": 2.0,  # default 2:1, can be overridden per widget
-            }
-            
-            # Try to read aspect ratio from widget.html
-            try:
-                with open(html_file, "r") as f:
-                    content = f.read()
-                    # Look for <!-- aspect-ratio: X:X --> or <!-- aspect-ratio: flex --> comment
-                    import re
-                    match = re.search(r'<!--\s*aspect-ratio:\s*([\w:]+)\s*-->', content)
-                    if match:
-                        ratio_str = match.group(1)
-                        if ratio_str == "flex":
-                            metadata["aspect_ratio"] = "flex"
-                        else:
-                            # Parse "W:H" format to numeric ratio (W / H)
-                            parts = ratio_str.split(":")
-                            if len(parts) == 2:
-                                try:
-                                    w, h = float(parts[0]), float(parts[1])
-                                    metadata["aspect_ratio"] = w / h if h != 0 else 1.0
-                                except ValueError:
-                                    metadata["aspect_ratio"] = 1.0
-            except Exception:
-                pass
-            
-            widgets[folder] = metadata
-    
-    return widgets
+    return registry.widgets()
 
 
-def get_widget_config():
+def widget_mode(widget):
+    """
+    "shadow" for trusted widgets declaring <!-- lightweight: true --> (mounted
+    in the page in a Shadow DOM root), "iframe" for everything else.
+    """
+    if widget.get("lightweight") and widget["id"] in trusted_widgets:
+        return "shadow"
+    return "iframe"
+
+
+def get_widget(widget_id):
+    """Metadata for a single widget, or None if it isn't installed."""
+    return registry.get(widget_id)
+
+
+@traced("widgets.config")
+def get_widget_config(config=None):
     """Get current widget configuration with available widgets."""
-    config = load_widget_config()
+    if config is None:
+        config = load_widget_config()
     available = discover_widgets()
     
     # Filter config to only include available widgets
@@ -99,11 +72,207 @@ def get_widget_config():
     # Enhance config with widget metadata
     result = []
     for w in valid_config:
+        w = dict(w)
         widget_meta = available[w["id"]]
         w["aspect_ratio"] = widget_meta.get("aspect_ratio", 2.0)
+        w["mode"] = widget_mode(widget_meta)
         # Calculate width from height and aspect ratio (unless it's "flex" or width is already set)
         if w["aspect_ratio"] != "flex" and "width" not in w:
             w["width"] = int(w["height"] * w["aspect_ratio"])
         result.append(w)
     
     return result
+
+
+# Fields a layout patch may change -> type they're coerced to
+PATCH_FIELDS = {"x": int, "y": int, "width": int, "height": int, "enabled": bool}
+# Largest coordinate or size a patch may set, in points
+MAX_PATCH_VALUE = 1_000_000
+
+# Unsaved live-drag previews (widget id -> fields), shown by the daemon page only
+_previews = {}
+_patch_lock = threading.Lock()
+
+
+class LayoutConflict(Exception):
+    """The layout changed since the client read it."""
+
+    def __init__(self, version):
+        super().__init__(f"layout is at version {version}")
+        self.version = version
+
+
+def layout_version(config=None):
+    """Short hash of the stored layout, used for optimistic concurrency."""
+    if config is None:
+        config = load_widget_config()
+    raw = json.dumps(config, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def _validate_patch(changes, available):
+    """Normalize [{"id": ..., field: value}, ...] into {id: {field: value}} or raise ValueError."""
+    if not isinstance(changes, list):
+        raise ValueError("changes must be a list")
+    patch = {}
+    for change in changes:
+        if not isinstance(change, dict) or change.get("id") not in available:
+            raise ValueError(f"unknown widget: {change.get('id') if isinstance(change, dict) else change}")
+        fields = {}
+        for key, value in change.items():
+            if key == "id":
+                continue
+            if key not in PATCH_FIELDS:
+                raise ValueError(f"field {key} can't be patched")
+            if PATCH_FIELDS[key] is bool:
+                if not isinstance(value, bool):
+                    raise ValueError(f"{key} must be a boolean")
+            elif isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{key} must be a number")
+            elif isinstance(value, float) and not math.isfinite(value):
+                raise ValueError(f"{key} must be finite")
+            elif abs(value) > MAX_PATCH_VALUE:
+                raise ValueError(f"{key} is out of range")
+            elif key in ("width", "height") and value <= 0:
+                raise ValueError(f"{key} must be positive")
+            fields[key] = PATCH_FIELDS[key](round(value) if PATCH_FIELDS[key] is int else value)
+        patch.setdefault(change["id"], {}).update(fields)
+    return patch
+
+
+def _with_previews(config):
+    config = [dict(w, **_previews.get(w["id"], {})) for w in config]
+    known = {w["id"] for w in config}
+    config += [dict(_new_entry(widget_id), **fields)
+               for widget_id, fields in _previews.items() if widget_id not in known]
+    return config
+
+
+def _new_entry(widget_id):
+    return {"id": widget_id, "enabled": False, "x": 100, "y": 100, "height": 100}
+
+
+def patch_widget_config(changes, version=None, persist=True):
+    """
+    Apply per-widget partial updates ({"id", "x", "y", "width", "height",
+    "enabled"}) to the layout. With persist=False the changes are only a live
+    preview for the daemon page and nothing is stored.
+    Raises ValueError for invalid changes and LayoutConflict if version doesn't
+    match the stored layout. Returns (version, [(event_type, payload), ...]).
+    """
+    patch = _validate_patch(changes, discover_widgets())
+    with _patch_lock:
+        stored = load_widget_config()
+        current = layout_version(stored)
+        if version is not None and version != current:
+            raise LayoutConflict(current)
+        before = get_widget_config(_with_previews(stored))
+
+        if persist:
+            updated = [dict(w) for w in stored]
+            by_id = {w["id"]: w for w in updated}
+            for widget_id, fields in patch.items():
+                if widget_id not in by_id:
+                    by_id[widget_id] = _new_entry(widget_id)
+                    updated.append(by_id[widget_id])
+                by_id[widget_id].update(fields)
+                _previews.pop(widget_id, None)
+            if updated != stored:
+                save_widget_config(updated)
+                current = layout_version(updated)
+            after = get_widget_config(_with_previews(updated))
+        else:
+            for widget_id, fields in patch.items():
+                _previews.setdefault(widget_id, {}).update(fields)
+            after = get_widget_config(_with_previews(stored))
+
+    return current, layout_changes(before, after)
+
+
+def replace_widget_config(config):
+    """
+    Store a whole new layout, dropping any live previews.
+    Returns [(event_type, payload), ...] that bring the daemon page up to date.
+    """
+    with _patch_lock:
+        before = get_widget_config(_with_previews(load_widget_config()))
+        _previews.clear()
+        save_widget_config(config)
+        return layout_changes(before, get_widget_config())
+
+
+def discard_previews():
+    """
+    Drop every unsaved live preview (Widget Center reset or closed without
+    saving). Returns the events that put the daemon page back to the stored layout.
+    """
+    with _patch_lock:
+        if not _previews:
+            return []
+        stored = load_widget_config()
+        before = get_widget_config(_with_previews(stored))
+        _previews.clear()
+        return layout_changes(before, get_widget_config(stored))
+
+
+def get_widget_bundle():
+    """
+    Layout plus every enabled widget's compiled frame (or, for lightweight
+    widgets, its sources), for a single-request page load.
+    Returns {"version": str, "widgets": [...]}; the version changes whenever the
+    layout or any bundled frame changes.
+    """
+    available = discover_widgets()
+    widgets = []
+    fingerprint = []
+    for w in get_widget_config():
+        entry = dict(w)
+        if w.get("enabled"):
+            try:
+                if w["mode"] == "shadow":
+                    parts = frame_cache.parts(available[w["id"]])
+                    entry["parts"] = parts
+                    entry["frame_etag"] = parts["etag"]
+                else:
+                    frame = frame_cache.get(available[w["id"]])
+                    entry["frame"] = frame["variants"]["identity"].decode("utf-8")
+                    entry["frame_etag"] = frame["etag"]
+            except Exception as e:
+                # The page falls back to loading this widget's frame URL
+                print(f"Failed to bundle widget {w['id']}: {e}")
+        widgets.append(entry)
+        fingerprint.append({k: v for k, v in entry.items() if k not in ("frame", "parts")})
+
+    raw = json.dumps(fingerprint, sort_keys=True).encode("utf-8")
+    return {"version": hashlib.sha256(raw).hexdigest()[:32], "widgets": widgets}
+
+
+def layout_changes(before, after):
+    """
+    Compare two resolved widget layouts (as returned by get_widget_config)
+    and return a list of (event_type, payload) describing what changed.
+    """
+    old = {w["id"]: w for w in before}
+    new = {w["id"]: w for w in after}
+    changes = []
+
+    for widget_id, w in new.items():
+        prev = old.get(widget_id)
+        was_enabled = bool(prev and prev.get("enabled"))
+        if w.get("enabled") and not was_enabled:
+            changes.append(("widget.enabled", w))
+            continue
+        if not w.get("enabled"):
+            if was_enabled:
+                changes.append(("widget.disabled", {"id": widget_id}))
+            continue
+        if (prev.get("x"), prev.get("y")) != (w.get("x"), w.get("y")):
+            changes.append(("widget.moved", {"id": widget_id, "x": w.get("x"), "y": w.get("y")}))
+        if (prev.get("width"), prev.get("height")) != (w.get("width"), w.get("height")):
+            changes.append(("widget.resized", {"id": widget_id, "width": w.get("width"), "height": w.get("height")}))
+
+    for widget_id, prev in old.items():
+        if widget_id not in new and prev.get("enabled"):
+            changes.append(("widget.disabled", {"id": widget_id}))
+
+    return changes
@@ -0,0 +1,171 @@
+"""
+Widget registry: in-memory index of installed widgets.
+Each widget folder is re-read only when its directory or files change
+(tracked by mtime/size), and a polling watcher keeps the index fresh so
+lookups never touch the filesystem.
+"""
+
+import os
+import re
+import threading
+from lib.profiling import traced
+
+WIDGET_FILES = ("widget.html", "widget.css", "widget.js")
+
+# Seconds between watcher scans
+DEFAULT_POLL_INTERVAL = 2.0
+
+# <!-- aspect-ratio: X:X --> or <!-- aspect-ratio: flex -->
+ASPECT_RATIO_RE = re.compile(r'<!--\s*aspect-ratio:\s*([\w:]+)\s*-->')
+# <!-- lightweight: true --> asks to be mounted in the page instead of an iframe
+LIGHTWEIGHT_RE = re.compile(r'<!--\s*lightweight:\s*(\w+)\s*-->')
+
+
+def parse_aspect_ratio(content):
+    """Read the aspect ratio declared in widget.html, default 2:1."""
+    match = ASPECT_RATIO_RE.search(content)
+    if not match:
+        return 2.0
+    ratio_str = match.group(1)
+    if ratio_str == "flex":
+        return "flex"
+    # Parse "W:H" format to numeric ratio (W / H)
+    parts = ratio_str.split(":")
+    if len(parts) != 2:
+        return 2.0
+    try:
+        w, h = float(parts[0]), float(parts[1])
+        return w / h if h != 0 else 1.0
+    except ValueError:
+        return 1.0
+
+
+def parse_lightweight(content):
+    """Whether widget.html opts into lightweight (Shadow DOM) mode, default False."""
+    match = LIGHTWEIGHT_RE.search(content)
+    return bool(match) and match.group(1).lower() == "true"
+
+
+def _stat_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class WidgetRegistry:
+    """Caches widget metadata keyed on directory and file mtimes."""
+
+    def __init__(self, widgets_dir):
+        self.widgets_dir = widgets_dir
+        self._widgets = {}
+        self._signatures = {}
+        self._scanned = False
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def widgets(self):
+        """Return the widget_id -> metadata mapping (scans once if never scanned)."""
+        if not self._scanned:
+            self.refresh()
+        return self._widgets
+
+    def get(self, widget_id):
+        """O(1) lookup of a single widget's metadata, or None."""
+        return self.widgets().get(widget_id)
+
+    @traced("widgets.scan")
+    def refresh(self):
+        """
+        Re-stat the widgets directory and re-read only widgets whose files changed.
+        Returns (added, removed, modified) sets of widget ids.
+        """
+        with self._lock:
+            try:
+                folders = os.listdir(self.widgets_dir)
+            except OSError:
+                folders = []
+
+            widgets = {}
+            signatures = {}
+            modified = set()
+            for folder in folders:
+                widget_path = os.path.join(self.widgets_dir, folder)
+                signature = tuple(
+                    _stat_signature(os.path.join(widget_path, name)) for name in WIDGET_FILES
+                )
+                # widget.html is required
+                if signature[0] is None:
+                    continue
+
+                signatures[folder] = signature
+                if self._signatures.get(folder) == signature:
+                    widgets[folder] = self._widgets[folder]
+                    continue
+
+                widgets[folder] = self._load(folder, widget_path, signature)
+                if folder in self._signatures:
+                    modified.add(folder)
+
+            added = set(signatures) - set(self._signatures)
+            removed = set(self._signatures) - set(signatures)
+
+            # Swap in new dicts so concurrent readers never see a partial scan
+            self._widgets = widgets
+            self._signatures = signatures
+            self._scanned = True
+            return added, removed, modified
+
+    def _load(self, folder, widget_path, signature):
+        html_file, css_file, js_file = (os.path.join(widget_path, name) for name in WIDGET_FILES)
+        metadata = {
+            "id": folder,
+            "path": widget_path,
+            "html": html_file,
+            "css": css_file if signature[1] is not None else None,
+            "js": js_file if signature[2] is not None else None,
+            "aspect_ratio": 2.0,  # default 2:1, can be overridden per widget
+            "lightweight": False,
+            "signature": signature,
+        }
+        try:
+            with open(html_file, "r") as f:
+                content = f.read()
+            metadata["aspect_ratio"] = parse_aspect_ratio(content)
+            metadata["lightweight"] = parse_lightweight(content)
+        except Exception:
+            pass
+        return metadata
+
+    def start_watcher(self, on_change=None, interval=DEFAULT_POLL_INTERVAL):
+        """
+        Poll the widgets directory in a background thread.
+        on_change(added, removed, modified) is called whenever something changed.
+        """
+        if self._watcher is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    added, removed, modified = self.refresh()
+                except Exception as e:
+                    print(f"Widget watcher error: {e}")
+                    continue
+                if on_change and (added or removed or modified):
+                    on_change(added, removed, modified)
+
+        self.refresh()
+        self._stop.clear()
+        self._watcher = threading.Thread(target=run, name="widget-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        """Stop the background watcher."""
+        if self._watcher is None:
+            return
+        self._stop.set()
+        self._watcher.join()
+        self._watcher = None
@@ -1,3 +1,6 @@
+# Imported first: its load time is the origin of the startup timing report
+from lib import startup
+
 import threading, rumps
 
 from WebKit import WKProcessPool
@@ -5,15 +8,16 @@ from WebKit import WKProcessPool
 from wallpaper_daemon import WallpaperDaemon
 from lib.web_window import WebWindowManager
 from lib.system_wallpaper import SpaceObserver, set_macos_wallpaper
-from lib.thumbnails import get_thumbnail
 from lib.settings_manager import SettingsManager
+from lib.constants import initialize_data_dirs
 
 import web_server
 
+startup.mark("imports")
 
 
-def run_flask():
-    web_server.app.run(host="127.0.0.1", port=8000, debug=False, use_reloader=False)
+def run_server():
+    web_server.serve(host="127.0.0.1", port=8000)
 
 
 class MyLiveWallpaper(rumps.App):
@@ -25,13 +29,19 @@ class MyLiveWallpaper(rumps.App):
         
         PROCESS_POOL = WKProcessPool.alloc().init()
 
+        # Example wallpapers are copied by web_server.start_in_background()
+        initialize_data_dirs(seed_wallpapers=False)
+
         # Initialize settings manager
         settings_manager = SettingsManager()
-        web_server.settings_manager = settings_manager
+        web_server.state.settings_manager = settings_manager
+        # Saved selection only (a stat); picking a default needs a library scan
+        web_server.initialize_wallpaper(fallback=False)
+        startup.mark("settings")
 
-        # Start Flask in background
-        flask_thread = threading.Thread(target=run_flask, daemon=True)
-        flask_thread.start()
+        # Start the HTTP server in background
+        server_thread = threading.Thread(target=run_server, daemon=True)
+        server_thread.start()
 
         # --- Initialize SpaceObserver ---
         def wallpaper_callback():
@@ -41,31 +51,37 @@ class MyLiveWallpaper(rumps.App):
 
         self.space_observer = SpaceObserver.alloc().initWithCallback_(wallpaper_callback)
         self.space_observer.install_space_observers()
+        # Displays added/removed or resized: render stills for the new geometry
+        self.space_observer.on_screens_changed = (
+            lambda: web_server.apply_system_wallpaper(web_server.state.current_wallpaper)
+        )
 
         # Make observer available to Flask server
-        web_server.space_observer = self.space_observer
+        web_server.state.space_observer = self.space_observer
 
         # Create wallpaper daemon
         self.daemon = WallpaperDaemon(PROCESS_POOL)
+
+        def occlusion_callback(visible):
+            """Hold a still frame and pause widget ticks while the wallpaper is covered."""
+            web_server.set_wallpaper_visible(visible)
+
+        self.daemon.on_occlusion_change = occlusion_callback
         self.daemon.create_window()
-        web_server.wallpaper_daemon = self.daemon
+        web_server.state.wallpaper_daemon = self.daemon
+        startup.mark("daemon_window")
 
         self.windows = WebWindowManager(PROCESS_POOL)
 
-        # Initialize wallpaper with saved settings
-        web_server.initialize_wallpaper()
-
         self.menu = [
             rumps.MenuItem("Refresh Wallpaper", self.refresh_wallpaper),
             rumps.MenuItem("Open Wallpaper Library", self.open_library),
             rumps.MenuItem("Widget Center", self.open_widget_center),
         ]
+        startup.mark("menu_bar")
 
-        # --- Set initial wallpaper if any ---
-        if web_server.current_wallpaper:
-            wallpaper_path = get_thumbnail(web_server.current_wallpaper)
-            self.space_observer.current_wallpaper_path = wallpaper_path
-            self.space_observer.reapply_wallpaper()
+        # Seeding, library scan, desktop still and watchers, off the main thread
+        web_server.start_in_background()
 
     def refresh_wallpaper(self, _):
         self.daemon.reload()
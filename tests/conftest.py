@@ -0,0 +1,61 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tests import the app's modules (lib.*) from the repository root
+sys.path.insert(0, ROOT)
+
+# Keep the app's data and caches out of the user's folders; set before lib.constants is imported
+_data_dir = tempfile.mkdtemp(prefix="mlw-tests-")
+os.environ["MLW_DATA_DIR"] = _data_dir
+os.environ["MLW_CACHE_DIR"] = os.path.join(_data_dir, "cache")
+os.environ["MLW_WIDGETS_DIR"] = os.path.join(_data_dir, "widgets")
+shutil.copytree(os.path.join(ROOT, "examples", "widgets"), os.environ["MLW_WIDGETS_DIR"])
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_data_dir, ignore_errors=True)
+
+
+def _wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def wait_for():
+    """Poll condition() until it holds or timeout seconds pass; returns its last value."""
+    return _wait_for
+
+
+@pytest.fixture
+def data_dir():
+    """The session's app data folder (MLW_DATA_DIR); wallpapers, caches and widgets live below it."""
+    return _data_dir
+
+
+@pytest.fixture
+def client():
+    """Flask test client for web_server; events published on the bus are recorded in client.events."""
+    pytest.importorskip("flask")
+    import web_server
+
+    events = []
+    publish = web_server.bus.publish
+    web_server.bus.publish = lambda event_type, data=None: events.append((event_type, data))
+    try:
+        client = web_server.app.test_client()
+        client.events = events
+        yield client
+    finally:
+        web_server.bus.publish = publish
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from lib.app_state import AppState
+
+
+class Settings:
+    def __init__(self):
+        self.saved = []
+
+    def set_selected_background(self, name):
+        self.saved.append(name)
+
+
+def test_select_wallpaper():
+    state = AppState()
+    state.settings_manager = Settings()
+    assert state.select_wallpaper("a.mp4") == "a.mp4"
+    assert state.settings_manager.saved == []
+
+    assert state.select_wallpaper("b.mp4", persist=True) == "b.mp4"
+    assert state.settings_manager.saved == ["b.mp4"]
+    assert state.current_wallpaper == "b.mp4"
+
+
+def test_startup_default_does_not_replace_a_selection():
+    state = AppState()
+    assert state.select_wallpaper(None, replace=False) is None
+    assert state.select_wallpaper("first.mp4", replace=False) == "first.mp4"
+    assert state.select_wallpaper("user.mp4") == "user.mp4"
+    assert state.select_wallpaper("first.mp4", replace=False) == "user.mp4"
+
+
+def test_current_wallpaper_is_only_set_through_select():
+    with pytest.raises(AttributeError):
+        AppState().current_wallpaper = "x.mp4"
+
+
+def test_concurrent_selections_leave_state_and_settings_in_agreement():
+    state = AppState()
+    state.settings_manager = Settings()
+    threads = [threading.Thread(target=state.select_wallpaper, args=(f"{i}.mp4",), kwargs={"persist": True})
+               for i in range(50)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert state.settings_manager.saved[-1] == state.current_wallpaper
@@ -0,0 +1,43 @@
+import json
+import os
+import time
+
+from lib.config_store import ConfigStore
+
+
+def test_writes_are_coalesced(tmp_path, wait_for):
+    path = str(tmp_path / "settings.json")
+    store = ConfigStore(path, default={}, write_delay=0.05)
+    for i in range(10):
+        store.update(lambda data, i=i: data.__setitem__("n", i))
+    assert wait_for(lambda: store.writes == 1)
+    with open(path) as f:
+        assert json.load(f) == {"n": 9}
+
+
+def test_failed_write_is_retried(tmp_path, wait_for):
+    # A file where the parent directory should be makes every write fail
+    blocker = tmp_path / "config"
+    blocker.write_text("")
+    path = str(blocker / "settings.json")
+    store = ConfigStore(path, default={}, write_delay=0.01)
+    store.save({"a": 1})
+    assert wait_for(lambda: store._failures >= 2)
+    assert store.writes == 0
+
+    os.remove(str(blocker))
+    assert wait_for(lambda: store.writes == 1)
+    with open(path) as f:
+        assert json.load(f) == {"a": 1}
+    assert store._failures == 0
+
+
+def test_external_edit_is_picked_up(tmp_path):
+    path = str(tmp_path / "settings.json")
+    store = ConfigStore(path, default={}, write_delay=0.01)
+    store.save({"a": 1})
+    store.flush()
+    with open(path, "w") as f:
+        json.dump({"a": 2, "extra": True}, f)
+    os.utime(path, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+    assert store.load() == {"a": 2, "extra": True}
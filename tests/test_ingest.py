@@ -0,0 +1,50 @@
+import struct
+
+import pytest
+
+from lib.ingest import needs_faststart
+
+
+def box(kind, payload=b"", large=False):
+    if large:
+        return struct.pack(">I4sQ", 1, kind, 16 + len(payload)) + payload
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def write(tmp_path, data, name="clip.mp4"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+FTYP = box(b"ftyp", b"isom\0\0\0\0")
+
+
+@pytest.mark.parametrize("boxes, expected", [
+    ([FTYP, box(b"moov", b"x" * 32), box(b"mdat", b"y" * 64)], False),
+    ([FTYP, box(b"mdat", b"y" * 64), box(b"moov", b"x" * 32)], True),
+    ([FTYP, box(b"mdat", b"y" * 64, large=True), box(b"moov", b"x" * 32)], True),
+    ([FTYP, box(b"free"), box(b"mdat", b"y" * 64)], False),
+])
+def test_box_order(tmp_path, boxes, expected):
+    assert needs_faststart(write(tmp_path, b"".join(boxes))) is expected
+
+
+@pytest.mark.parametrize("data", [
+    # 64-bit size header cut off before the size
+    FTYP + struct.pack(">I4s", 1, b"mdat") + b"\0\0\0",
+    # mdat claims more bytes than the file holds
+    FTYP + struct.pack(">I4s", 4096, b"mdat") + b"y" * 64,
+    # moov cut off mid-box after the media data
+    FTYP + box(b"mdat", b"y" * 64) + box(b"moov", b"x" * 32)[:20],
+    # box size smaller than its header
+    FTYP + struct.pack(">I4s", 4, b"mdat") + b"y" * 64,
+    b"",
+])
+def test_truncated_files_are_not_faststart_candidates(tmp_path, data):
+    assert needs_faststart(write(tmp_path, data)) is False
+
+
+def test_other_extensions_are_skipped(tmp_path):
+    data = FTYP + box(b"mdat", b"y" * 64) + box(b"moov", b"x" * 32)
+    assert needs_faststart(write(tmp_path, data, "clip.webm")) is False
@@ -0,0 +1,28 @@
+import threading
+
+from lib.jobs import JobQueue
+
+
+def test_lane_jobs_do_not_wait_behind_the_shared_workers():
+    jobs = JobQueue(workers=1, lanes={"desktop_still": 1})
+    release = threading.Event()
+    still_done = threading.Event()
+    jobs.start()
+
+    # Occupy the shared worker and queue more work behind it
+    jobs.submit("transcode", "a", lambda job: release.wait(5))
+    jobs.submit("transcode", "b", lambda job: None)
+    job = jobs.submit("desktop_still", "x", lambda job: still_done.set())
+    try:
+        assert still_done.wait(2)
+        assert jobs.depth == 1
+    finally:
+        release.set()
+    assert job.id == 3 and jobs.get(3) is job
+
+
+def test_duplicate_active_jobs_are_merged():
+    jobs = JobQueue(workers=1)
+    first = jobs.submit("import", "a.mp4", lambda job: None)
+    assert jobs.submit("import", "a.mp4", lambda job: None) is first
+    assert jobs.depth == 1
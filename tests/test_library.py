@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from lib.library import WallpaperLibrary
+
+FILES = {"Beach.mp4": 300, "city_night.mp4": 100, "city-day.mp4": 200, "50% off.mov": 50, "notes.txt": 10}
+
+
+@pytest.fixture
+def library(tmp_path):
+    wallpaper_dir = tmp_path / "wallpapers"
+    wallpaper_dir.mkdir()
+    for name, size in FILES.items():
+        (wallpaper_dir / name).write_bytes(b"\0" * size)
+    return WallpaperLibrary(str(wallpaper_dir), str(tmp_path / "library.sqlite3"))
+
+
+def names(library, **kwargs):
+    return [item["name"] for item in library.query(**kwargs)[1]]
+
+
+def test_only_videos_are_indexed(library):
+    assert library.names() == ["50% off.mov", "Beach.mp4", "city-day.mp4", "city_night.mp4"]
+    assert library.contains("Beach.mp4") and not library.contains("notes.txt")
+
+
+def test_sort_is_case_insensitive_and_reversible(library):
+    assert names(library) == ["50% off.mov", "Beach.mp4", "city-day.mp4", "city_night.mp4"]
+    assert names(library, sort="size") == ["50% off.mov", "city_night.mp4", "city-day.mp4", "Beach.mp4"]
+    assert names(library, sort="size", descending=True)[0] == "Beach.mp4"
+    # Unknown columns fall back to the name
+    assert names(library, sort="name; DROP TABLE wallpapers") == names(library)
+
+
+def test_paging_reports_the_total(library):
+    total, items = library.query(offset=1, limit=2)
+    assert total == 4
+    assert [item["name"] for item in items] == ["Beach.mp4", "city-day.mp4"]
+    assert names(library, offset=3, limit=10) == ["city_night.mp4"]
+    assert names(library, offset=-5, limit=1) == ["50% off.mov"]
+
+
+def test_search_is_a_case_insensitive_substring(library):
+    assert library.query(query="CITY")[0] == 2
+    assert names(library, query="beach") == ["Beach.mp4"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("_", ["city_night.mp4"]),
+    ("%", ["50% off.mov"]),
+    ("y_n", ["city_night.mp4"]),
+    ("\\", []),
+])
+def test_like_wildcards_match_literally(library, query, expected):
+    assert names(library, query=query) == expected
+
+
+def test_refresh_reports_changes(library):
+    library.names()
+    os.remove(os.path.join(library.wallpaper_dir, "Beach.mp4"))
+    with open(os.path.join(library.wallpaper_dir, "new.webm"), "wb") as f:
+        f.write(b"\0")
+    added, removed, changed = library.refresh(force=True)
+    assert (added, removed, changed) == ({"new.webm"}, {"Beach.mp4"}, set())
+
+
+def test_list_wallpapers_endpoint(client, library, monkeypatch):
+    import web_server
+
+    monkeypatch.setattr(web_server, "library", library)
+    monkeypatch.setattr(web_server, "MAX_PAGE_SIZE", 2)
+    data = client.get("/api/wallpapers?q=city&sort=size&order=desc&limit=50").get_json()
+    assert data["total"] == 2
+    assert data["wallpapers"] == ["city-day.mp4", "city_night.mp4"]
+    assert len(client.get("/api/wallpapers?limit=50").get_json()["items"]) == 2
@@ -0,0 +1,48 @@
+from lib.metrics import Registry
+
+
+def test_counter_and_gauge_rendering():
+    registry = Registry()
+    requests = registry.counter("t_requests_total", "Requests.", ("route", "status"))
+    requests.inc("/api/x", "200")
+    requests.inc("/api/x", "200", by=2)
+    requests.inc('say "hi"\n', "404")
+    registry.gauge("t_depth", "Queue depth.", lambda: 3)
+    registry.gauge("t_pool", "Busy workers.", lambda: {("api",): 1, ("stream",): 0}, labels=("pool",))
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP t_requests_total Requests.", "# TYPE t_requests_total counter"]
+    assert 't_requests_total{route="/api/x",status="200"} 3' in lines
+    assert 't_requests_total{route="say \\"hi\\"\\n",status="404"} 1' in lines
+    assert "# TYPE t_depth gauge" in lines and "t_depth 3" in lines
+    assert 't_pool{pool="api"} 1' in lines and 't_pool{pool="stream"} 0' in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("t_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(value, "/x")
+
+    lines = registry.render().splitlines()
+    assert 't_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{route="/x",le="1.0"} 3' in lines
+    assert 't_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 't_seconds_sum{route="/x"} 6.05' in lines
+    assert 't_seconds_count{route="/x"} 4' in lines
+
+
+def test_failing_or_empty_gauges_are_skipped():
+    registry = Registry()
+    registry.gauge("t_broken", "Broken.", lambda: 1 / 0)
+    registry.gauge("t_none", "Nothing yet.", lambda: None)
+    lines = registry.render().splitlines()
+    assert not [line for line in lines if not line.startswith("#")]
+
+
+def test_metrics_endpoint(client):
+    client.get("/api/wallpapers")
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE mlw_http_requests_total counter" in response.get_data(as_text=True)
@@ -0,0 +1,149 @@
+import datetime
+
+import pytest
+
+from lib.playback_policy import (
+    DEFAULT_POLICY, ManualSource, PlaybackPolicy, ScheduleSource, StaticSource, decide,
+)
+
+# Nominal desktop: on AC, not throttled, just used
+NOMINAL = {"on_ac": True, "thermal_pressure": "nominal", "idle_seconds": 0}
+
+
+def policy(**overrides):
+    return dict(DEFAULT_POLICY, **overrides)
+
+
+def clock(hour, minute=0):
+    return lambda: datetime.datetime(2026, 1, 1, hour, minute)
+
+
+# --- decide() ---
+
+@pytest.mark.parametrize("signals, expected", [
+    ({}, ("full", "default")),
+    (NOMINAL, ("full", "default")),
+    (dict(NOMINAL, scheduled_mode="reduced"), ("reduced", "schedule")),
+    (dict(NOMINAL, scheduled_mode=None), ("full", "default")),
+    (dict(NOMINAL, occluded=True), ("still", "occluded")),
+    (dict(NOMINAL, idle_seconds=600), ("still", "idle")),
+    (dict(NOMINAL, idle_seconds=599), ("full", "default")),
+    (dict(NOMINAL, thermal_pressure="critical"), ("still", "thermal")),
+    (dict(NOMINAL, thermal_pressure="serious"), ("reduced", "thermal")),
+    (dict(NOMINAL, on_ac=False), ("reduced", "on battery")),
+    (dict(NOMINAL, on_ac=False, battery_percent=21), ("reduced", "on battery")),
+    (dict(NOMINAL, on_ac=False, battery_percent=20), ("still", "low battery")),
+    # Unknown power source isn't treated as battery
+    (dict(NOMINAL, on_ac=None), ("full", "default")),
+])
+def test_decide(signals, expected):
+    assert decide(signals) == expected
+
+
+def test_decide_precedence():
+    everything = {"scheduled_mode": "full", "occluded": True, "idle_seconds": 10_000,
+                  "thermal_pressure": "critical", "on_ac": False, "battery_percent": 5}
+    assert decide(everything) == ("full", "schedule")
+    del everything["scheduled_mode"]
+    assert decide(everything) == ("still", "occluded")
+    del everything["occluded"]
+    assert decide(everything) == ("still", "idle")
+    del everything["idle_seconds"]
+    assert decide(everything) == ("still", "thermal")
+    del everything["thermal_pressure"]
+    assert decide(everything) == ("still", "low battery")
+
+
+def test_decide_idle_disabled():
+    assert decide(dict(NOMINAL, idle_seconds=10_000), policy(idle_still_after=0)) == ("full", "default")
+
+
+def test_decide_low_battery_threshold():
+    signals = dict(NOMINAL, on_ac=False, battery_percent=40)
+    assert decide(signals, policy(low_battery_percent=50)) == ("still", "low battery")
+
+
+# --- ScheduleSource ---
+
+NIGHT = [{"start": "23:00", "end": "07:00", "mode": "still"}]
+
+
+@pytest.mark.parametrize("hour, minute, expected", [
+    (23, 0, "still"),
+    (23, 59, "still"),
+    (0, 0, "still"),
+    (6, 59, "still"),
+    (7, 0, None),
+    (12, 0, None),
+    (22, 59, None),
+])
+def test_schedule_window_across_midnight(hour, minute, expected):
+    source = ScheduleSource(NIGHT, clock=clock(hour, minute))
+    assert source.read() == {"scheduled_mode": expected}
+
+
+def test_schedule_same_day_window():
+    window = [{"start": "09:00", "end": "17:00", "mode": "reduced"}]
+    assert ScheduleSource(window, clock=clock(9)).read() == {"scheduled_mode": "reduced"}
+    assert ScheduleSource(window, clock=clock(17)).read() == {"scheduled_mode": None}
+    assert ScheduleSource(window, clock=clock(8, 59)).read() == {"scheduled_mode": None}
+
+
+def test_schedule_first_matching_window_wins_and_bad_modes_are_ignored():
+    windows = [{"start": "22:00", "end": "02:00", "mode": "bogus"},
+               {"start": "23:00", "end": "01:00", "mode": "reduced"},
+               {"start": "00:00", "end": "06:00", "mode": "still"}]
+    assert ScheduleSource(windows, clock=clock(0, 30)).read() == {"scheduled_mode": "reduced"}
+    assert ScheduleSource(windows, clock=clock(1, 30)).read() == {"scheduled_mode": "still"}
+    assert ScheduleSource(windows, clock=clock(22, 30)).read() == {"scheduled_mode": None}
+
+
+# --- PlaybackPolicy ---
+
+def test_evaluate_notifies_only_on_change():
+    occlusion = ManualSource("occlusion", occluded=False)
+    playback = PlaybackPolicy([StaticSource(**NOMINAL), occlusion])
+    changes = []
+    playback.on_change = lambda mode, reason, signals: changes.append((mode, reason, signals["occluded"]))
+
+    assert playback.evaluate() == "full"
+    assert changes == []
+
+    occlusion.set(occluded=True)
+    assert playback.evaluate() == "still"
+    assert playback.evaluate() == "still"
+    assert changes == [("still", "occluded", True)]
+    assert playback.state()["reason"] == "occluded"
+
+    occlusion.set(occluded=False)
+    playback.evaluate()
+    assert changes[-1] == ("full", "default", False)
+
+
+def test_later_sources_win():
+    playback = PlaybackPolicy([StaticSource(**NOMINAL), StaticSource(on_ac=False)])
+    assert playback.evaluate() == "reduced"
+    assert playback.state()["signals"]["on_ac"] is False
+
+
+def test_failing_source_is_skipped():
+    class Broken(StaticSource):
+        name = "broken"
+
+        def read(self):
+            raise OSError("no pmset here")
+
+    playback = PlaybackPolicy([StaticSource(**NOMINAL), Broken()])
+    assert playback.evaluate() == "full"
+
+
+def test_configure_schedule_and_disable():
+    playback = PlaybackPolicy([StaticSource(**NOMINAL)])
+    playback._schedule.clock = clock(23, 30)
+    playback.configure({"schedule": NIGHT})
+    assert playback.evaluate() == "still"
+    assert playback.state()["reason"] == "schedule"
+
+    playback.configure({"enabled": False})
+    assert playback.evaluate() == "full"
+    assert playback.state()["reason"] == "policy disabled"
@@ -0,0 +1,85 @@
+import time
+
+from lib import profiling
+from lib.profiling import Profiler
+
+
+def make_app(profiler, delay=0.0):
+    def app(environ, start_response):
+        with profiler.span("work", step=1):
+            time.sleep(delay)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"ok"]
+    return app
+
+
+def call(wsgi, path="/x", query="", **environ):
+    captured = {}
+
+    def start_response(status, headers, exc_info=None):
+        captured["status"], captured["headers"] = status, dict(headers)
+
+    result = wsgi(dict({"REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query}, **environ),
+                  start_response)
+    body = b"".join(result)
+    if hasattr(result, "close"):
+        result.close()
+    return captured["status"], captured["headers"], body
+
+
+def test_disabled_profiler_is_a_pass_through():
+    profiler = Profiler()
+    app = make_app(profiler)
+    assert profiler.span("anything") is profiling._NO_SPAN
+    result = profiler.wsgi(app)({"REQUEST_METHOD": "GET", "PATH_INFO": "/x"}, lambda *a: None)
+    assert result == [b"ok"]
+
+    profiler.slow_ms = 0
+    call(profiler.wsgi(app), HTTP_X_PROFILE="1")
+    assert profiler.slow_requests() == []
+
+
+def test_slow_requests_are_recorded_with_spans():
+    profiler = Profiler()
+    profiler.configure(enabled=True, slow_ms=20)
+    wsgi = profiler.wsgi(make_app(profiler, delay=0.03))
+    status, _, body = call(wsgi, "/slow")
+    assert status == "200 OK" and body == b"ok"
+
+    (entry,) = profiler.slow_requests()
+    assert entry["path"] == "/slow" and entry["status"] == "200"
+    assert [s["name"] for s in entry["spans"]] == ["work"]
+    assert entry["spans"][0]["meta"] == {"step": 1}
+
+    profiler.configure(slow_ms=10_000)
+    call(profiler.wsgi(make_app(profiler)), "/fast")
+    assert len(profiler.slow_requests()) == 1
+
+
+def test_profile_on_request():
+    profiler = Profiler()
+    profiler.configure(enabled=True, slow_ms=10_000)
+    wsgi = profiler.wsgi(make_app(profiler))
+    _, headers, _ = call(wsgi, query="a=1&_profile=1")
+    profile_id = int(headers["X-Profile-Id"])
+    assert "cumulative" in profiler.profile_report(profile_id)
+    assert profiler.slow_requests()[0]["profiled"]
+    # The cProfile lock was released with the response
+    _, headers, _ = call(wsgi, HTTP_X_PROFILE="1")
+    assert headers["X-Profile-Id"] != "busy"
+
+
+def test_ring_buffer_keeps_only_recent_entries():
+    profiler = Profiler()
+    profiler.configure(enabled=True, slow_ms=0, keep=3)
+    wsgi = profiler.wsgi(make_app(profiler))
+    for i in range(5):
+        call(wsgi, f"/{i}")
+    assert [e["path"] for e in profiler.slow_requests()] == ["/4", "/3", "/2"]
+
+
+def test_debug_endpoints_are_hidden_while_disabled(client):
+    import web_server
+
+    assert not web_server.profiler.enabled
+    assert client.get("/api/debug/slow").status_code == 404
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from lib.screens import FakeScreenProvider, pixel_size
+
+Image = pytest.importorskip("PIL.Image")
+
+from lib.screen_stills import ScreenStills  # noqa: E402
+
+HD = {"id": "hd", "main": True, "frame": {"width": 1920, "height": 1080, "x": 0, "y": 0},
+      "visible": {"width": 1920, "height": 1050, "x": 0, "y": 0}, "scale": 1.0}
+RETINA = {"id": "retina", "main": False, "frame": {"width": 1512, "height": 982, "x": 1920, "y": 0},
+          "visible": {"width": 1512, "height": 950, "x": 1920, "y": 0}, "scale": 2.0}
+PORTRAIT = {"id": "portrait", "main": False, "frame": {"width": 1080, "height": 1920, "x": -1080, "y": 0},
+            "visible": {"width": 1080, "height": 1920, "x": -1080, "y": 0}, "scale": 1.0}
+
+
+def make_still(tmp_path, width, height):
+    path = str(tmp_path / f"still-{width}x{height}.png")
+    Image.new("RGB", (width, height), (40, 80, 120)).save(path)
+    return path
+
+
+def sizes(images):
+    result = {}
+    for screen_id, path in images.items():
+        with Image.open(path) as img:
+            result[screen_id] = img.size
+    return result
+
+
+def test_stills_match_each_screen(tmp_path):
+    screens = FakeScreenProvider([HD, RETINA, PORTRAIT])
+    stills = ScreenStills(str(tmp_path / "stills"))
+    images = stills.render("abc", make_still(tmp_path, 7680, 4320), screens.screens())
+    assert sizes(images) == {"hd": (1920, 1080), "retina": (3024, 1964), "portrait": (1080, 1920)}
+    assert pixel_size(RETINA) == (3024, 1964)
+
+
+def test_small_source_is_cropped_not_upscaled(tmp_path):
+    stills = ScreenStills(str(tmp_path / "stills"))
+    images = stills.render("abc", make_still(tmp_path, 1000, 2000), FakeScreenProvider([HD]).screens())
+    width, height = sizes(images)["hd"]
+    assert width <= 1000 and height <= 2000
+    assert width == 1000
+    assert abs(width / height - 1920 / 1080) < 0.01
+
+
+def test_geometries_are_cached_per_key(tmp_path):
+    provider = FakeScreenProvider([HD])
+    stills = ScreenStills(str(tmp_path / "stills"))
+    source = make_still(tmp_path, 3840, 2160)
+    first = stills.render("abc", source, provider.screens())["hd"]
+    mtime = os.stat(first).st_mtime_ns
+
+    # A display change only renders the new geometry
+    provider.set_screens([HD, PORTRAIT])
+    images = stills.render("abc", source, provider.screens())
+    assert images["hd"] == first and os.stat(first).st_mtime_ns == mtime
+    assert sizes(images)["portrait"] == (1080, 1920)
+
+    stills.prune(["other"])
+    assert os.listdir(str(tmp_path / "stills")) == []
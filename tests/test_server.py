@@ -0,0 +1,176 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from lib.server import WSGIServer, request_path
+
+RELEASE_TIMEOUT = 5
+
+
+def app(environ, start_response):
+    path = environ["PATH_INFO"]
+    if path == "/block":
+        environ["test.release"].wait(RELEASE_TIMEOUT)
+    if path == "/chunked":
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"one", b"two"]
+    if path == "/user":
+        body = environ.get("HTTP_X_USER", "-").encode()
+        start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))])
+        return [body]
+    body = f"{environ['REQUEST_METHOD']} {path}".encode()
+    start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))])
+    return [body]
+
+
+@pytest.fixture
+def server():
+    release = threading.Event()
+
+    def wrapped(environ, start_response):
+        environ["test.release"] = release
+        return app(environ, start_response)
+
+    srv = WSGIServer(wrapped, port=0, pools={"api": 2, "stream": 1, "events": 1},
+                     classify=lambda method, path: "stream" if path == "/block" else "api",
+                     keep_alive=0.5, request_timeout=5)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    srv.release = release
+    try:
+        yield srv
+    finally:
+        release.set()
+        srv.shutdown()
+        thread.join(5)
+
+
+def connect(server):
+    sock = socket.create_connection(("127.0.0.1", server.port), timeout=5)
+    return sock, sock.makefile("rb")
+
+
+def get(path, extra=""):
+    return f"GET {path} HTTP/1.1\r\nHost: test\r\n{extra}\r\n".encode()
+
+
+def read_response(rfile):
+    """(status, headers, body) of one response; handles Content-Length and chunked bodies."""
+    status = rfile.readline().decode().strip()
+    headers = {}
+    while True:
+        line = rfile.readline().decode().strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "content-length" in headers:
+        body = rfile.read(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        body = b""
+        while True:
+            size = int(rfile.readline().strip(), 16)
+            body += rfile.read(size)
+            rfile.readline()
+            if size == 0:
+                break
+    else:
+        body = rfile.read()
+    return status, headers, body
+
+
+def test_request_path():
+    assert request_path(b"GET /api/x?y=1 HTTP/1.1\r\nHost: a\r\n") == ("GET", "/api/x")
+    assert request_path(b"GET http://host/video?v=2 HTTP/1.1\r\n") == ("GET", "/video")
+    assert request_path(b"garbage") == ("", "/")
+
+
+def test_keep_alive_reuses_the_connection(server, wait_for):
+    sock, rfile = connect(server)
+    with sock:
+        for path in ("/a", "/b", "/c"):
+            sock.sendall(get(path))
+            status, headers, body = read_response(rfile)
+            assert status == "HTTP/1.1 200 OK"
+            assert body == f"GET {path}".encode()
+            assert "connection" not in headers
+    assert wait_for(lambda: server.stats()["api"]["requests"] == 3)
+
+
+def test_pipelined_requests_are_answered_in_order(server):
+    sock, rfile = connect(server)
+    with sock:
+        sock.sendall(get("/one") + get("/two") + get("/three"))
+        bodies = [read_response(rfile)[2] for _ in range(3)]
+    assert bodies == [b"GET /one", b"GET /two", b"GET /three"]
+
+
+def test_unread_request_body_is_drained(server):
+    sock, rfile = connect(server)
+    with sock:
+        sock.sendall(b"POST /upload HTTP/1.1\r\nHost: test\r\nContent-Length: 5\r\n\r\nhello" + get("/after"))
+        assert read_response(rfile)[2] == b"POST /upload"
+        assert read_response(rfile)[2] == b"GET /after"
+
+
+def test_chunked_response_without_content_length(server):
+    sock, rfile = connect(server)
+    with sock:
+        sock.sendall(get("/chunked"))
+        status, headers, body = read_response(rfile)
+    assert headers["transfer-encoding"] == "chunked"
+    assert body == b"onetwo"
+
+
+def test_header_names_with_underscores_are_dropped(server):
+    sock, rfile = connect(server)
+    with sock:
+        sock.sendall(get("/user", "X_User: admin\r\n"))
+        assert read_response(rfile)[2] == b"-"
+        sock.sendall(get("/user", "X-User: alice\r\nX_User: admin\r\n"))
+        assert read_response(rfile)[2] == b"alice"
+
+
+def test_connection_close_is_honoured(server):
+    sock, rfile = connect(server)
+    with sock:
+        sock.sendall(get("/bye", "Connection: close\r\n"))
+        status, headers, body = read_response(rfile)
+        assert headers["connection"] == "close"
+        assert rfile.read() == b""
+
+
+def test_idle_connection_is_closed(server):
+    sock, rfile = connect(server)
+    with sock:
+        sock.sendall(get("/a"))
+        read_response(rfile)
+        start = time.monotonic()
+        # keep_alive is 0.5 s; the loop checks for expired connections at least once a second
+        assert rfile.read() == b""
+        assert time.monotonic() - start < 3
+
+
+def test_busy_pool_does_not_block_other_pools(server, wait_for):
+    blocker, blocker_file = connect(server)
+    waiting, waiting_file = connect(server)
+    with blocker, waiting:
+        blocker.sendall(get("/block"))
+        assert wait_for(lambda: server.stats()["stream"]["busy"] == 1)
+        # The single stream worker is taken: the next stream request queues...
+        waiting.sendall(get("/block"))
+        assert wait_for(lambda: server.stats()["stream"]["waiting"] == 1)
+
+        # ...while API requests are still served right away
+        sock, rfile = connect(server)
+        with sock:
+            sock.sendall(get("/api/status"))
+            assert read_response(rfile)[2] == b"GET /api/status"
+
+        server.release.set()
+        assert read_response(blocker_file)[2] == b"GET /block"
+        assert read_response(waiting_file)[2] == b"GET /block"
+    # Counted just after the response is written
+    assert wait_for(lambda: server.stats()["stream"]["requests"] == 2)
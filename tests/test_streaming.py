@@ -0,0 +1,59 @@
+import pytest
+
+flask = pytest.importorskip("flask")
+
+from lib.streaming import send_video  # noqa: E402
+
+DATA = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def video_client(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(DATA)
+    app = flask.Flask(__name__)
+
+    @app.route("/video")
+    def video():
+        return send_video(str(path))
+
+    return app.test_client()
+
+
+def test_full_response_advertises_ranges(video_client):
+    response = video_client.get("/video")
+    assert response.status_code == 200
+    assert response.data == DATA
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["Content-Type"] == "video/mp4"
+    assert response.headers["ETag"]
+
+
+def test_range_request_is_partial(video_client):
+    response = video_client.get("/video", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.data == DATA[100:200]
+    assert response.headers["Content-Range"] == f"bytes 100-199/{len(DATA)}"
+
+    tail = video_client.get("/video", headers={"Range": "bytes=-24"})
+    assert tail.status_code == 206 and tail.data == DATA[-24:]
+
+
+def test_unsatisfiable_range(video_client):
+    response = video_client.get("/video", headers={"Range": f"bytes={len(DATA)}-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(DATA)}"
+
+
+def test_etag_validation(video_client):
+    etag = video_client.get("/video").headers["ETag"]
+    assert video_client.get("/video", headers={"If-None-Match": etag}).status_code == 304
+    assert video_client.get("/video", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_range_with_a_stale_etag_sends_the_whole_file(video_client):
+    etag = video_client.get("/video").headers["ETag"]
+    current = video_client.get("/video", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert current.status_code == 206
+    stale = video_client.get("/video", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200 and stale.data == DATA
@@ -0,0 +1,115 @@
+import threading
+import time
+
+from lib import system_metrics
+from lib.system_metrics import StaticSource, SystemMetrics
+
+
+class CountingSource(StaticSource):
+    def __init__(self, **metrics):
+        super().__init__(**metrics)
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+        return super().read()
+
+
+def test_snapshot_merges_sources_with_null_defaults():
+    metrics = SystemMetrics([StaticSource(cpu_percent=12.5, uptime_seconds=60), StaticSource(cpu_percent=20.0)])
+    snapshot = metrics.sample()
+    assert snapshot["cpu_percent"] == 20.0
+    assert snapshot["uptime_seconds"] == 60
+    assert snapshot["battery_percent"] is None and snapshot["on_ac"] is None
+    assert "time" in snapshot
+
+
+def test_failing_source_is_skipped():
+    class Broken(StaticSource):
+        def read(self):
+            raise OSError("no sysctl here")
+
+    assert SystemMetrics([Broken(), StaticSource(memory_percent=40.0)]).sample()["memory_percent"] == 40.0
+
+
+def test_default_sources_run_here():
+    snapshot = SystemMetrics(system_metrics.default_sources()).sample()
+    assert set(snapshot) >= {"battery_percent", "on_ac", "time"}
+
+
+def test_samples_only_while_read(monkeypatch, wait_for):
+    monkeypatch.setattr(system_metrics, "LEASE_INTERVALS", 3)
+    source = CountingSource(cpu_percent=1.0)
+    metrics = SystemMetrics([source], interval=0.05)
+    metrics.start()
+    try:
+        # Started, but nobody asked yet
+        time.sleep(0.2)
+        assert source.reads == 0
+
+        metrics.read()
+        assert wait_for(lambda: source.reads >= 3)
+
+        # Lease (3 intervals) runs out: sampling stops
+        time.sleep(0.3)
+        idle = source.reads
+        time.sleep(0.3)
+        assert source.reads == idle
+    finally:
+        metrics.stop()
+
+
+def test_paused_provider_does_not_sample(wait_for):
+    source = CountingSource(cpu_percent=1.0)
+    metrics = SystemMetrics([source], interval=0.05)
+    metrics.start()
+    try:
+        metrics.read()
+        metrics.set_paused(True)
+        time.sleep(0.1)
+        paused = source.reads
+        time.sleep(0.3)
+        # Reads while paused are served from memory, even when stale
+        metrics.read()
+        assert source.reads == paused
+
+        metrics.set_paused(False)
+        metrics.read()
+        assert wait_for(lambda: source.reads > paused + 1)
+    finally:
+        metrics.stop()
+
+
+class GatedSource(CountingSource):
+    """Blocks each read until the test opens the gate."""
+
+    def __init__(self, **metrics):
+        super().__init__(**metrics)
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def read(self):
+        self.gate.wait(5)
+        return super().read()
+
+
+def test_read_never_samples_on_the_callers_thread(wait_for):
+    source = GatedSource(cpu_percent=1.0)
+    metrics = SystemMetrics([source], interval=0.05)
+    assert metrics.read() == system_metrics.EMPTY_SNAPSHOT
+    assert source.reads == 0
+
+    metrics.start()
+    try:
+        # The lease taken above wakes the sampler thread
+        assert wait_for(lambda: metrics.snapshot()["cpu_percent"] == 1.0)
+        # Idle again: the stale snapshot is served right away and the thread woken
+        assert wait_for(lambda: not metrics.active)
+        stale = metrics.snapshot()
+        source.gate.clear()
+        assert metrics.read() == stale
+        source.gate.set()
+        assert wait_for(lambda: metrics.snapshot()["time"] > stale["time"])
+    finally:
+        source.gate.set()
+        metrics.stop()
@@ -0,0 +1,97 @@
+import os
+from concurrent.futures import Future
+
+from lib import thumbnails
+from lib.thumbnails import ThumbnailCache, ThumbnailService
+
+
+def write_renditions(cache_dir, key, still_bytes, ladder_bytes):
+    os.makedirs(cache_dir, exist_ok=True)
+    renditions = {}
+    for name, size in [("still", still_bytes), ("320.jpeg", ladder_bytes)]:
+        path = os.path.join(cache_dir, f"{key}-{name}")
+        with open(path, "wb") as f:
+            f.write(b"\0" * size)
+        renditions[name] = path
+    return renditions
+
+
+def test_budget_counts_the_ladder_not_the_still(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), budget_bytes=1000)
+    for i in range(3):
+        cache.store(f"k{i}", f"v{i}.mp4", write_renditions(str(tmp_path), f"k{i}", 5000, 300))
+    assert all(cache.lookup(f"k{i}") for i in range(3))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), budget_bytes=1000)
+    for i in range(2):
+        cache.store(f"k{i}", f"v{i}.mp4", write_renditions(str(tmp_path), f"k{i}", 10, 400))
+    cache._entries["k0"]["last_access"] += 100
+    cache.store("k2", "v2.mp4", write_renditions(str(tmp_path), "k2", 10, 400))
+
+    assert cache.lookup("k1") is None
+    assert cache.lookup("k0") and cache.lookup("k2")
+    assert not os.path.exists(os.path.join(str(tmp_path), "k1-still"))
+
+
+
+def test_prune_drops_deleted_videos_and_their_files(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), budget_bytes=1000)
+    for i in range(2):
+        cache.store(f"k{i}", f"v{i}.mp4", write_renditions(str(tmp_path), f"k{i}", 10, 100))
+    assert cache.prune(["v1.mp4"]) == 1
+    assert cache.lookup("k0") is None and cache.lookup("k1")
+    assert not os.path.exists(os.path.join(str(tmp_path), "k0-320.jpeg"))
+    # The manifest on disk agrees
+    assert ThumbnailCache(str(tmp_path), budget_bytes=1000).lookup("k0") is None
+
+
+def test_new_version_of_a_video_replaces_the_old_entry(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), budget_bytes=1000)
+    cache.store("old", "v.mp4", write_renditions(str(tmp_path), "old", 10, 100))
+    cache.store("new", "v.mp4", write_renditions(str(tmp_path), "new", 10, 100))
+    assert cache.lookup("old") is None and cache.lookup("new")
+
+class ManualPool:
+    """Executor stand-in whose jobs are finished by the test."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        job = Future()
+        self.jobs.append((args, job))
+        return job
+
+
+def make_service(tmp_path, monkeypatch):
+    monkeypatch.setattr(thumbnails, "WALLPAPER_DIR", str(tmp_path))
+    with open(tmp_path / "clip.mp4", "wb") as f:
+        f.write(b"\0" * 1024)
+    service = ThumbnailService(ThumbnailCache(str(tmp_path / "cache"), budget_bytes=10**6))
+    service._executor = ManualPool()
+    return service
+
+
+def test_concurrent_requests_share_one_render(tmp_path, monkeypatch):
+    service = make_service(tmp_path, monkeypatch)
+    futures = [service.request("clip.mp4") for _ in range(3)]
+    assert len(service._executor.jobs) == 1
+    (video_path, cache_dir, key), job = service._executor.jobs[0]
+    renditions = write_renditions(cache_dir, key, 10, 10)
+    job.set_result(renditions)
+
+    assert all(f.result(1) == renditions for f in futures)
+    assert service.request("clip.mp4").result(1) == renditions
+    assert len(service._executor.jobs) == 1
+
+
+def test_failed_render_is_not_retried(tmp_path, monkeypatch):
+    service = make_service(tmp_path, monkeypatch)
+    first = service.request("clip.mp4")
+    service._executor.jobs[0][1].set_exception(ValueError("no frames"))
+
+    assert first.result(1) is None
+    assert service.request("clip.mp4").result(1) is None
+    assert len(service._executor.jobs) == 1
@@ -0,0 +1,85 @@
+import json
+import os
+
+from lib import variants
+from lib.variants import VariantManager, variant_key
+
+ROW = {"fingerprint": "fp", "duration": 10}
+SPEC = {"width": 1280, "height": 720, "fps": 30}
+
+
+class Job:
+    def update(self, **fields):
+        pass
+
+
+class ImmediateJobs:
+    """Runs submitted jobs right away and counts them."""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, kind, target, fn):
+        self.submitted += 1
+        try:
+            fn(Job())
+        except Exception:
+            pass
+
+
+def failing_encode(args):
+    raise RuntimeError("ffmpeg failed: no video stream")
+
+
+def test_failed_transcode_backs_off(tmp_path, monkeypatch):
+    monkeypatch.setattr(variants, "run_measured", failing_encode)
+    monkeypatch.setattr(variants, "ffmpeg_binary", lambda: "ffmpeg")
+    jobs = ImmediateJobs()
+    manager = VariantManager(str(tmp_path), jobs)
+    source = str(tmp_path / "clip.mp4")
+
+    for _ in range(3):
+        assert manager.resolve("clip.mp4", source, ROW, SPEC) is None
+    assert jobs.submitted == 1
+
+    # The failure survives a restart
+    with open(manager.manifest_path) as f:
+        failure = json.load(f)["failures"][variant_key("fp", SPEC)]
+    assert failure["attempts"] == 1 and "no video stream" in failure["error"]
+    restarted = VariantManager(str(tmp_path), jobs)
+    assert restarted.resolve("clip.mp4", source, ROW, SPEC) is None
+    assert jobs.submitted == 1
+
+
+def test_retry_after_backoff_doubles_the_delay(tmp_path, monkeypatch):
+    monkeypatch.setattr(variants, "run_measured", failing_encode)
+    monkeypatch.setattr(variants, "ffmpeg_binary", lambda: "ffmpeg")
+    jobs = ImmediateJobs()
+    manager = VariantManager(str(tmp_path), jobs)
+    key = variant_key("fp", SPEC)
+    manager.resolve("clip.mp4", "clip.mp4", ROW, SPEC)
+    first = manager._failures[key]["retry_at"]
+
+    manager._failures[key]["retry_at"] = 0
+    manager.resolve("clip.mp4", "clip.mp4", ROW, SPEC)
+    assert jobs.submitted == 2
+    failure = manager._failures[key]
+    assert failure["attempts"] == 2
+    assert failure["retry_at"] - first > variants.FAILURE_RETRY_DELAY * 0.9
+
+
+def test_prune_forgets_failures_of_deleted_wallpapers(tmp_path, monkeypatch):
+    monkeypatch.setattr(variants, "run_measured", failing_encode)
+    monkeypatch.setattr(variants, "ffmpeg_binary", lambda: "ffmpeg")
+    manager = VariantManager(str(tmp_path), ImmediateJobs())
+    manager.resolve("clip.mp4", "clip.mp4", ROW, SPEC)
+    manager.prune(["other.mp4"])
+    assert not manager.backing_off(variant_key("fp", SPEC))
+    assert os.path.exists(manager.manifest_path)
+
+
+def test_lookup_only_resolve_never_submits(tmp_path):
+    jobs = ImmediateJobs()
+    manager = VariantManager(str(tmp_path), jobs)
+    assert manager.resolve("clip.mp4", "clip.mp4", ROW, SPEC, build=False) is None
+    assert jobs.submitted == 0
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+flask = pytest.importorskip("flask")
+
+import web_server  # noqa: E402
+from lib.constants import WALLPAPER_DIR  # noqa: E402
+
+
+@pytest.fixture
+def wallpaper():
+    os.makedirs(WALLPAPER_DIR, exist_ok=True)
+    name = "removed-test.mp4"
+    path = os.path.join(WALLPAPER_DIR, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * 1024)
+    web_server.library.refresh(force=True)
+    web_server.state.select_wallpaper(name)
+    yield name, path
+    if os.path.exists(path):
+        os.remove(path)
+    web_server.library.refresh(force=True)
+
+
+def test_deleted_current_wallpaper_is_not_a_server_error(client, wallpaper):
+    name, path = wallpaper
+    assert client.get("/api/wallpaper/current").get_json()["url"]
+    os.remove(path)
+
+    response = client.get("/api/playback")
+    assert response.status_code == 200
+    assert response.get_json()["url"] is None
+    assert client.get("/api/wallpaper/current").status_code == 404
+    assert client.get(f"/api/wallpapers/{name}/video").status_code == 404
+    assert client.post("/api/select_wallpaper", json={"name": name}).status_code == 404
+
+
+def test_library_refresh_clears_a_removed_selection(client, wallpaper):
+    name, path = wallpaper
+    os.remove(path)
+    web_server.library.refresh(force=True)
+
+    assert web_server.state.current_wallpaper is None
+    assert ("wallpaper.changed", {"name": None, "url": None}) in client.events
+    assert client.get("/api/wallpaper/current").get_json() == {"name": None, "url": None}
@@ -0,0 +1,62 @@
+import gzip
+
+import pytest
+
+flask = pytest.importorskip("flask")
+
+from lib import widget_manager  # noqa: E402
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+@pytest.fixture
+def client(client):
+    widget_manager.registry.refresh()
+    widget_manager.save_widget_config([{"id": "clock", "enabled": True, "x": 10, "y": 20, "height": 100}])
+    return client
+
+
+def test_frame_etag_differs_per_encoding(client):
+    plain = client.get("/widgets/clock/frame")
+    gzipped = client.get("/widgets/clock/frame", headers=GZIP)
+    assert plain.status_code == gzipped.status_code == 200
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(gzipped.data) == plain.data
+    assert gzipped.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    assert plain.headers["Vary"] == "Accept-Encoding"
+
+
+def test_frame_revalidation(client):
+    plain_etag = client.get("/widgets/clock/frame").headers["ETag"]
+    gzip_etag = client.get("/widgets/clock/frame", headers=GZIP).headers["ETag"]
+
+    assert client.get("/widgets/clock/frame", headers={"If-None-Match": plain_etag}).status_code == 304
+    assert client.get("/widgets/clock/frame", headers=dict(GZIP, **{"If-None-Match": gzip_etag})).status_code == 304
+    # A cached plain copy is not a valid gzip response (and vice versa)
+    assert client.get("/widgets/clock/frame", headers=dict(GZIP, **{"If-None-Match": plain_etag})).status_code == 200
+    assert client.get("/widgets/clock/frame", headers={"If-None-Match": gzip_etag}).status_code == 200
+
+
+def test_unknown_widget_frame(client):
+    assert client.get("/widgets/missing/frame").status_code == 404
+
+
+def test_bundle_etag_and_revalidation(client):
+    plain = client.get("/api/widgets/bundle")
+    gzipped = client.get("/api/widgets/bundle", headers=GZIP)
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(gzipped.data) == plain.data
+    assert gzipped.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    assert [w["id"] for w in plain.get_json()["widgets"] if w.get("enabled")] == ["clock"]
+
+    cached = dict(GZIP, **{"If-None-Match": gzipped.headers["ETag"]})
+    assert client.get("/api/widgets/bundle", headers=cached).status_code == 304
+    assert client.get("/api/widgets/bundle", headers={"If-None-Match": gzipped.headers["ETag"]}).status_code == 200
+
+
+def test_bundle_version_changes_with_the_layout(client):
+    etag = client.get("/api/widgets/bundle").headers["ETag"]
+    widget_manager.save_widget_config([{"id": "clock", "enabled": True, "x": 30, "y": 20, "height": 100}])
+    response = client.get("/api/widgets/bundle", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
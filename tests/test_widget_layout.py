@@ -0,0 +1,50 @@
+import pytest
+
+flask = pytest.importorskip("flask")
+
+import web_server  # noqa: E402
+from lib import widget_manager  # noqa: E402
+
+
+@pytest.fixture
+def client(client):
+    widget_manager.registry.refresh()
+    widget_manager.save_widget_config([{"id": "clock", "enabled": True, "x": 10, "y": 20, "height": 100}])
+    widget_manager._previews.clear()
+    return client
+
+
+def patch(client, changes, persist=True, **body):
+    return client.patch("/api/widgets/config", json=dict(body, changes=changes, persist=persist))
+
+
+@pytest.mark.parametrize("raw", ["1e400", "-1e400", "1" + "0" * 400, "2000000"])
+def test_patch_rejects_out_of_range_numbers(client, raw):
+    body = '{"changes": [{"id": "clock", "x": %s}]}' % raw
+    response = client.patch("/api/widgets/config", data=body, content_type="application/json")
+    assert response.status_code == 400
+
+
+def test_patch_rejects_nan(client):
+    response = client.patch("/api/widgets/config", data='{"changes": [{"id": "clock", "y": NaN}]}',
+                            content_type="application/json")
+    assert response.status_code == 400
+
+
+def test_previews_are_discarded(client):
+    assert patch(client, [{"id": "clock", "x": 500}], persist=False).status_code == 200
+    assert client.events[-1] == ("widget.moved", {"id": "clock", "x": 500, "y": 20})
+
+    response = client.post("/api/widgets/previews/discard")
+    assert response.get_json() == {"changes": 1}
+    assert client.events[-1] == ("widget.moved", {"id": "clock", "x": 10, "y": 20})
+    assert widget_manager._previews == {}
+    assert client.post("/api/widgets/previews/discard").get_json() == {"changes": 0}
+
+
+def test_full_save_clears_previews(client):
+    patch(client, [{"id": "clock", "x": 500}], persist=False)
+    layout = [{"id": "clock", "enabled": True, "x": 30, "y": 20, "height": 100}]
+    assert client.post("/api/widgets/config", json=layout).status_code == 200
+    assert widget_manager._previews == {}
+    assert client.events[-1] == ("widget.moved", {"id": "clock", "x": 30, "y": 20})
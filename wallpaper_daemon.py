@@ -11,19 +11,38 @@ from Cocoa import (
     NSWindowCollectionBehaviorStationary,
     NSEvent,
     NSEventMaskLeftMouseDown,
+    NSWindowOcclusionStateVisible,
 )
 from Quartz import (
     CGWindowLevelForKey,
     kCGDesktopWindowLevelKey
 )
 from WebKit import WKWebView, WKWebViewConfiguration
-from Foundation import NSURL, NSURLRequest
+from Foundation import NSObject, NSNotificationCenter, NSURL, NSURLRequest
+from objc import super as objc_super
+from lib.metrics import DAEMON_RELOADS
+
+
+class OcclusionObserver(NSObject):
+    """Reports when the wallpaper window becomes hidden (e.g. by full-screen apps)."""
+    def initWithCallback_(self, callback):
+        self = objc_super(OcclusionObserver, self).init()
+        if self is None:
+            return None
+        self.callback = callback
+        return self
+
+    def occlusionChanged_(self, notification):
+        window = notification.object()
+        self.callback(bool(window.occlusionState() & NSWindowOcclusionStateVisible))
 
 
 class WallpaperDaemon:
     """Manages a borderless window positioned at desktop level for displaying widgets."""
     def __init__(self, process_pool):
         self.process_pool = process_pool
+        # Called with True/False when the window becomes visible/occluded
+        self.on_occlusion_change = None
     
     def create_window(self):
         """Create the wallpaper window and load the widget page."""
@@ -65,6 +84,7 @@ class WallpaperDaemon:
         self.window.makeKeyAndOrderFront_(None)
 
         self._install_mouse_hook()
+        self._install_occlusion_observer()
 
     def _install_mouse_hook(self):
         """Install a mouse event monitor for debugging click positions."""
@@ -77,8 +97,23 @@ class WallpaperDaemon:
             handler
         )
 
+    def _install_occlusion_observer(self):
+        """Forward occlusion changes of the window to on_occlusion_change."""
+        def changed(visible):
+            if self.on_occlusion_change:
+                self.on_occlusion_change(visible)
+
+        self.occlusion_observer = OcclusionObserver.alloc().initWithCallback_(changed)
+        NSNotificationCenter.defaultCenter().addObserver_selector_name_object_(
+            self.occlusion_observer,
+            "occlusionChanged:",
+            "NSWindowDidChangeOcclusionStateNotification",
+            self.window
+        )
+
     def reload(self):
         """Reload the wallpaper content."""
         if self.webview:
             self.webview.reload()
+            DAEMON_RELOADS.inc()
             print("Wallpaper daemon reloaded!")
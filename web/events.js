@@ -0,0 +1,23 @@
+// Shared subscription to the server's push channel (/api/events).
+// Imported by both main.js and widgets.js so the page holds a single stream.
+const EVENTS_URL = "/api/events";
+
+let source = null;
+
+function connect() {
+    if (source) return source;
+    source = new EventSource(EVENTS_URL);
+    // The server dropped our backlog; state can't be patched reliably any more
+    source.addEventListener("resync", () => location.reload());
+    return source;
+}
+
+export function onEvent(type, handler) {
+    connect().addEventListener(type, (e) => {
+        try {
+            handler(JSON.parse(e.data));
+        } catch (err) {
+            console.error(`Failed to handle ${type} event:`, err);
+        }
+    });
+}
@@ -1,27 +1,150 @@
-const API_URL = "http://localhost:8000/api/";
+import { onEvent } from "./events.js";
 
-const videoEl = document.getElementById("bg-video");
+const API_URL = "/api/";
 
+const CROSSFADE_MS = 600;
 
+let videoEl = document.getElementById("bg-video");
+let pendingEl = null;
+// "full" | "reduced" | "still", decided by the server's playback policy
+let playbackMode = "full";
+let firstPaintReported = false;
 
-async function setWallpaper(url) {
-    const res = await fetch(url);
-    if (!res.ok) throw new Error("Failed to fetch video");
 
-    const blob = await res.blob();
-    const blobUrl = URL.createObjectURL(blob);
 
-    videoEl.src = blobUrl;
+function createVideo(url) {
+    const el = document.createElement("video");
+    el.className = "bg-video";
+    el.autoplay = false;
+    el.muted = true;
+    el.loop = true;
+    el.playsInline = true;
+    el.preload = "auto";
+    el.src = url;
+    return el;
+}
+
+
+function waitForFirstFrame(el) {
+    // Resolve once the clip has a decoded frame ready to show
+    return new Promise((resolve, reject) => {
+        if (el.readyState >= HTMLMediaElement.HAVE_FUTURE_DATA) {
+            resolve();
+            return;
+        }
+        el.addEventListener("canplay", () => resolve(), { once: true });
+        el.addEventListener("error", () => reject(el.error), { once: true });
+    });
+}
+
+
+function reportFirstPaint() {
+    // Ends the startup timing report (see lib/startup.py)
+    if (firstPaintReported) return;
+    firstPaintReported = true;
+    fetch(API_URL + "startup/first_paint", { method: "POST" }).catch(() => {});
+}
+
+
+function onFirstFrameShown(el, callback) {
+    // requestVideoFrameCallback fires once a frame is composited; loadeddata
+    // plus a frame covers engines without it (and paused, still-mode videos)
+    if (el.requestVideoFrameCallback) el.requestVideoFrameCallback(() => callback());
+    el.addEventListener("loadeddata", () => requestAnimationFrame(() => callback()), { once: true });
+}
+
+
+function setWallpaper(url) {
+    if (!firstPaintReported) onFirstFrameShown(videoEl, reportFirstPaint);
+    // Point the <video> straight at the streaming endpoint so playback
+    // starts after the first range request instead of the whole file.
+    videoEl.preload = "auto";
+    videoEl.src = url;
+    if (playbackMode === "still") {
+        videoEl.autoplay = false;
+        return;
+    }
     videoEl.play().catch(() => {});
 }
 
 
+async function switchWallpaper(url) {
+    if (!videoEl.getAttribute("src")) {
+        setWallpaper(url);
+        return;
+    }
+    const target = new URL(url, location.href).href;
+    if (videoEl.src === target || (pendingEl && pendingEl.src === target)) return;
+
+    // Drop a prefetch that was superseded by a newer switch
+    if (pendingEl) {
+        pendingEl.removeAttribute("src");
+        pendingEl.load();
+        pendingEl.remove();
+    }
+
+    const nextEl = createVideo(url);
+    pendingEl = nextEl;
+    nextEl.style.opacity = "0";
+    videoEl.after(nextEl);
+
+    try {
+        await waitForFirstFrame(nextEl);
+        if (playbackMode !== "still") await nextEl.play();
+    } catch (e) {
+        console.error("Failed to prefetch wallpaper:", e);
+        if (pendingEl === nextEl) pendingEl = null;
+        nextEl.remove();
+        return;
+    }
+    if (pendingEl !== nextEl) return;
+
+    // Crossfade, then release the old decoder
+    const previousEl = videoEl;
+    videoEl = nextEl;
+    pendingEl = null;
+    requestAnimationFrame(() => { nextEl.style.opacity = "1"; });
+    setTimeout(() => {
+        previousEl.pause();
+        previousEl.removeAttribute("src");
+        previousEl.load();
+        previousEl.remove();
+    }, CROSSFADE_MS);
+}
+
+function applyPlaybackMode(mode, url) {
+    playbackMode = mode;
+    if (mode === "still") {
+        // Hold the current frame: no decoding while nobody can see it
+        videoEl.pause();
+        return;
+    }
+    if (url) switchWallpaper(url);
+    videoEl.play().catch(() => {});
+}
+
+onEvent("wallpaper.changed", (data) => {
+    if (data.url) switchWallpaper(data.url);
+});
+
+onEvent("playback.mode", (data) => applyPlaybackMode(data.mode, data.url));
+
+
 async function init() {
     try {
-        await setWallpaper(API_URL + "wallpaper");
+        const res = await fetch(API_URL + "playback");
+        if (!res.ok) throw new Error("Failed to fetch playback state");
+        const data = await res.json();
+        playbackMode = data.mode;
+        if (data.url) {
+            setWallpaper(data.url);
+            return;
+        }
     } catch (e) {
         console.error("Error initializing:", e);
     }
+    // Nothing to play (yet): the page itself is the first paint
+    requestAnimationFrame(() => reportFirstPaint());
 }
 
 init();
@@ -1,54 +1,116 @@
+import { onEvent } from "/web/events.js";
+
 const API_URL = "/api/";
 const container = document.getElementById("wallpaper-container");
 const searchBar = document.getElementById("search-bar");
+const importStatus = document.getElementById("import-status");
 const gridBtn = document.getElementById("grid-btn");
 const listBtn = document.getElementById("list-btn");
 
+const PAGE_SIZE = 60;
+const SEARCH_DEBOUNCE_MS = 200;
+
 let wallpapers = [];
+let totalWallpapers = 0;
 let currentSelection = null;
 let currentView = "grid";
+let loading = false;
+let searchTimer = null;
+// Incremented on every new search so stale pages are dropped
+let queryGeneration = 0;
+
+async function fetchWallpapers(reset = true) {
+    if (reset) {
+        queryGeneration++;
+        wallpapers = [];
+        totalWallpapers = 0;
+        container.innerHTML = "";
+    }
+    const generation = queryGeneration;
+    const params = new URLSearchParams({ offset: wallpapers.length, limit: PAGE_SIZE });
+    const filter = searchBar.value.trim();
+    if (filter) params.set("q", filter);
+
+    loading = true;
+    try {
+        const res = await fetch(API_URL + "wallpapers?" + params);
+        const data = await res.json();
+        if (generation !== queryGeneration) return;
+        wallpapers = wallpapers.concat(data.wallpapers);
+        totalWallpapers = data.total;
+        currentSelection = data.selected;
+        renderWallpapers(data.wallpapers);
+    } finally {
+        loading = false;
+    }
+    // Keep filling the viewport until it scrolls
+    loadMoreIfNeeded();
+}
 
-async function fetchWallpapers() {
-    const res = await fetch(API_URL + "wallpapers");
-    const data = await res.json();
-    wallpapers = data.wallpapers;
-    currentSelection = data.selected;
-    renderWallpapers();
+function loadMoreIfNeeded() {
+    if (loading || wallpapers.length >= totalWallpapers) return;
+    const remaining = document.documentElement.scrollHeight - window.innerHeight - window.scrollY;
+    if (remaining < 600) fetchWallpapers(false);
 }
 
-function getThumbnailURL(filename) {
-    return `${API_URL}wallpaper_thumbnails/${filename}`;
+const THUMBNAIL_WIDTHS = [320, 640, 1280];
+
+function getThumbnailURL(filename, width) {
+    return `${API_URL}wallpaper_thumbnails/${encodeURIComponent(filename)}?w=${width}`;
 }
 
-function renderWallpapers() {
-    container.innerHTML = "";
-    const filter = searchBar.value.toLowerCase();
+function thumbnailSrcset(filename) {
+    return THUMBNAIL_WIDTHS.map(w => `${getThumbnailURL(filename, w)} ${w}w`).join(", ");
+}
 
-    wallpapers
-        .filter(name => name.toLowerCase().includes(filter))
-        .forEach(name => {
-            const wrapper = document.createElement("div");
-            wrapper.classList.add("wallpaper-item");
-            if (currentSelection === name) wrapper.classList.add("selected");
+async function loadThumbnail(img, filename) {
+    // The server answers 202 while the thumbnail is still being generated;
+    // every rung is produced by the same job, so poll the smallest one with
+    // HEAD and leave the download to the <img> itself
+    const url = getThumbnailURL(filename, THUMBNAIL_WIDTHS[0]);
+    try {
+        const res = await fetch(url, { method: "HEAD" });
+        if (res.status === 202) {
+            const retryAfter = parseFloat(res.headers.get("Retry-After")) || 1;
+            setTimeout(() => {
+                if (img.isConnected) loadThumbnail(img, filename);
+            }, retryAfter * 1000);
+            return;
+        }
+        if (!res.ok) return;
+        img.sizes = "(max-width: 600px) 120px, 180px";
+        img.srcset = thumbnailSrcset(filename);
+        img.src = url;
+    } catch (e) {
+        console.error("Failed to load thumbnail:", e);
+    }
+}
 
-            const thumb = document.createElement("img");
-            thumb.src = getThumbnailURL(name);
+function renderWallpapers(page) {
+    // Append one page of results; filtering happens on the server
+    page.forEach(name => {
+        const wrapper = document.createElement("div");
+        wrapper.classList.add("wallpaper-item");
+        if (currentSelection === name) wrapper.classList.add("selected");
 
-            const label = document.createElement("div");
-            label.classList.add("wallpaper-name");
-            label.textContent = name.replace(/\.[^/.]+$/, "");
+        const thumb = document.createElement("img");
+        loadThumbnail(thumb, name);
 
-            wrapper.appendChild(thumb);
-            wrapper.appendChild(label);
+        const label = document.createElement("div");
+        label.classList.add("wallpaper-name");
+        label.textContent = name.replace(/\.[^/.]+$/, "");
 
-            wrapper.addEventListener("click", async () => {
-                await selectWallpaper(name);
-                document.querySelectorAll(".wallpaper-item").forEach(el => el.classList.remove("selected"));
-                wrapper.classList.add("selected");
-            });
+        wrapper.appendChild(thumb);
+        wrapper.appendChild(label);
 
-            container.appendChild(wrapper);
+        wrapper.addEventListener("click", async () => {
+            await selectWallpaper(name);
+            document.querySelectorAll(".wallpaper-item").forEach(el => el.classList.remove("selected"));
+            wrapper.classList.add("selected");
         });
+
+        container.appendChild(wrapper);
+    });
 }
 
 async function selectWallpaper(name) {
@@ -60,7 +122,48 @@ async function selectWallpaper(name) {
     if (res.ok) currentSelection = name;
 }
 
-searchBar.addEventListener("input", renderWallpapers);
+// Background imports: show progress and list new wallpapers once ready
+const activeImports = new Map();
+
+function renderImportStatus() {
+    if (activeImports.size === 0) {
+        importStatus.hidden = true;
+        return;
+    }
+    const parts = [...activeImports.values()].map(job =>
+        `${job.target} — ${job.step || job.state} (${Math.round(job.progress * 100)}%)`);
+    importStatus.textContent = `Importing ${activeImports.size}: ${parts.join(", ")}`;
+    importStatus.hidden = false;
+}
+
+onEvent("job.updated", (job) => {
+    if (job.kind !== "import") return;
+    if (job.state === "queued" || job.state === "running") {
+        activeImports.set(job.id, job);
+    } else {
+        activeImports.delete(job.id);
+        if (job.state === "done" && !wallpapers.includes(job.target)) fetchWallpapers();
+    }
+    renderImportStatus();
+});
+
+async function fetchActiveImports() {
+    try {
+        const res = await fetch(API_URL + "jobs?active=1");
+        const data = await res.json();
+        data.jobs.filter(job => job.kind === "import").forEach(job => activeImports.set(job.id, job));
+        renderImportStatus();
+    } catch (e) {
+        console.error("Failed to load import jobs:", e);
+    }
+}
+
+searchBar.addEventListener("input", () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => fetchWallpapers(), SEARCH_DEBOUNCE_MS);
+});
+
+window.addEventListener("scroll", loadMoreIfNeeded, { passive: true });
 
 gridBtn.addEventListener("click", () => {
     container.classList.remove("list");
@@ -84,3 +187,4 @@ document.getElementById("open-folder-btn").addEventListener("click", async () =>
 
 
 fetchWallpapers();
+fetchActiveImports();
@@ -1,8 +1,16 @@
 // Widget Center - Manage widgets, positions, and settings
-const API = "http://localhost:8000/api/";
+const API = "/api/";
 
 let widgets = [];
 let originalConfig = [];
+// Version of the stored layout we're editing (optimistic concurrency on save)
+let layoutVersion = null;
+// Widgets with unsaved live previews on the desktop, and ones waiting to be sent
+const previewed = new Set();
+const previewPending = new Set();
+let previewTimer = null;
+const PREVIEW_INTERVAL_MS = 50;
+const PATCH_FIELDS = ["x", "y", "width", "height", "enabled"];
 let screenWidth = 1920;
 let screenHeight = 1080;
 let draggingState = {
@@ -28,6 +36,7 @@ async function init() {
         if (!res.ok) throw new Error("Failed to load widget config");
         
         const data = await res.json();
+        layoutVersion = data.version;
         
         // Merge discovered widgets with config: add new widgets that exist on filesystem but not in config
         let configWidgets = data.widgets || [];
@@ -99,6 +108,7 @@ function renderWidgetList() {
             widgets[idx].enabled = e.target.checked;
             item.classList.toggle('enabled', e.target.checked);
             renderCanvas();
+            schedulePreview(idx);
         });
         
         const label = document.createElement('div');
@@ -224,6 +234,7 @@ function attachDragHandlers() {
             // Update stored offsets for next move
             draggingState.offsetX = e.clientX;
             draggingState.offsetY = e.clientY;
+            schedulePreview(draggingState.widgetIdx);
             return;
         }
 
@@ -245,6 +256,7 @@ function attachDragHandlers() {
         // Note: we assume widget.y is distance from the TOP of the screen.
         widgets[draggingState.widgetIdx].x = Math.round(newX / scale);
         widgets[draggingState.widgetIdx].y = Math.round(newY / scale);
+        schedulePreview(draggingState.widgetIdx);
     };
     
     const handleMouseUp = () => {
@@ -267,16 +279,71 @@ function attachDragHandlers() {
     document.addEventListener('mouseup', handleMouseUp);
 }
 
+function patchFields(w, base) {
+    // Patchable fields of w that differ from base (all of them if base is missing)
+    const fields = {};
+    for (const key of PATCH_FIELDS) {
+        if (w[key] === undefined) continue;
+        if (!base || base[key] !== w[key]) fields[key] = w[key];
+    }
+    return fields;
+}
+
+function patchLayout(changes, persist, version) {
+    return fetch(API + "widgets/config", {
+        method: "PATCH",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ changes, persist, version })
+    });
+}
+
+function schedulePreview(idx) {
+    // Coalesce drag updates into at most one preview request per interval
+    previewPending.add(widgets[idx].id);
+    if (previewTimer) return;
+    previewTimer = setTimeout(sendPreview, PREVIEW_INTERVAL_MS);
+}
+
+async function sendPreview() {
+    previewTimer = null;
+    const changes = widgets
+        .filter(w => previewPending.has(w.id))
+        .map(w => ({ id: w.id, ...patchFields(w) }));
+    previewPending.clear();
+    changes.forEach(c => previewed.add(c.id));
+    try {
+        await patchLayout(changes, false);
+    } catch (e) {
+        console.warn("Live preview failed:", e);
+    }
+}
+
 async function saveConfig() {
+    // The save carries every pending change; drop the queued preview
+    clearTimeout(previewTimer);
+    previewTimer = null;
+    previewPending.clear();
     try {
-        const res = await fetch(API + "widgets/config", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify(widgets)
-        });
-        
+        const originals = Object.fromEntries(originalConfig.map(w => [w.id, w]));
+        const changes = [];
+        for (const w of widgets) {
+            const fields = patchFields(w, originals[w.id]);
+            // Previewed widgets are always sent so the server drops their previews
+            if (Object.keys(fields).length || previewed.has(w.id)) {
+                changes.push({ id: w.id, ...patchFields(w) });
+            }
+        }
+
+        const res = await patchLayout(changes, true, layoutVersion);
+        if (res.status === 409) {
+            alert("The widget layout was changed elsewhere. Reloading the latest version.");
+            location.reload();
+            return;
+        }
         if (!res.ok) throw new Error("Failed to save configuration");
         
+        layoutVersion = (await res.json()).version;
+        previewed.clear();
         originalConfig = JSON.parse(JSON.stringify(widgets));
         alert("✓ Widget configuration saved successfully!");
     } catch (e) {
@@ -290,6 +357,19 @@ function resetConfig() {
     widgets = JSON.parse(JSON.stringify(originalConfig));
     renderWidgetList();
     renderCanvas();
+
+    // Put previewed widgets back where they're saved on the desktop too
+    discardPreviews();
+}
+
+function discardPreviews() {
+    clearTimeout(previewTimer);
+    previewTimer = null;
+    previewPending.clear();
+    if (!previewed.size) return;
+    previewed.clear();
+    // A beacon still goes out while the window is closing
+    navigator.sendBeacon(API + "widgets/previews/discard");
 }
 
 function attachEventListeners() {
@@ -299,6 +379,8 @@ function attachEventListeners() {
     
     if (saveBtn) saveBtn.addEventListener('click', saveConfig);
     if (resetBtn) resetBtn.addEventListener('click', resetConfig);
+    // Closed without saving: don't leave unsaved positions on the desktop
+    window.addEventListener('pagehide', discardPreviews);
     if (openWidgetsBtn) {
         openWidgetsBtn.addEventListener('click', async () => {
             try {
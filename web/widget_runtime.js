@@ -0,0 +1,215 @@
+// Widget runtime: inlined into every widget frame (lib/widget_frames.py) and
+// loaded by the daemon page, which hosts the one tick scheduler all widgets
+// share. Ticks fall on wall-clock multiples of their period, so widgets
+// asking for 1 s, 5 s and 1 min wake up together instead of at unaligned
+// times, and nothing ticks while the wallpaper window is hidden.
+//
+//   Widget.onTick(periodMs, fn)  fn(now) every periodMs, aligned; returns an unsubscribe function
+//   Widget.onMinute(fn)          fn(now) at the start of every minute
+//   Widget.onVisible(fn)         fn(visible) when the wallpaper is shown or hidden
+//   Widget.onSystemMetrics(fn)   fn(snapshot) with uptime/CPU/memory/battery, fetched once
+//                                for all widgets, and only while some widget listens
+//   Widget.visible               current visibility
+(function () {
+    // Timers may fire a few ms early; treat those as on time
+    const EARLY_MS = 15;
+    const MIN_PERIOD_MS = 50;
+
+    function nextBoundary(now, period) {
+        return Math.floor((now + EARLY_MS) / period) * period + period;
+    }
+
+    function isGone(owner) {
+        try {
+            return owner.closed;
+        } catch (e) {
+            return true;
+        }
+    }
+
+    class TickScheduler {
+        constructor(win) {
+            this.win = win;
+            this.ticks = new Set();
+            this.visibilityListeners = new Set();
+            // topic -> Set of listeners, and the latest value of each topic
+            this.topics = new Map();
+            this.latest = new Map();
+            // Topics published while hidden, delivered once shown again
+            this.pendingTopics = new Set();
+            // Called with a topic when it gets its first listener (the page starts fetching it)
+            this.onDemand = null;
+            // Reasons the page is hidden ("document", "occluded", ...)
+            this.hiddenBy = new Set();
+            this.timer = null;
+            if (win.document.visibilityState === "hidden") this.hiddenBy.add("document");
+            win.document.addEventListener("visibilitychange", () => {
+                this.setHidden("document", win.document.visibilityState === "hidden");
+            });
+        }
+
+        get visible() {
+            return this.hiddenBy.size === 0;
+        }
+
+        subscribe(period, fn, owner) {
+            const tick = { period: Math.max(MIN_PERIOD_MS, period), fn, owner, next: 0 };
+            tick.next = nextBoundary(Date.now(), tick.period);
+            this.ticks.add(tick);
+            this.schedule();
+            return () => {
+                this.ticks.delete(tick);
+                this.schedule();
+            };
+        }
+
+        onVisible(fn, owner) {
+            const listener = { fn, owner };
+            this.visibilityListeners.add(listener);
+            return () => this.visibilityListeners.delete(listener);
+        }
+
+        subscribeTopic(topic, fn, owner) {
+            // Replays the latest value so a widget never waits a full interval
+            const listener = { fn, owner };
+            const wanted = this.hasListeners(topic);
+            if (!this.topics.has(topic)) this.topics.set(topic, new Set());
+            this.topics.get(topic).add(listener);
+            if (this.latest.has(topic)) this.call(listener, fn, this.latest.get(topic));
+            if (!wanted && this.onDemand) this.onDemand(topic);
+            return () => this.topics.get(topic).delete(listener);
+        }
+
+        hasListeners(topic) {
+            const listeners = this.topics.get(topic);
+            if (!listeners) return false;
+            for (const l of listeners) {
+                if (isGone(l.owner)) listeners.delete(l);
+            }
+            return listeners.size > 0;
+        }
+
+        publish(topic, data) {
+            this.latest.set(topic, data);
+            if (!this.visible) {
+                this.pendingTopics.add(topic);
+                return;
+            }
+            this.deliver(topic);
+        }
+
+        deliver(topic) {
+            const listeners = this.topics.get(topic);
+            if (!listeners) return;
+            const data = this.latest.get(topic);
+            for (const l of [...listeners]) this.call(l, l.fn, data);
+        }
+
+        api(owner) {
+            // The Widget object handed to one widget; owner.closed marks it gone
+            const host = this;
+            return {
+                onTick(periodMs, fn) {
+                    return host.subscribe(periodMs, fn, owner);
+                },
+                onMinute(fn) {
+                    return host.subscribe(60000, fn, owner);
+                },
+                onVisible(fn) {
+                    return host.onVisible(fn, owner);
+                },
+                onSystemMetrics(fn) {
+                    return host.subscribeTopic("system.metrics", fn, owner);
+                },
+                get visible() {
+                    return host.visible;
+                },
+            };
+        }
+
+        release(owner) {
+            // Drop everything registered by a widget frame that is going away
+            for (const tick of this.ticks) if (tick.owner === owner) this.ticks.delete(tick);
+            for (const l of this.visibilityListeners) if (l.owner === owner) this.visibilityListeners.delete(l);
+            for (const listeners of this.topics.values()) {
+                for (const l of listeners) if (l.owner === owner) listeners.delete(l);
+            }
+            this.schedule();
+        }
+
+        setHidden(reason, hidden) {
+            const wasVisible = this.visible;
+            if (hidden) this.hiddenBy.add(reason);
+            else this.hiddenBy.delete(reason);
+            if (wasVisible === this.visible) return;
+
+            for (const l of [...this.visibilityListeners]) this.call(l, l.fn, this.visible);
+            if (this.visible) {
+                for (const topic of this.pendingTopics) this.deliver(topic);
+                this.pendingTopics.clear();
+                // Catch up once so nothing shows stale values, then realign
+                const now = Date.now();
+                for (const tick of [...this.ticks]) {
+                    tick.next = nextBoundary(now, tick.period);
+                    this.call(tick, tick.fn, new Date(now));
+                }
+            }
+            this.schedule();
+        }
+
+        schedule() {
+            if (this.timer !== null) {
+                this.win.clearTimeout(this.timer);
+                this.timer = null;
+            }
+            if (!this.visible || this.ticks.size === 0) return;
+            let next = Infinity;
+            for (const tick of this.ticks) next = Math.min(next, tick.next);
+            this.timer = this.win.setTimeout(() => this.fire(), Math.max(0, next - Date.now()));
+        }
+
+        fire() {
+            this.timer = null;
+            const now = Date.now();
+            const date = new Date(now);
+            for (const tick of [...this.ticks]) {
+                if (tick.next > now + EARLY_MS) continue;
+                tick.next = nextBoundary(now, tick.period);
+                this.call(tick, tick.fn, date);
+            }
+            this.schedule();
+        }
+
+        call(entry, fn, arg) {
+            if (isGone(entry.owner)) {
+                this.ticks.delete(entry);
+                this.visibilityListeners.delete(entry);
+                for (const listeners of this.topics.values()) listeners.delete(entry);
+                return;
+            }
+            try {
+                fn(arg);
+            } catch (e) {
+                console.error("Widget callback failed:", e);
+            }
+        }
+    }
+
+    function hostScheduler() {
+        // The daemon page's scheduler; frames opened on their own get a local one
+        try {
+            if (window.parent !== window && window.parent.__widgetTicks) return window.parent.__widgetTicks;
+        } catch (e) {
+            // Cross-origin parent
+        }
+        if (!window.__widgetTicks) window.__widgetTicks = new TickScheduler(window);
+        return window.__widgetTicks;
+    }
+
+    const host = hostScheduler();
+    if (host.win !== window) {
+        window.addEventListener("pagehide", () => host.release(window));
+    }
+
+    window.Widget = host.api(window);
+})();
@@ -1,19 +1,152 @@
-// Widget loader: fetches config and renders widgets as isolated iframes
-const API_URL = "http://localhost:8000/api/";
-const WIDGET_FRAME_URL = "http://localhost:8000/widgets";
+// Widget loader: fetches config and renders widgets as isolated iframes, or
+// mounts trusted lightweight widgets into Shadow DOM roots in this page
+import { onEvent } from "./events.js";
 
-async function loadWidgetConfig() {
+const API_URL = "/api/";
+const WIDGET_FRAME_URL = "/widgets";
+
+// Mirrors the frame template's base styles (lib/widget_frames.py)
+const SHADOW_BASE_CSS = `
+:host { display: block; }
+* { box-sizing: border-box; }
+#widget-root { width: 100%; height: 100%; display: flex; flex-direction: column; container-type: size; }
+`;
+
+// widget id -> owner token of its mounted script (see widget_runtime.js)
+const shadowOwners = new Map();
+
+// Polling tick for system metrics (runs only while a widget listens and the wallpaper is visible)
+let systemMetricsPoll = null;
+let systemMetricsPeriod = 5000;
+
+async function pollSystemMetrics() {
+    const ticks = window.__widgetTicks;
+    if (!ticks.hasListeners('system.metrics')) {
+        // Last listener gone: stop asking, and the server stops sampling
+        if (systemMetricsPoll) systemMetricsPoll();
+        systemMetricsPoll = null;
+        return;
+    }
     try {
-        const res = await fetch(API_URL + "widgets/config");
+        const res = await fetch(API_URL + "system/metrics", { cache: "no-store" });
+        if (!res.ok) return;
+        const snapshot = await res.json();
+        ticks.publish('system.metrics', snapshot);
+        const period = (snapshot.interval || 5) * 1000;
+        if (period !== systemMetricsPeriod && systemMetricsPoll) {
+            systemMetricsPoll();
+            systemMetricsPoll = ticks.subscribe(period, pollSystemMetrics, window);
+        }
+        systemMetricsPeriod = period;
+    } catch (e) {
+        console.error("Failed to load system metrics:", e);
+    }
+}
+
+function startSystemMetrics(topic) {
+    if (topic !== 'system.metrics' || systemMetricsPoll) return;
+    systemMetricsPoll = window.__widgetTicks.subscribe(systemMetricsPeriod, pollSystemMetrics, window);
+    pollSystemMetrics();
+}
+
+async function loadWidgetBundle() {
+    // Layout and every enabled widget's frame in one (revalidated) request
+    try {
+        const res = await fetch(API_URL + "widgets/bundle", { cache: "no-cache" });
         if (!res.ok) return [];
         const data = await res.json();
         return data.widgets || [];
     } catch (e) {
-        console.error("Failed to load widget config:", e);
+        console.error("Failed to load widget bundle:", e);
         return [];
     }
 }
 
+function findContainer(widgetId) {
+    return document.querySelector(`.widget-container[data-widget-id="${CSS.escape(widgetId)}"]`);
+}
+
+function scopedDocument(shadow) {
+    // What a lightweight widget's script sees as `document`: element lookups
+    // stay inside its shadow root, everything else is the page's document
+    const scoped = {
+        getElementById: (id) => shadow.getElementById(id),
+        querySelector: (selector) => shadow.querySelector(selector),
+        querySelectorAll: (selector) => shadow.querySelectorAll(selector),
+        getElementsByClassName: (names) => shadow.querySelectorAll(
+            names.trim().split(/\s+/).map((name) => '.' + CSS.escape(name)).join('')),
+        getElementsByTagName: (tag) => shadow.querySelectorAll(tag),
+        addEventListener: (type, listener, options) => {
+            // The page finished loading long before the widget was mounted
+            if (type === 'DOMContentLoaded' || type === 'load') {
+                queueMicrotask(() => listener(new Event(type)));
+                return;
+            }
+            document.addEventListener(type, listener, options);
+        },
+    };
+    return new Proxy(document, {
+        get(target, prop) {
+            if (Object.prototype.hasOwnProperty.call(scoped, prop)) return scoped[prop];
+            const value = Reflect.get(target, prop);
+            return typeof value === 'function' ? value.bind(target) : value;
+        },
+    });
+}
+
+function unmountShadowWidget(widgetId) {
+    const owner = shadowOwners.get(widgetId);
+    if (!owner) return;
+    owner.closed = true;
+    window.__widgetTicks.release(owner);
+    shadowOwners.delete(widgetId);
+}
+
+function mountShadowWidget(container, widgetId, parts) {
+    unmountShadowWidget(widgetId);
+    const shadow = container.shadowRoot || container.attachShadow({ mode: 'open' });
+    const style = document.createElement('style');
+    style.textContent = SHADOW_BASE_CSS + parts.css;
+    const root = document.createElement('div');
+    root.id = 'widget-root';
+    root.innerHTML = parts.html;
+    shadow.replaceChildren(style, root);
+
+    const owner = { closed: false };
+    shadowOwners.set(widgetId, owner);
+    try {
+        // Runs in this page's realm with its own `document` and `Widget`
+        const run = new Function('document', 'Widget', `${parts.js}\n//# sourceURL=widget-${widgetId}.js`);
+        run(scopedDocument(shadow), window.__widgetTicks.api(owner));
+    } catch (e) {
+        console.error(`Widget ${widgetId} failed:`, e);
+    }
+}
+
+async function fetchParts(widgetId) {
+    const res = await fetch(`${WIDGET_FRAME_URL}/${encodeURIComponent(widgetId)}/parts`, { cache: 'no-cache' });
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    return res.json();
+}
+
+function replaceWithIframe(container, widgetId) {
+    // A shadow root can't be detached, so swap in a fresh container
+    unmountShadowWidget(widgetId);
+    const fresh = container.cloneNode(false);
+    fresh.appendChild(createFrame({ id: widgetId }));
+    container.replaceWith(fresh);
+}
+
+async function loadShadowWidget(container, widgetId) {
+    try {
+        mountShadowWidget(container, widgetId, await fetchParts(widgetId));
+    } catch (e) {
+        // No longer lightweight (or not trusted): fall back to an iframe
+        console.warn(`Widget ${widgetId} mounted as iframe:`, e);
+        replaceWithIframe(container, widgetId);
+    }
+}
+
 function renderWidget(widget) {
     // Create widget container
     const container = document.createElement('div');
@@ -24,10 +157,30 @@ function renderWidget(widget) {
     container.style.width = widget.width + 'px';
     container.style.height = widget.height + 'px';
     container.dataset.widgetId = widget.id;
-    
+
+    if (widget.mode === 'shadow' && window.__widgetTicks) {
+        container.style.borderRadius = '12px';
+        container.style.overflow = 'hidden';
+        if (widget.parts) {
+            mountShadowWidget(container, widget.id, widget.parts);
+        } else {
+            loadShadowWidget(container, widget.id);
+        }
+        return container;
+    }
+
+    container.appendChild(createFrame(widget));
+    return container;
+}
+
+function createFrame(widget) {
     // Create iframe for isolated widget
     const iframe = document.createElement('iframe');
-    iframe.src = `${WIDGET_FRAME_URL}/${widget.id}/frame`;
+    if (widget.frame) {
+        iframe.srcdoc = widget.frame;
+    } else {
+        iframe.src = `${WIDGET_FRAME_URL}/${widget.id}/frame`;
+    }
     iframe.style.width = '100%';
     iframe.style.height = '100%';
     iframe.style.border = 'none';
@@ -35,9 +188,56 @@ function renderWidget(widget) {
     iframe.style.backgroundColor = 'transparent';
     iframe.sandbox.add('allow-same-origin');
     iframe.sandbox.add('allow-scripts');
-    
-    container.appendChild(iframe);
-    return container;
+    return iframe;
+}
+
+function subscribeToUpdates(root) {
+    // Widget ticks (web/widget_runtime.js) stop while the wallpaper is covered
+    onEvent('wallpaper.visibility', ({ visible }) => {
+        if (window.__widgetTicks) window.__widgetTicks.setHidden('occluded', !visible);
+    });
+
+    // One fetch fanned out to every widget using Widget.onSystemMetrics
+    if (window.__widgetTicks) window.__widgetTicks.onDemand = startSystemMetrics;
+
+    // Patch only the affected widget instead of reloading the page
+    onEvent('widget.moved', ({ id, x, y }) => {
+        const container = findContainer(id);
+        if (!container) return;
+        container.style.left = x + 'px';
+        container.style.top = y + 'px';
+    });
+
+    onEvent('widget.resized', ({ id, width, height }) => {
+        const container = findContainer(id);
+        if (!container) return;
+        container.style.width = width + 'px';
+        container.style.height = height + 'px';
+    });
+
+    onEvent('widget.enabled', (widget) => {
+        if (findContainer(widget.id)) return;
+        root.appendChild(renderWidget(widget));
+    });
+
+    onEvent('widget.disabled', ({ id }) => {
+        const container = findContainer(id);
+        unmountShadowWidget(id);
+        if (container) container.remove();
+    });
+
+    onEvent('widget.files_changed', ({ id }) => {
+        const container = findContainer(id);
+        if (container && container.shadowRoot) {
+            loadShadowWidget(container, id);
+            return;
+        }
+        const iframe = container && container.querySelector('iframe');
+        if (!iframe) return;
+        // srcdoc takes precedence over src, so drop the bundled copy first
+        iframe.removeAttribute('srcdoc');
+        iframe.src = `${WIDGET_FRAME_URL}/${id}/frame`;
+    });
 }
 
 async function initWidgets() {
@@ -47,7 +247,9 @@ async function initWidgets() {
         return;
     }
     
-    const widgets = await loadWidgetConfig();
+    subscribeToUpdates(root);
+
+    const widgets = await loadWidgetBundle();
     
     widgets.forEach(widget => {
         if (!widget.enabled) return;
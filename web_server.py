@@ -1,48 +1,374 @@
-import os, subprocess
-from flask import Flask, send_from_directory, jsonify, request
-from lib.constants import WALLPAPER_DIR
-from lib.thumbnails import get_thumbnail
+import gzip, os, subprocess, threading
+from urllib.parse import quote
+from flask import Flask, Response, send_from_directory, jsonify, request
+from lib.constants import WALLPAPER_DIR, LIBRARY_DB_FILE, VARIANTS_CACHE_DIR, SCREEN_STILLS_CACHE_DIR, seed_example_wallpapers
+from lib.library import WallpaperLibrary, is_wallpaper_file
+from lib.jobs import JobQueue
+from lib.ingest import Ingestor
+from lib.variants import VariantManager, target_spec, DEFAULT_MAX_FPS
+from lib.playback_policy import PlaybackPolicy, ManualSource, default_sources, REDUCED_FPS
+from lib.system_metrics import SystemMetrics
+from lib.thumbnails import thumbnail_cache, thumbnail_service, pick_rendition, THUMBNAIL_FORMATS
+from lib.streaming import send_video, file_etag
 from lib import widget_manager
-try:
-    from Cocoa import NSScreen
-except Exception:
-    NSScreen = None
+from lib.widget_frames import frame_cache, negotiate_encoding
+from lib.events import bus
+from lib.app_state import AppState
+from lib.server import WSGIServer
+from lib.screens import default_screen_provider, pixel_size, DEFAULT_SCREEN
+from lib.screen_stills import ScreenStills
+from lib import metrics, startup
+from lib.profiling import profiler
 
 
 app = Flask(__name__, static_folder="web", static_url_path="/web")
-wallpaper_daemon = None
-space_observer = None
-settings_manager = None
+# Request counts, latency and bytes per route, served at /api/metrics;
+# opt-in tracing and profiling underneath (see lib/profiling.py)
+app.wsgi_app = metrics.instrument_wsgi(profiler.wsgi(app.wsgi_app))
 
-# Currently selected wallpaper
-current_wallpaper = None
+# Selected wallpaper and app objects, shared across request threads
+state = AppState()
+
+# Indexed wallpaper folder
+library = WallpaperLibrary(WALLPAPER_DIR, LIBRARY_DB_FILE)
+
+# Background work (imports, transcodes) runs here instead of on request threads;
+# desktop stills get a worker of their own so they don't queue behind batches
+jobs = JobQueue(workers=2, lanes={"desktop_still": 1})
+ingestor = Ingestor(library, thumbnail_service, jobs)
+variants = VariantManager(VARIANTS_CACHE_DIR, jobs)
+
+# Full video / reduced fps / still frame, driven by power, occlusion, idle and schedule
+occlusion = ManualSource("occlusion", occluded=False)
+playback = PlaybackPolicy(default_sources() + [occlusion])
+
+# Uptime/CPU/memory/battery, sampled once for all widgets while one of them asks
+system_metrics = SystemMetrics()
+
+# Connected displays (NSScreen on macOS, a fake 1080p screen elsewhere)
+screens = default_screen_provider()
+screen_stills = ScreenStills(SCREEN_STILLS_CACHE_DIR)
+
+# Upper bound for ?limit= on /api/wallpapers
+MAX_PAGE_SIZE = 500
+
+
+def _pool_stat(field):
+    server = state.http_server
+    if server is None:
+        return {}
+    return {(pool,): s[field] for pool, s in server.stats().items()}
+
+
+metrics.registry.gauge("mlw_startup_phase_seconds", "Seconds from launch until each startup phase completed.",
+                       lambda: {(row["phase"],): row["at"] for row in startup.timer.report()["phases"]}, ("phase",))
+metrics.registry.gauge("mlw_job_queue_depth", "Background jobs waiting for a worker.", lambda: jobs.depth)
+metrics.registry.gauge("mlw_thumbnail_jobs_pending", "Thumbnails being generated.", lambda: thumbnail_service.pending)
+metrics.registry.gauge("mlw_event_subscribers", "Connected server-sent event streams.", lambda: bus.subscriber_count)
+metrics.registry.gauge("mlw_http_pool_busy", "Request handlers running, by worker pool.",
+                       lambda: _pool_stat("busy"), ("pool",))
+metrics.registry.gauge("mlw_http_pool_waiting", "Requests queued for a worker, by worker pool.",
+                       lambda: _pool_stat("waiting"), ("pool",))
+
+
+@app.before_request
+def label_route():
+    """Record the matched URL rule so metrics are per route rather than per path."""
+    request.environ["mlw.route"] = request.url_rule.rule if request.url_rule else "unmatched"
 
 
 def get_wallpapers():
-    wallpapers = []
-    for f in os.listdir(WALLPAPER_DIR):
-        if f.lower().endswith((".mp4", ".mov", ".webm")):
-            wallpapers.append(f)
-    wallpapers.sort()
-    return wallpapers
+    return library.names()
 
-# Initialize current wallpaper from settings or use first available
-def initialize_wallpaper():
-    global current_wallpaper
-    wallpapers = get_wallpapers()
-    if not wallpapers:
+
+def get_setting(key, default=None):
+    settings_manager = state.settings_manager
+    if settings_manager:
+        return settings_manager.get(key, default)
+    return default
+
+
+def get_screen_geometry():
+    """Main screen frame and visibleFrame in points, plus its backing scale factor."""
+    try:
+        return screens.main()
+    except Exception:
+        return DEFAULT_SCREEN
+
+
+def get_all_screens():
+    try:
+        return screens.screens() or [DEFAULT_SCREEN]
+    except Exception:
+        return [DEFAULT_SCREEN]
+
+
+def _resolve_variant(name, max_fps, build):
+    row = library.get(name)
+    if not row or not row["probed"]:
+        return None
+    width, height = pixel_size(get_screen_geometry())
+    spec = target_spec(row, width, height, max_fps)
+    return variants.resolve(name, os.path.join(WALLPAPER_DIR, name), row, spec, build=build)
+
+
+def best_variant(name, mode="full"):
+    """
+    Key of the variant to play for a wallpaper in the given playback mode, or
+    None to play the original (variants disabled, not needed, or not built yet).
+    Only looks variants up; builds are queued by queue_variants().
+    """
+    if not get_setting("variants_enabled", False):
+        return None
+    if mode == "reduced":
+        key = _resolve_variant(name, REDUCED_FPS, build=False)
+        if key:
+            return key
+    return _resolve_variant(name, get_setting("variant_max_fps", DEFAULT_MAX_FPS), build=False)
+
+
+def queue_variants(name):
+    """
+    Queue the display-matched variant of a wallpaper and the reduced-fps one,
+    so it's ready for the next switch to battery. Called when a wallpaper is
+    selected or re-imported and when playback returns to full mode, never
+    while building URLs. Only on AC power: on battery building would cost more
+    than it saves. Ready variants and ones in failure backoff are skipped.
+    """
+    if not name or not get_setting("variants_enabled", False):
         return
-    
-    # Try to load saved wallpaper
+    if playback.state()["signals"].get("on_ac") is False:
+        return
+    _resolve_variant(name, get_setting("variant_max_fps", DEFAULT_MAX_FPS), build=True)
+    _resolve_variant(name, REDUCED_FPS, build=True)
+
+
+def _on_library_changed(added, removed, changed):
+    for name in removed:
+        if state.clear_wallpaper(name):
+            bus.publish("wallpaper.changed", {"name": None, "url": None})
+    if removed:
+        # Forget thumbnails and variants of wallpapers that were deleted
+        thumbnail_cache.prune(library.names())
+        variants.prune(library.names())
+        screen_stills.prune(library_fingerprints())
+    if added or changed:
+        ingestor.enqueue(sorted(added | changed))
+
+
+def library_fingerprints():
+    _, items = library.query()
+    return [item["fingerprint"] for item in items]
+
+
+def apply_system_wallpaper(name):
+    """
+    Set the macOS desktop picture of every screen to a still of the wallpaper
+    sized for that screen. Rendering runs as a background job.
+    """
+    space_observer = state.space_observer
+    if not space_observer or not name:
+        return
+
+    def render(job):
+        job.update(step="thumbnail", progress=0.1)
+        renditions = thumbnail_service.request(name).result()
+        row = library.get(name)
+        if not renditions or not row:
+            raise RuntimeError("no still available")
+        job.update(step="rendering", progress=0.5)
+        images = screen_stills.render(row["fingerprint"], renditions["still"], get_all_screens())
+        # Only apply if the selection hasn't moved on meanwhile
+        if name == state.current_wallpaper:
+            space_observer.current_wallpaper_path = images
+            space_observer.reapply_wallpaper()
+
+    jobs.submit("desktop_still", name, render)
+
+
+def _on_job_update(job):
+    bus.publish("job.updated", job.to_dict())
+
+
+def _on_wallpaper_imported(name):
+    # A replaced file of the current wallpaper needs new variants
+    if name == state.current_wallpaper:
+        queue_variants(name)
+
+
+def _on_variant_ready(video_name, key):
+    # Crossfade the daemon page over to the lighter rendition
+    if video_name == state.current_wallpaper:
+        bus.publish("wallpaper.changed", {"name": video_name, "url": wallpaper_video_url(video_name)})
+
+
+def set_wallpaper_visible(visible):
+    """Called when the daemon window is covered or uncovered."""
+    occlusion.set(occluded=not visible)
+    playback.poke()
+    bus.publish("wallpaper.visibility", {"visible": visible})
+
+
+def _on_playback_mode(mode, reason, signals):
+    current = state.current_wallpaper
+    url = wallpaper_video_url(current) if current else None
+    bus.publish("playback.mode", {"mode": mode, "reason": reason, "url": url})
+    if mode == "full":
+        queue_variants(current)
+    # Nothing on the desktop is animating; don't spend CPU measuring the CPU
+    system_metrics.set_paused(mode == "still")
+
+
+library.on_change = _on_library_changed
+jobs.on_update = _on_job_update
+variants.on_ready = _on_variant_ready
+ingestor.on_imported = _on_wallpaper_imported
+playback.on_change = _on_playback_mode
+
+def wallpaper_version(name):
+    """
+    Version token for a wallpaper file, changes whenever the file is replaced.
+    None if the file is gone (deleted before the library watcher noticed).
+    """
+    try:
+        return file_etag(os.stat(os.path.join(WALLPAPER_DIR, name)))
+    except OSError:
+        return None
+
+
+def wallpaper_video_url(name):
+    """
+    Stable, cacheable URL for a wallpaper's video, versioned by mtime/size and
+    pointing at the variant that suits the current playback mode, or None if
+    the file is gone.
+    """
+    version = wallpaper_version(name)
+    if version is None:
+        return None
+    url = f"/api/wallpapers/{quote(name)}/video?v={version}"
+    key = best_variant(name, playback.mode)
+    if key:
+        url += f"&variant={quote(key)}"
+    return url
+
+# Initialize current wallpaper from settings or use first available
+def initialize_wallpaper(fallback=True):
+    """
+    Select the saved wallpaper, or else (unless fallback is False) the first
+    one in the library, unless something is already selected. Returns the selection.
+    """
+    settings_manager = state.settings_manager
     if settings_manager:
         saved_wallpaper = settings_manager.get_selected_background()
-        if saved_wallpaper and saved_wallpaper in wallpapers:
-            current_wallpaper = saved_wallpaper
-            return
-    
-    # Fall back to first wallpaper
-    current_wallpaper = wallpapers[0]
+        # A stat rather than a library scan, so this is cheap at startup
+        if (saved_wallpaper and is_wallpaper_file(saved_wallpaper)
+                and os.path.basename(saved_wallpaper) == saved_wallpaper
+                and os.path.isfile(os.path.join(WALLPAPER_DIR, saved_wallpaper))):
+            return state.select_wallpaper(saved_wallpaper, replace=False)
 
+    # Fall back to first wallpaper
+    wallpapers = get_wallpapers() if fallback else []
+    return state.select_wallpaper(wallpapers[0] if wallpapers else None, replace=False)
+
+
+def _on_widgets_changed(added, removed, modified):
+    # Folders deleted or dropped in while running: unmount/mount them like a
+    # layout change would (only enabled widgets are on the daemon page)
+    for widget_id in removed:
+        bus.publish("widget.disabled", {"id": widget_id})
+    if added:
+        for w in widget_manager.get_widget_config():
+            if w["id"] in added and w.get("enabled"):
+                bus.publish("widget.enabled", w)
+    for widget_id in modified:
+        bus.publish("widget.files_changed", {"id": widget_id})
+
+
+def start_background_services():
+    """Start watchers and workers that keep server-side caches fresh."""
+    budget_mb = get_setting("thumbnail_cache_budget_mb")
+    if budget_mb:
+        thumbnail_cache.budget_bytes = int(budget_mb) * 1024 * 1024
+    trusted = get_setting("trusted_widgets")
+    if trusted is not None:
+        widget_manager.trusted_widgets = set(trusted)
+    jobs.start()
+    library.refresh(force=True)
+    wallpapers = library.names()
+    thumbnail_cache.prune(wallpapers)
+    variants.prune(wallpapers)
+    screen_stills.prune(library_fingerprints())
+    # Files added while the app wasn't running, or whose import didn't finish
+    ingestor.enqueue(name for name, _ in library.unprobed())
+    thumbnail_service.warm(wallpapers)
+    ingestor.start_watcher()
+    widget_manager.registry.start_watcher(on_change=_on_widgets_changed)
+    playback.configure(get_setting("playback_policy", {}))
+    playback.start()
+    system_metrics.interval = float(get_setting("system_metrics_interval", system_metrics.interval))
+    system_metrics.start()
+
+
+def start_in_background():
+    """
+    First-run seeding, the initial wallpaper and desktop still, then
+    start_background_services(), on a thread so the menu bar and the
+    daemon window don't wait for library scans or thumbnails.
+    """
+    def run():
+        seed_example_wallpapers()
+        if state.current_wallpaper is None:
+            # Doesn't replace a wallpaper picked in the selector meanwhile
+            name = initialize_wallpaper()
+            if name:
+                bus.publish("wallpaper.changed", {"name": name, "url": wallpaper_video_url(name)})
+        startup.mark("wallpaper_selected")
+        apply_system_wallpaper(state.current_wallpaper)
+        start_background_services()
+        queue_variants(state.current_wallpaper)
+        startup.mark("background_services")
+
+    thread = threading.Thread(target=run, name="startup", daemon=True)
+    thread.start()
+    return thread
+
+
+def classify_request(method, path):
+    """Worker pool for a request, so long transfers can't starve the API."""
+    if path.startswith("/api/events"):
+        return "events"
+    if (path == "/api/wallpaper" or path.startswith("/api/wallpaper_thumbnails/")
+            or (path.startswith("/api/wallpapers/") and path.endswith("/video"))):
+        return "stream"
+    return "api"
+
+
+def serve(host="127.0.0.1", port=8000):
+    """
+    Run the app on the pooled HTTP/1.1 server (blocks). Tunable through the
+    "server" setting: api_workers, stream_workers, event_workers,
+    keep_alive_timeout, request_timeout; and the "profiling" setting:
+    enabled, slow_ms, keep.
+    """
+    profiling = get_setting("profiling", {}) or {}
+    if profiling:
+        profiler.configure(profiling.get("enabled"), profiling.get("slow_ms"), profiling.get("keep"))
+    options = get_setting("server", {}) or {}
+    server = WSGIServer(
+        app, host, port,
+        pools={
+            "api": options.get("api_workers", 8),
+            "stream": options.get("stream_workers", 4),
+            "events": options.get("event_workers", 16),
+        },
+        classify=classify_request,
+        keep_alive=options.get("keep_alive_timeout", 15.0),
+        request_timeout=options.get("request_timeout", 30.0),
+    )
+    state.http_server = server
+    # Listening: connections queue in the backlog until serve_forever picks them up
+    startup.mark("server_ready")
+    server.serve_forever()
 
 
 # --- Main page ---
@@ -60,18 +386,61 @@ def wallpaper_selector_page():
 @app.route("/api/widgets/config")
 def widgets_config():
     """Get widget configuration (positions, enabled status, aspect ratios)."""
-    config = widget_manager.get_widget_config()
-    return jsonify({"widgets": config})
+    config = widget_manager.load_widget_config()
+    return jsonify({
+        "widgets": widget_manager.get_widget_config(config),
+        "version": widget_manager.layout_version(config),
+    })
+
+
+@app.route("/api/widgets/bundle")
+def widgets_bundle():
+    """Layout plus every enabled widget's compiled frame in one versioned response."""
+    bundle = widget_manager.get_widget_bundle()
+    # One ETag per representation, like the widget frames
+    encoding = "gzip" if request.accept_encodings["gzip"] else "identity"
+    etag = bundle["version"] if encoding == "identity" else f"{bundle['version']}-{encoding}"
+    if etag in request.if_none_match:
+        response = app.make_response(("", 304))
+    else:
+        response = jsonify(bundle)
+        if encoding == "gzip":
+            response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+            response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+@app.route("/widgets/<widget_id>/parts")
+def widget_parts(widget_id):
+    """Sources of a lightweight widget for mounting into the page's Shadow DOM."""
+    widget = widget_manager.get_widget(widget_id)
+    if widget is None:
+        return "Widget not found", 404
+    if widget_manager.widget_mode(widget) != "shadow":
+        return "Widget runs in an iframe", 403
+    try:
+        parts = frame_cache.parts(widget)
+    except Exception as e:
+        return f"Failed to load widget HTML: {e}", 500
+    response = jsonify(parts)
+    response.set_etag(parts["etag"])
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 @app.route("/api/widgets/discover")
 def widgets_discover():
     """Get list of available widgets (freshly discovered from filesystem)."""
-    # Force fresh discovery on every call
+    # Re-stat the widgets folder so newly dropped widgets show up immediately
+    widget_manager.registry.refresh()
     widgets = widget_manager.discover_widgets()
     return jsonify({"widgets": {k: {
         "id": v["id"],
-        "aspect_ratio": v.get("aspect_ratio", 2.0)
+        "aspect_ratio": v.get("aspect_ratio", 2.0),
+        "mode": widget_manager.widget_mode(v),
     } for k, v in widgets.items()}})
 
 
@@ -82,16 +451,53 @@ def update_widgets_config():
     if not isinstance(data, list):
         return jsonify({"error": "Invalid payload"}), 400
     
-    # Save configuration
-    widget_manager.save_widget_config(data)
-    
-    # Reload daemon to apply changes
-    if wallpaper_daemon:
-        wallpaper_daemon.reload()
-    
+    # Push only what changed; the daemon page patches the affected widgets
+    for event_type, payload in widget_manager.replace_widget_config(data):
+        bus.publish(event_type, payload)
+
     return jsonify({"success": True})
 
 
+@app.route("/api/widgets/config", methods=["PATCH"])
+def patch_widgets_config():
+    """
+    Partial layout update: {"version": str, "changes": [{"id", "x", "y", "width",
+    "height", "enabled"}, ...], "persist": bool}. persist=false applies a live
+    preview to the daemon page without saving. Responds 409 if the layout has
+    changed since `version`.
+    """
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid payload"}), 400
+    try:
+        version, changes = widget_manager.patch_widget_config(
+            data.get("changes"),
+            version=data.get("version"),
+            persist=data.get("persist", True),
+        )
+    except widget_manager.LayoutConflict as e:
+        return jsonify({"error": "Layout changed", "version": e.version}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    for event_type, payload in changes:
+        bus.publish(event_type, payload)
+
+    return jsonify({
+        "version": version,
+        "changes": [{"type": event_type, "data": payload} for event_type, payload in changes],
+    })
+
+
+@app.route("/api/widgets/previews/discard", methods=["POST"])
+def discard_widget_previews():
+    """Drop unsaved live previews (sent by Widget Center on reset and when it closes)."""
+    changes = widget_manager.discard_previews()
+    for event_type, payload in changes:
+        bus.publish(event_type, payload)
+    return jsonify({"changes": len(changes)})
+
+
 @app.route("/widget_center/")
 def widget_center():
     """Widget Center management page."""
@@ -104,158 +510,216 @@ def widget_frame(widget_id):
     Serve an isolated widget frame (HTML with inline CSS/JS).
     Each widget gets its own execution context.
     """
-    available = widget_manager.discover_widgets()
-    if widget_id not in available:
+    widget = widget_manager.get_widget(widget_id)
+    if widget is None:
         return "Widget not found", 404
-    
-    widget = available[widget_id]
-    
-    # Read widget files
-    html_content = ""
-    css_content = ""
-    js_content = ""
-    
+
     try:
-        with open(widget["html"], "r") as f:
-            html_content = f.read()
+        frame = frame_cache.get(widget)
     except Exception as e:
         return f"Failed to load widget HTML: {e}", 500
-    
-    if widget["css"]:
-        try:
-            with open(widget["css"], "r") as f:
-                css_content = f.read()
-        except Exception:
-            pass
-    
-    if widget["js"]:
-        try:
-            with open(widget["js"], "r") as f:
-                js_content = f.read()
-        except Exception:
-            pass
-    
-    # Build isolated HTML frame
-    frame_html = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8" />
-    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
-    <style>
-        * {{
-            box-sizing: border-box;
-        }}
-        html, body {{
-            margin: 0;
-            padding: 0;
-            overflow: hidden;
-            width: 100%;
-            height: 100%;
-            display: flex;
-            flex-direction: column;
-        }}
-        #widget-root {{
-            width: 100%;
-            height: 100%;
-            flex: 1;
-            display: flex;
-            flex-direction: column;
-            container-type: size;
-        }}
-    </style>
-    <style>
-{css_content}
-    </style>
-</head>
-<body>
-    <div id="widget-root">
-{html_content}
-    </div>
-    <script>
-{js_content}
-    </script>
-</body>
-</html>"""
-    
-    response = app.make_response(frame_html)
+
+    encoding = negotiate_encoding(request.accept_encodings, frame["variants"])
+    response = app.make_response(frame["variants"][encoding])
     response.headers['Content-Type'] = 'text/html; charset=utf-8'
-    return response
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding != "identity":
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(frame["etag"] if encoding == "identity" else f"{frame['etag']}-{encoding}")
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 # --- API endpoints ---
+@app.route("/api/events")
+def events():
+    """Server-Sent Events stream of live wallpaper and widget updates."""
+    response = Response(bus.stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 @app.route("/api/wallpaper")
 def wallpaper():
-    global current_wallpaper
-    if not current_wallpaper:
+    current = state.current_wallpaper
+    if not current:
         return "No wallpaper selected", 404
-    return send_from_directory(WALLPAPER_DIR, current_wallpaper)
+    path = os.path.join(WALLPAPER_DIR, current)
+    if not os.path.isfile(path):
+        return "Wallpaper not found", 404
+    return send_video(path)
+
+
+@app.route("/api/wallpaper/current")
+def current_wallpaper_info():
+    """Name and versioned video URL of the selected wallpaper."""
+    current = state.current_wallpaper
+    if not current:
+        return jsonify({"name": None, "url": None})
+    url = wallpaper_video_url(current)
+    if url is None:
+        return jsonify({"name": current, "url": None}), 404
+    return jsonify({"name": current, "url": url})
+
+
+@app.route("/api/wallpapers/<name>/video")
+def wallpaper_video(name):
+    """
+    Serve a specific wallpaper's video.
+    Requests carrying the current version are cached indefinitely by the client.
+    """
+    path = os.path.join(WALLPAPER_DIR, name)
+    if not library.contains(name) or not os.path.isfile(path):
+        return "Wallpaper not found", 404
+
+    key = request.args.get("variant")
+    if key and any(v["key"] == key for v in variants.variants_for(name)):
+        variant_path = variants.lookup(key)
+        if variant_path:
+            # Variant files are content-addressed, so they never change
+            return send_video(variant_path, max_age=31536000, immutable=True)
+
+    if request.args.get("v") == wallpaper_version(name) and not key:
+        return send_video(path, max_age=31536000, immutable=True)
+    return send_video(path)
+
+
+@app.route("/api/wallpapers/<name>/variants")
+def wallpaper_variants(name):
+    """Display-matched variants of a wallpaper with their encode/bitrate/CPU figures."""
+    if not library.contains(name):
+        return "Wallpaper not found", 404
+    return jsonify({"variants": variants.variants_for(name)})
 
 
 @app.route('/api/screen')
 def api_screen():
-    """Return main screen dimensions in points."""
+    """Return main screen dimensions in points, plus every connected screen."""
     # Return both the full screen frame and the visibleFrame (excludes menu bar/dock)
-    if NSScreen is None:
-        return jsonify({
-            "frame": {"width": 1920, "height": 1080, "x": 0, "y": 0},
-            "visible": {"width": 1920, "height": 1080, "x": 0, "y": 0}
-        })
-    try:
-        screen = NSScreen.mainScreen()
-        frame = screen.frame()
-        visible = screen.visibleFrame()
-        return jsonify({
-            "frame": {
-                "width": int(frame.size.width),
-                "height": int(frame.size.height),
-                "x": int(frame.origin.x),
-                "y": int(frame.origin.y)
-            },
-            "visible": {
-                "width": int(visible.size.width),
-                "height": int(visible.size.height),
-                "x": int(visible.origin.x),
-                "y": int(visible.origin.y)
-            }
-        })
-    except Exception:
-        return jsonify({
-            "frame": {"width": 1920, "height": 1080, "x": 0, "y": 0},
-            "visible": {"width": 1920, "height": 1080, "x": 0, "y": 0}
-        })
+    geometry = dict(get_screen_geometry())
+    geometry["screens"] = get_all_screens()
+    return jsonify(geometry)
 
 
 @app.route("/api/wallpapers")
 def list_wallpapers():
-    wallpapers = get_wallpapers()
-    return jsonify({"wallpapers": wallpapers, "selected": current_wallpaper})
+    """
+    Page through the wallpaper library.
+    Query params: offset, limit, q (name substring), sort (name|size|modified|duration), order (asc|desc).
+    """
+    offset = request.args.get("offset", 0, type=int)
+    limit = request.args.get("limit", type=int)
+    if limit is not None:
+        limit = max(0, min(limit, MAX_PAGE_SIZE))
+    total, items = library.query(
+        offset=offset,
+        limit=limit,
+        query=request.args.get("q") or None,
+        sort=request.args.get("sort", "name"),
+        descending=request.args.get("order") == "desc",
+    )
+    return jsonify({
+        "wallpapers": [item["name"] for item in items],
+        "items": items,
+        "total": total,
+        "offset": offset,
+        "selected": state.current_wallpaper,
+    })
+
+
+@app.route("/api/playback")
+def playback_state():
+    """Current playback mode, why it was chosen, and the signals behind it."""
+    info = playback.state()
+    current = state.current_wallpaper
+    info["url"] = wallpaper_video_url(current) if current else None
+    return jsonify(info)
+
+
+@app.route("/api/system/metrics")
+def get_system_metrics():
+    """
+    Latest system snapshot, polled by the daemon page while a widget uses
+    Widget.onSystemMetrics; each read keeps sampling going for a few intervals.
+    """
+    return jsonify(dict(system_metrics.read(), interval=system_metrics.interval))
+
+
+@app.route("/api/jobs")
+def list_jobs():
+    """Background job progress (?active=1 for queued/running jobs only)."""
+    active_only = request.args.get("active") in ("1", "true")
+    return jsonify({
+        "jobs": [job.to_dict() for job in jobs.list(active_only=active_only)],
+        "queued": jobs.depth,
+    })
+
+
+@app.route("/api/metrics")
+def get_metrics():
+    """Prometheus text exposition of request, cache and job metrics."""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/api/startup")
+def get_startup():
+    """Seconds since launch at which each startup phase completed."""
+    return jsonify(startup.timer.report())
+
+
+@app.route("/api/startup/first_paint", methods=["POST"])
+def first_paint():
+    """Sent by the wallpaper page once its first frame is on screen."""
+    if startup.mark("first_paint"):
+        print(startup.timer.format())
+    return jsonify(startup.timer.report())
+
+
+@app.route("/api/debug/slow")
+def debug_slow_requests():
+    """Recent slow (and explicitly profiled) requests with their trace spans."""
+    if not profiler.enabled:
+        return "Profiling is disabled", 404
+    return jsonify({"slow_ms": profiler.slow_ms, "requests": profiler.slow_requests()})
+
+
+@app.route("/api/debug/profiles/<int:profile_id>")
+def debug_profile(profile_id):
+    """cProfile report of a request sent with ?_profile=1 or X-Profile: 1."""
+    report = profiler.profile_report(profile_id)
+    if report is None:
+        return "Profile not found", 404
+    return Response(report, mimetype="text/plain")
+
+
+@app.route("/api/jobs/<int:job_id>")
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return "Job not found", 404
+    return jsonify(job.to_dict())
 
 
 @app.route("/api/select_wallpaper", methods=["POST"])
 def select_wallpaper():
-    global current_wallpaper
     data = request.json
     name = data.get("name")
-    if name not in get_wallpapers():
+    if not library.contains(name) or wallpaper_version(name) is None:
         return "Wallpaper not found", 404
 
-    current_wallpaper = name
-    
-    # Save to settings
-    if settings_manager:
-        settings_manager.set_selected_background(name)
-    
-    wallpaper_image_path = get_thumbnail(current_wallpaper)
+    # Selected and saved in one step under the state lock
+    state.select_wallpaper(name, persist=True)
 
-    if space_observer:
-        space_observer.current_wallpaper_path = wallpaper_image_path
-        space_observer.reapply_wallpaper()
+    apply_system_wallpaper(name)
+    queue_variants(name)
 
-    if wallpaper_daemon:
-        wallpaper_daemon.reload()
+    # Swap only the <video> source; widgets keep running
+    url = wallpaper_video_url(name)
+    bus.publish("wallpaper.changed", {"name": name, "url": url})
 
     print(f"Wallpaper selected: {name}")
-    return jsonify({"selected": current_wallpaper})
+    return jsonify({"selected": name, "url": url})
 
 
 @app.route("/api/open_wallpaper_folder", methods=["POST"])
@@ -278,8 +742,35 @@ def open_widgets_folder():
 
 @app.route("/api/wallpaper_thumbnails/<filename>")
 def wallpaper_thumbnail(filename):
-    if filename not in get_wallpapers():
+    """
+    Serve a thumbnail from the WebP/JPEG ladder.
+    ?w= picks the smallest rung at least that wide; ?fmt= (webp|jpeg) or the
+    Accept header picks the format.
+    """
+    if not library.contains(filename):
         return "Wallpaper not found", 404
-    
-    thumb_path = get_thumbnail(filename)
-    return send_from_directory(os.path.dirname(thumb_path), os.path.basename(thumb_path))
+
+    fmt = request.args.get("fmt")
+    if fmt not in THUMBNAIL_FORMATS:
+        # Only an explicit image/webp entry counts; "*/*" and "image/*" would match it too
+        accepts_webp = any(mime == "image/webp" and quality > 0 for mime, quality in request.accept_mimetypes)
+        fmt = "webp" if accepts_webp else "jpeg"
+    width = request.args.get("w", type=int)
+
+    renditions = thumbnail_service.get_cached(filename)
+    if renditions is None:
+        future = thumbnail_service.request(filename)
+        if not future.done():
+            # Don't hold a request thread while the worker decodes
+            response = jsonify({"status": "pending"})
+            response.status_code = 202
+            response.headers["Retry-After"] = "1"
+            return response
+        renditions = future.result()
+        if renditions is None:
+            return "Failed to generate thumbnail", 500
+
+    thumb_path = pick_rendition(renditions, width, fmt)
+    response = send_from_directory(os.path.dirname(thumb_path), os.path.basename(thumb_path))
+    response.headers["Vary"] = "Accept"
+    return response